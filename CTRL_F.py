@@ -43,15 +43,72 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 """
 
 
-from Tkinter import *
-from pymol import cmd
+try:
+    from Tkinter import *
+    import tkFileDialog
+except ImportError:
+    try:
+        from tkinter import *
+        from tkinter import filedialog as tkFileDialog
+    except ImportError:
+        # Without Tk, e.g. in batch pipelines, only the scripting API is available
+        Frame = object
+try:
+    from pymol import cmd, plugins
+except ImportError:
+    # Without PyMol only the batch scanner can be used, see batch_main
+    cmd = None
+    plugins = None
 import re
 import types
 import random
 import time
-from pymol import cmd, plugins
 import webbrowser
 import datetime
+import threading
+import bisect
+import multiprocessing
+import array
+import collections
+import os
+import sys
+import io
+import gzip
+import json
+import argparse
+import itertools
+import difflib
+import mmap
+import struct
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+# Function to check if x is a string, also without PyMol
+def is_string(x):
+    return isinstance(x, string_types)
+
+
+# Function to register a PyMol command, without PyMol there is nothing to register
+def extend_command(name, function):
+    if cmd is not None:
+        cmd.extend(name, function)
 
 #==========================
 # Create CTRL-F Application
@@ -73,12 +130,59 @@ class CTRLF(Frame):
         # Initialize a variable for storing the interactive option
         self.interactive = IntVar()
 
+        # Initialize a variable for storing the option of browsing the hits one by one
+        self.browse_hits = IntVar()
+
         # Initialize a variable for storing the searchs string
         self.search_var = StringVar()
 
         # Initialize a variable for storing the pymol object or selection
         self.pymol_selection = StringVar()
 
+        # Initialize a variable for storing the filter of the list of objects and selections
+        self.filter_var = StringVar()
+
+        # Initialize a variable for storing the search mode
+        self.search_mode = StringVar()
+        self.search_mode.set("sequence")
+
+        # Initialize a variable for storing the maximum distance of fuzzy searches
+        self.max_distance = IntVar()
+        self.max_distance.set(1)
+
+        # Initialize a variable for storing the minimum score of alignment searches
+        self.min_score = IntVar()
+        self.min_score.set(20)
+
+        # Initialize a variable for storing the maximum number of hits, 0 for all hits
+        self.max_hits = IntVar()
+        self.max_hits.set(0)
+
+        # Initialize the variables of the background search:
+        # the queue for receiving its results, the event for cancelling it,
+        # the results received so far and the function that saves them when it is done
+        self.search_queue = None
+        self.search_cancelled = None
+        self.search_results = []
+        self.search_done = None
+        self.search_preview = 0
+        self.search_browse = 1
+        self.search_limited = None
+        self.search_score_label = "score"
+
+        # Initialize the id of the pending Tk after() call that saves the next chunk of hits,
+        # and the notice that is added to the status when the hits are saved
+        self.selection_job = None
+        self.status_notice = ""
+
+        # Initialize the hit browser: its window, the hits of the last search,
+        # the label of their scores and the page and hit that are shown
+        self.browser_window = None
+        self.browser_hits = []
+        self.browser_score_label = "score"
+        self.browser_page = None
+        self.browser_current = None
+
         # Generate the widgets
         self.pack()
         self.create_widgets()
@@ -87,9 +191,18 @@ class CTRLF(Frame):
         self.search_var.trace("w", self.search_var_trace)
 
         # Fill the listbox with available pymol objects and selections
+        # Only the rows in view are put into the listbox: the names matching
+        # the filter are kept in filteredlist, the first row shown is list_offset
+        # and list_rows the number of rows that fit into the listbox
         self.pymollist = []
+        self.filteredlist = []
+        self.list_offset = None
+        self.list_rows = 10
         self.fill_pymol_list()
 
+        # Trace the filter input for filtering the list while typing
+        self.filter_var.trace("w", self.filter_pymol_list)
+
         # Initialize the lists for storing the
         # list of searchable objects and selctions = searchlist
         # the list of strings to search = searchstrings
@@ -107,6 +220,22 @@ class CTRLF(Frame):
         # and for deleting them
         self.oldsearches = []
 
+        # Initialize the scheduler for interactive searches:
+        # the id of the pending Tk after() call and a counter of the scheduled searches,
+        # which is used to discard searches that have been superseded by a newer query
+        self.scheduled_search = None
+        self.search_generation = 0
+
+        # Initialize the id of the pending Tk after() call that saves the hits
+        # of the last preview of an interactive search as selection
+        self.scheduled_commit = None
+
+        # Refresh the list of objects and selections when the user comes back
+        # to the window, e.g. after loading structures, and stop everything when it is closed
+        self.master.bind("<FocusIn>", self.refresh_focus, add="+")
+        self.bind("<Enter>", self.refresh)
+        self.bind("<Destroy>", self.stop_refresh)
+
     #============================
     # Create the main GUI widgets
     #============================
@@ -129,14 +258,30 @@ class CTRLF(Frame):
             text = "Status Display",
             wraplength = 150,
         )
-        self.lboxObjSel = Listbox(self,
+        self.entryFilter = Entry(self,
+            textvariable = self.filter_var,
+            width = 0,
+        )
+        self.frameObjSel = Frame(self,
+        )
+        self.lboxObjSel = Listbox(self.frameObjSel,
             height = 0,
             width = 0,
         )
+        self.scrollObjSel = Scrollbar(self.frameObjSel,
+            orient = VERTICAL,
+        )
         self.entry = Entry(self,
             textvariable=self.search_var,
             width = 0,
         )
+        self.menubuttonHistory = Menubutton(self,
+            relief = RAISED,
+            text = "History",
+        )
+        self.menuHistory = Menu(self.menubuttonHistory,
+            tearoff = 0,
+        )
         self.buttonSearch = Button(self,
             text = "Find",
             width = 15,
@@ -145,6 +290,56 @@ class CTRLF(Frame):
             text = "Clear all hits",
             width = 15,
         )
+        self.buttonCancel = Button(self,
+            text = "Cancel",
+            width = 15,
+        )
+        self.optionMode = OptionMenu(self, self.search_mode,
+            "sequence",
+            "motif list",
+            "fuzzy (mismatches)",
+            "fuzzy (edits)",
+            "PROSITE",
+            "alignment (BLOSUM62)",
+            "search library",
+        )
+        self.labelDistance = Label(self,
+            text = "max. distance",
+        )
+        self.spinboxDistance = Spinbox(self,
+            from_ = 0,
+            to = 5,
+            textvariable = self.max_distance,
+            width = 3,
+        )
+        self.buttonMotifs = Button(self,
+            text = "Load motifs",
+            width = 15,
+        )
+        self.buttonLibrary = Button(self,
+            text = "Scan library",
+            width = 15,
+        )
+        self.labelScore = Label(self,
+            text = "min. score",
+        )
+        self.spinboxScore = Spinbox(self,
+            from_ = 0,
+            to = 1000,
+            increment = 5,
+            textvariable = self.min_score,
+            width = 5,
+        )
+        self.labelMaxHits = Label(self,
+            text = "max. hits",
+        )
+        self.spinboxMaxHits = Spinbox(self,
+            from_ = 0,
+            to = 1000000,
+            increment = 100,
+            textvariable = self.max_hits,
+            width = 7,
+        )
         self.checkboxSearchAll = Checkbutton(self,
             takefocus = 1,
             text = "search in all",
@@ -152,6 +347,9 @@ class CTRLF(Frame):
         self.checkboxInteractive = Checkbutton(self,
             text = "interactive",
         )
+        self.checkboxBrowse = Checkbutton(self,
+            text = "browse hits",
+        )
         self.labelStatus = Label(self,
             font = "{MS Sans Serif} 8 bold",
             text = "Status",
@@ -173,20 +371,39 @@ class CTRLF(Frame):
         # Bind a click on the listbox of PyMol objects/selections to get the selection
         self.lboxObjSel.bind("<Button-1>", self.get_searchstring)
 
+        # The listbox only holds the rows in view, so it is scrolled by hand
+        self.scrollObjSel.configure(
+            command = self.scroll_pymol_list
+        )
+        self.lboxObjSel.bind("<MouseWheel>", self.wheel_pymol_list)
+        self.lboxObjSel.bind("<Button-4>", self.wheel_pymol_list)
+        self.lboxObjSel.bind("<Button-5>", self.wheel_pymol_list)
+        self.lboxObjSel.bind("<Configure>", self.resize_pymol_list)
+
         # Configure the entry widget
         self.entry.configure(
             width=20
         )
         
         # Bind the enter key when in the searchbox to start the search
-        self.entry.bind("<Return>", self.action_searchbutton)
+        self.entry.bind("<Return>", self.action_findbutton)
 
         # Set focus to the entry widget
         self.entry.focus()
 
+        # Configure the dropdown menu of recent searches, which is filled when it is opened,
+        # also with the down key in the searchbox
+        self.menuHistory.configure(
+            postcommand = self.fill_history_menu
+        )
+        self.menubuttonHistory.configure(
+            menu = self.menuHistory
+        )
+        self.entry.bind("<Down>", self.show_history_menu)
+
         # Bind the action to the search button
         self.buttonSearch.configure(
-            command = self.action_searchbutton
+            command = self.action_findbutton
         )
 
         # Bind the action to the Clear button
@@ -194,6 +411,12 @@ class CTRLF(Frame):
             command = self.action_deletebutton
         )
 
+        # Bind the action to the Cancel button, which is only active while searching
+        self.buttonCancel.configure(
+            command = self.action_cancelbutton,
+            state = DISABLED
+        )
+
         # Configure the listbox that displays previous searches
         #self.lboxPreviousSearches.bind("<<ListboxSelect>>", self.get_searchstring)
 
@@ -212,6 +435,21 @@ class CTRLF(Frame):
         # Turn the interactive checkbutton on by default
         self.checkboxInteractive.select()
 
+        # Configure a checkbutton for showing the hits in the hit browser instead of selections
+        self.checkboxBrowse.configure(
+            variable = self.browse_hits
+        )
+
+        # Configure the button for loading a list of motifs from a file
+        self.buttonMotifs.configure(
+            command = self.action_loadmotifs
+        )
+
+        # Configure the button for scanning the bundled library of motifs
+        self.buttonLibrary.configure(
+            command = self.action_librarybutton
+        )
+
         # Configure the Help button
         self.buttonHelp.configure(
             command = self.create_help_window
@@ -250,7 +488,7 @@ class CTRLF(Frame):
             rowspan = 1,
             sticky = "n"
         )
-        self.lboxObjSel.grid(
+        self.entryFilter.grid(
             in_    = self,
             column = 1,
             row    = 2,
@@ -259,14 +497,47 @@ class CTRLF(Frame):
             ipady = 0,
             padx = 2,
             pady = 2,
-            rowspan = 5,
+            rowspan = 1,
+            sticky = "new"
+        )
+        self.frameObjSel.grid(
+            in_    = self,
+            column = 1,
+            row    = 3,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 7,
             sticky = "news"
         )
+        self.lboxObjSel.pack(
+            side = LEFT,
+            fill = BOTH,
+            expand = 1
+        )
+        self.scrollObjSel.pack(
+            side = RIGHT,
+            fill = Y
+        )
         self.entry.grid(
             in_    = self,
             column = 2,
             row    = 2,
-            columnspan = 2,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "new"
+        )
+        self.menubuttonHistory.grid(
+            in_    = self,
+            column = 3,
+            row    = 2,
+            columnspan = 1,
             ipadx = 0,
             ipady = 0,
             padx = 2,
@@ -310,6 +581,18 @@ class CTRLF(Frame):
             rowspan = 1,
             sticky = "nw"
         )
+        self.buttonCancel.grid(
+            in_    = self,
+            column = 4,
+            row    = 4,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
         self.labelStatusDisplay.grid(
             in_    = self,
             column = 2,
@@ -346,6 +629,18 @@ class CTRLF(Frame):
             rowspan = 1,
             sticky = "nw"
         )
+        self.checkboxBrowse.grid(
+            in_    = self,
+            column = 4,
+            row    = 9,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
         self.buttonHelp.grid(
             in_    = self,
             column = 4,
@@ -371,6 +666,115 @@ class CTRLF(Frame):
             sticky = "nw"
         )
 
+        self.optionMode.grid(
+            in_    = self,
+            column = 2,
+            row    = 7,
+            columnspan = 2,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "new"
+        )
+        self.buttonMotifs.grid(
+            in_    = self,
+            column = 4,
+            row    = 7,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        self.labelDistance.grid(
+            in_    = self,
+            column = 2,
+            row    = 8,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        self.spinboxDistance.grid(
+            in_    = self,
+            column = 3,
+            row    = 8,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        self.buttonLibrary.grid(
+            in_    = self,
+            column = 4,
+            row    = 8,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        self.labelScore.grid(
+            in_    = self,
+            column = 2,
+            row    = 9,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        self.spinboxScore.grid(
+            in_    = self,
+            column = 3,
+            row    = 9,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        self.labelMaxHits.grid(
+            in_    = self,
+            column = 2,
+            row    = 10,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        self.spinboxMaxHits.grid(
+            in_    = self,
+            column = 3,
+            row    = 10,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+
         #================
         # Resize Behavior
         #================
@@ -380,6 +784,9 @@ class CTRLF(Frame):
         self.grid_rowconfigure(4, minsize = 6, pad = 3)
         self.grid_rowconfigure(5, minsize = 11, pad = 3)
         self.grid_rowconfigure(6, weight = 1, minsize = 40, pad = 3)
+        self.grid_rowconfigure(7, minsize = 17, pad = 3)
+        self.grid_rowconfigure(8, minsize = 17, pad = 3)
+        self.grid_rowconfigure(9, minsize = 17, pad = 3)
         self.grid_columnconfigure(1, minsize = 110, pad = 3)
         self.grid_columnconfigure(2, minsize = 30, pad = 3)
         self.grid_columnconfigure(3, minsize = 54, pad = 3)
@@ -397,31 +804,118 @@ class CTRLF(Frame):
         # Get the state of the interactive check box
         interactive = self.interactive.get()
 
-        if interactive == 1:
-            self.action_searchbutton()
+        # Only sequences are searched while typing, motif lists need Find or Enter
+        if interactive == 1 and self.search_mode.get() == "sequence":
+            self.schedule_search()
         else:
             pass
 
+    #==========================================================================
+    # Function for scheduling an interactive search
+    # Bursts of key presses are coalesced into one search, which is only run
+    # after no further key has been pressed for interactive_delay milliseconds
+    #==========================================================================
+    def schedule_search(self, *args):
+        # Cancel the search that is still waiting for its turn
+        self.cancel_scheduled_search()
+
+        # Every new query supersedes the searches that have been scheduled before
+        self.search_generation += 1
+        self.scheduled_search = self.after(interactive_delay, self.run_scheduled_search,
+                                           self.search_generation)
+
+    # Helper function for schedule_search
+    def run_scheduled_search(self, generation):
+        self.scheduled_search = None
+
+        # Only search if no newer query arrived in the meantime,
+        # while typing the hits are only counted in a preview
+        if generation == self.search_generation:
+            if interactive_preview:
+                self.action_searchbutton_preview(generation)
+            else:
+                self.action_searchbutton()
+
+    # Helper function for cancelling a scheduled search
+    def cancel_scheduled_search(self, *args):
+        if self.scheduled_search is not None:
+            self.after_cancel(self.scheduled_search)
+            self.scheduled_search = None
+        if self.scheduled_commit is not None:
+            self.after_cancel(self.scheduled_commit)
+            self.scheduled_commit = None
+
+    #=========================================================================
+    # Function for previewing an interactive search while typing
+    # The hits are only counted, without creating selections in PyMol. They
+    # are saved as selection on Enter or after preview_commit_delay milliseconds
+    # without further key presses, from the result cache.
+    #=========================================================================
+    def action_searchbutton_preview(self, generation):
+        search_term = self.search_var.get()
+
+        if search_term == "":
+            self.labelStatusDisplay.configure(text="Please provide a search term")
+
+        elif not search_term.isalnum():
+            self.labelStatusDisplay.configure(text="Regex not possible in interactive mode")
+
+        else:
+            if self.searchall.get() == 1:
+                haystacks = self.get_search_all()
+            else:
+                search_selection = self.get_search_selection()
+                haystacks = [search_selection] if search_selection is not None else []
+
+            if len(haystacks) == 0:
+                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+            else:
+                self.start_search(search_term, haystacks,
+                                  lambda results: self.finish_preview(generation, results),
+                                  preview=1)
+
+    # Helper function for action_searchbutton_preview, called with the results of the search
+    def finish_preview(self, generation, results):
+        (hits, chains) = hit_counts(results)
+        if hits == 0:
+            self.labelStatusDisplay.configure(text="Nothing found!")
+        else:
+            self.labelStatusDisplay.configure(text="%i hits in %i chains" % (hits, chains))
+
+        # Save the hits as selection if no newer query arrives in the meantime
+        if generation == self.search_generation:
+            self.scheduled_commit = self.after(preview_commit_delay, self.commit_preview, generation)
+
+    # Helper function for finish_preview, searches again to save the selection
+    def commit_preview(self, generation):
+        self.scheduled_commit = None
+        if (generation == self.search_generation and self.interactive.get() == 1 and
+                self.search_mode.get() == "sequence"):
+            self.action_searchbutton()
+
     #============================================
     # Function for refreshing the main GUI window
+    # It is called when the window gets the focus or the mouse
+    # and after searches, there is no timer checking PyMol
     #============================================
     def refresh(self, *args):
-
         curr_list = self.pymollist
-        curr_selection = self.pymol_selection
 
         if curr_list != cmd.get_names("all"):
-            # first, fill the list ob PyMol objects/selections
+            # update the list ob PyMol objects/selections,
+            # the current selection stays selected
             self.fill_pymol_list()
 
-        # Find the current selection and select it again
-        for i, item in enumerate(self.pymollist):
-            if item == curr_selection:
-                self.lboxObjSel.selection_set(i)
-                break
+    # Helper function for refreshing when the window itself gets the focus,
+    # the bindings of the window also get the focus events of all its widgets
+    def refresh_focus(self, event):
+        if event.widget is self.master:
+            self.refresh()
 
-        # Repeat the again after 1000 msec
-        self.after(1000, self.refresh)
+    # Helper function for stopping the searches when the window is closed
+    def stop_refresh(self, *args):
+        self.cancel_scheduled_search()
+        self.cancel_search()
 
 
     #==========================================================
@@ -431,15 +925,87 @@ class CTRLF(Frame):
         # Fill the list with all objets and selections from pymol
         self.pymollist = cmd.get_names("all")
 
-        # delete all entries in the corresponding listbox
-        self.lboxObjSel.delete(0, END)
+        # and show the ones matching the filter
+        filtered = self.filter_names()
+
+        # keep the first row in view where it is, the first time focus on the end of the list
+        offset = self.list_offset
+        if offset is None:
+            offset = len(filtered) - self.list_rows
+        elif offset < len(self.filteredlist) and self.filteredlist[offset] in filtered:
+            offset = filtered.index(self.filteredlist[offset])
+
+        self.filteredlist = filtered
+        self.show_pymol_list(offset)
+
+    # Helper function for filtering the list while typing in the filter entry
+    def filter_pymol_list(self, *args):
+        # show the first of the matching names
+        self.filteredlist = self.filter_names()
+        self.show_pymol_list(0)
+
+    # Helper function returning the names matching the text in the filter entry
+    def filter_names(self):
+        text = self.filter_var.get().strip().lower()
+        if text:
+            return [item for item in self.pymollist if text in item.lower()]
+        return list(self.pymollist)
+
+    # Helper function for showing the rows of the list from offset on,
+    # only the rows that changed are deleted from and inserted into the listbox
+    def show_pymol_list(self, offset):
+        total = len(self.filteredlist)
+        self.list_offset = max(0, min(offset, total - self.list_rows))
+        rows = self.filteredlist[self.list_offset:self.list_offset + self.list_rows]
+
+        shown = list(self.lboxObjSel.get(0, END))
+        opcodes = difflib.SequenceMatcher(None, shown, rows, autojunk=False).get_opcodes()
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            if tag == "equal":
+                continue
+            if i2 > i1:
+                self.lboxObjSel.delete(i1, i2 - 1)
+            if j2 > j1:
+                self.lboxObjSel.insert(i1, *rows[j1:j2])
+
+        # Select the current selection again, if it is in view
+        self.lboxObjSel.selection_clear(0, END)
+        if self.pymol_selection in rows:
+            self.lboxObjSel.selection_set(rows.index(self.pymol_selection))
+
+        if total > 0:
+            self.scrollObjSel.set(float(self.list_offset) / total,
+                                  float(self.list_offset + len(rows)) / total)
+        else:
+            self.scrollObjSel.set(0.0, 1.0)
+
+    # Helper function for the scrollbar of the list
+    def scroll_pymol_list(self, *args):
+        if args[0] == "moveto":
+            offset = int(round(float(args[1]) * len(self.filteredlist)))
+        elif args[2] == "pages":
+            offset = self.list_offset + int(args[1]) * self.list_rows
+        else:
+            offset = self.list_offset + int(args[1])
+        self.show_pymol_list(offset)
 
-        # and put the items from pymollist into the listbox again
-        for item in self.pymollist:
-            self.lboxObjSel.insert(END, item)
+    # Helper function for scrolling the list with the mouse wheel
+    def wheel_pymol_list(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.show_pymol_list(self.list_offset - 3)
+        else:
+            self.show_pymol_list(self.list_offset + 3)
+        return "break"
 
-        # focus on the end of the list
-        self.lboxObjSel.see(END)
+    # Helper function for adapting the number of rows in view to the size of the listbox
+    def resize_pymol_list(self, event):
+        linespace = int(self.lboxObjSel.tk.call("font", "metrics", self.lboxObjSel.cget("font"), "-linespace"))
+        rows = max(1, event.height // max(1, linespace))
+        if rows != self.list_rows:
+            # a list scrolled to its end stays at the end
+            at_end = self.list_offset + self.list_rows >= len(self.filteredlist)
+            self.list_rows = rows
+            self.show_pymol_list(len(self.filteredlist) if at_end else self.list_offset)
 
 
     #==============================================
@@ -635,6 +1201,22 @@ class CTRLF(Frame):
         )
         _frame_9 = Frame(_labelframe_1,
         )
+        _frame_10 = Frame(_labelframe_1,
+        )
+        _frame_11 = Frame(_labelframe_1,
+        )
+        _frame_12 = Frame(_labelframe_1,
+        )
+        _frame_13 = Frame(_labelframe_1,
+        )
+        _frame_14 = Frame(_labelframe_1,
+        )
+        _frame_15 = Frame(_labelframe_1,
+        )
+        _frame_16 = Frame(_labelframe_1,
+        )
+        _frame_17 = Frame(_labelframe_1,
+        )
         point2 = Label(_frame_7,
             anchor = "nw",
             justify = "left",
@@ -677,6 +1259,46 @@ class CTRLF(Frame):
             text = "First, select a PyMol object or selection from the list on the left. The active selection will be highlighted in blue and shown in the status display. If there is only one PyMol object available, it will be automatically selected.",
             wraplength = 400,
         )
+        point8 = Label(_frame_10,
+            justify = "left",
+            text = "To search for several motifs at once, choose \"motif list\" in the menu next to \"Find\" and enter the motifs separated by commas or spaces, or press \"Load motifs\" to load a text file with one motif per line. The hits of every motif are saved as a PyMol selection of its own.",
+            wraplength = 400,
+        )
+        point9 = Label(_frame_11,
+            justify = "left",
+            text = "To find sequences with a few differences, choose \"fuzzy (mismatches)\" or \"fuzzy (edits)\", which also allows insertions and deletions, and set the \"max. distance\". All hits are saved in one selection and the hits with the fewest differences in a second one ending with \"_best\".",
+            wraplength = 400,
+        )
+        point10 = Label(_frame_12,
+            justify = "left",
+            text = "Choose \"PROSITE\" to search for a PROSITE pattern, e.g. C-x(2,4)-C-x(3)-[LIVMFYWC]. \"Scan library\" searches the selected or all objects/selections for all motifs of the bundled motif library and saves the hits of every motif as a selection of its own.",
+            wraplength = 400,
+        )
+        point11 = Label(_frame_13,
+            justify = "left",
+            text = "Choose \"alignment (BLOSUM62)\" to find regions similar to the search string by local alignment. Only alignments scoring at least \"min. score\" are kept, each is saved as a selection of its own, grouped and numbered from the best one.",
+            wraplength = 400,
+        )
+        point12 = Label(_frame_14,
+            justify = "left",
+            text = "Choose \"search library\" to search the chains of a library of structure files, e.g. a local PDB mirror, indexed once with \"python CTRL_F.py --build-index\". The first structures with hits are loaded into PyMol and the hits saved as selection starting with \"lib_\".",
+            wraplength = 400,
+        )
+        point13 = Label(_frame_15,
+            justify = "left",
+            text = "Check \"browse hits\" to step through the hits one by one instead of saving them all as selections. In the hit browser, \"Next >\" and \"< Previous\" (or the arrow keys) select and zoom on the hit as \"current_hit\", the page buttons show further hits.",
+            wraplength = 400,
+        )
+        point14 = Label(_frame_16,
+            justify = "left",
+            text = "The queries searched with \"Find\" or Enter are remembered, press \"History\" or the down arrow key in the search field to search for one of them again.",
+            wraplength = 400,
+        )
+        point15 = Label(_frame_17,
+            justify = "left",
+            text = "Set \"max. hits\" to stop a search after the first hits, which is much faster for short search strings in large structures. The status display tells when not all hits are shown, 0 finds all hits.",
+            wraplength = 400,
+        )
         buttonQuit = Button(_frame_1,
             text = "Back",
             width = 15,
@@ -711,21 +1333,61 @@ class CTRLF(Frame):
             foreground = "#990000",
             text = ">",
         )
-
-        # widget commands
-        buttonQuit.configure(
-            command = help_window.destroy
+        _label_19 = Label(_labelframe_1,
+            font = "{MS Sans Serif} 10 bold",
+            foreground = "#990000",
+            text = ">",
         )
-
-        # Open a browser to github when clicking the link
-        point7.bind("<Button-1>", self.open_url_text)
-
-        # Geometry Management
-        _labelframe_1.grid(
-            in_    = help_window,
-            column = 1,
-            row    = 1,
-            columnspan = 1,
+        _label_20 = Label(_labelframe_1,
+            font = "{MS Sans Serif} 10 bold",
+            foreground = "#990000",
+            text = ">",
+        )
+        _label_21 = Label(_labelframe_1,
+            font = "{MS Sans Serif} 10 bold",
+            foreground = "#990000",
+            text = ">",
+        )
+        _label_22 = Label(_labelframe_1,
+            font = "{MS Sans Serif} 10 bold",
+            foreground = "#990000",
+            text = ">",
+        )
+        _label_23 = Label(_labelframe_1,
+            font = "{MS Sans Serif} 10 bold",
+            foreground = "#990000",
+            text = ">",
+        )
+        _label_24 = Label(_labelframe_1,
+            font = "{MS Sans Serif} 10 bold",
+            foreground = "#990000",
+            text = ">",
+        )
+        _label_25 = Label(_labelframe_1,
+            font = "{MS Sans Serif} 10 bold",
+            foreground = "#990000",
+            text = ">",
+        )
+        _label_26 = Label(_labelframe_1,
+            font = "{MS Sans Serif} 10 bold",
+            foreground = "#990000",
+            text = ">",
+        )
+
+        # widget commands
+        buttonQuit.configure(
+            command = help_window.destroy
+        )
+
+        # Open a browser to github when clicking the link
+        point7.bind("<Button-1>", self.open_url_text)
+
+        # Geometry Management
+        _labelframe_1.grid(
+            in_    = help_window,
+            column = 1,
+            row    = 1,
+            columnspan = 1,
             ipadx = 0,
             ipady = 0,
             padx = 0,
@@ -736,7 +1398,7 @@ class CTRLF(Frame):
         _frame_1.grid(
             in_    = _labelframe_1,
             column = 2,
-            row    = 8,
+            row    = 16,
             columnspan = 1,
             ipadx = 0,
             ipady = 0,
@@ -748,7 +1410,7 @@ class CTRLF(Frame):
         _frame_2.grid(
             in_    = _labelframe_1,
             column = 2,
-            row    = 7,
+            row    = 15,
             columnspan = 1,
             ipadx = 0,
             ipady = 0,
@@ -760,7 +1422,7 @@ class CTRLF(Frame):
         _frame_3.grid(
             in_    = _labelframe_1,
             column = 2,
-            row    = 6,
+            row    = 14,
             columnspan = 1,
             ipadx = 0,
             ipady = 0,
@@ -841,6 +1503,102 @@ class CTRLF(Frame):
             rowspan = 1,
             sticky = "news"
         )
+        _frame_10.grid(
+            in_    = _labelframe_1,
+            column = 2,
+            row    = 6,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "news"
+        )
+        _frame_11.grid(
+            in_    = _labelframe_1,
+            column = 2,
+            row    = 7,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "news"
+        )
+        _frame_12.grid(
+            in_    = _labelframe_1,
+            column = 2,
+            row    = 8,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "news"
+        )
+        _frame_13.grid(
+            in_    = _labelframe_1,
+            column = 2,
+            row    = 9,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "news"
+        )
+        _frame_14.grid(
+            in_    = _labelframe_1,
+            column = 2,
+            row    = 10,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "news"
+        )
+        _frame_15.grid(
+            in_    = _labelframe_1,
+            column = 2,
+            row    = 11,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "news"
+        )
+        _frame_16.grid(
+            in_    = _labelframe_1,
+            column = 2,
+            row    = 12,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "news"
+        )
+        _frame_17.grid(
+            in_    = _labelframe_1,
+            column = 2,
+            row    = 13,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "news"
+        )
         point2.grid(
             in_    = _frame_7,
             column = 1,
@@ -925,6 +1683,102 @@ class CTRLF(Frame):
             rowspan = 1,
             sticky = "nw"
         )
+        point8.grid(
+            in_    = _frame_10,
+            column = 1,
+            row    = 1,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        point9.grid(
+            in_    = _frame_11,
+            column = 1,
+            row    = 1,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        point10.grid(
+            in_    = _frame_12,
+            column = 1,
+            row    = 1,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        point11.grid(
+            in_    = _frame_13,
+            column = 1,
+            row    = 1,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        point12.grid(
+            in_    = _frame_14,
+            column = 1,
+            row    = 1,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        point13.grid(
+            in_    = _frame_15,
+            column = 1,
+            row    = 1,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        point14.grid(
+            in_    = _frame_16,
+            column = 1,
+            row    = 1,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
+        point15.grid(
+            in_    = _frame_17,
+            column = 1,
+            row    = 1,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 2,
+            pady = 2,
+            rowspan = 1,
+            sticky = "nw"
+        )
         buttonQuit.grid(
             in_    = _frame_1,
             column = 1,
@@ -988,7 +1842,7 @@ class CTRLF(Frame):
         _label_18.grid(
             in_    = _labelframe_1,
             column = 1,
-            row    = 6,
+            row    = 14,
             columnspan = 1,
             ipadx = 0,
             ipady = 0,
@@ -1009,62 +1863,208 @@ class CTRLF(Frame):
             rowspan = 1,
             sticky = "ne"
         )
-
-        # Resize Behavior
-        help_window.grid_rowconfigure(1, minsize = 4, pad = 0)
-        help_window.grid_columnconfigure(1, minsize = 15, pad = 0)
-        _frame_1.grid_rowconfigure(1, minsize = 39, pad = 0)
-        _frame_1.grid_columnconfigure(1, minsize = 384, pad = 0)
-        _frame_2.grid_rowconfigure(1, minsize = 2, pad = 0)
-        _frame_2.grid_columnconfigure(1, minsize = 40, pad = 0)
-        _frame_3.grid_rowconfigure(1, minsize = 23, pad = 0)
-        _frame_3.grid_columnconfigure(1, minsize = 40, pad = 0)
-        _frame_4.grid_rowconfigure(1, minsize = 40, pad = 0)
-        _frame_4.grid_columnconfigure(1, minsize = 40, pad = 0)
-        _frame_5.grid_rowconfigure(1, minsize = 40, pad = 0)
-        _frame_5.grid_columnconfigure(1, minsize = 40, pad = 0)
-        _frame_6.grid_rowconfigure(1, minsize = 40, pad = 0)
-        _frame_6.grid_columnconfigure(1, minsize = 40, pad = 0)
-        _frame_7.grid_rowconfigure(1, minsize = 40, pad = 0)
-        _frame_7.grid_columnconfigure(1, minsize = 40, pad = 0)
-        _frame_8.grid_rowconfigure(1, minsize = 40, pad = 0)
-        _frame_8.grid_columnconfigure(1, minsize = 40, pad = 0)
-        _frame_9.grid_rowconfigure(1, minsize = 40, pad = 0)
-        _frame_9.grid_columnconfigure(1, minsize = 5, pad = 0)
-        _labelframe_1.grid_rowconfigure(1, minsize = 40, pad = 0)
-        _labelframe_1.grid_rowconfigure(2, minsize = 40, pad = 0)
-        _labelframe_1.grid_rowconfigure(3, minsize = 40, pad = 0)
-        _labelframe_1.grid_rowconfigure(4, minsize = 40, pad = 0)
-        _labelframe_1.grid_rowconfigure(5, minsize = 40, pad = 0)
-        _labelframe_1.grid_rowconfigure(6, minsize = 11, pad = 0)
-        _labelframe_1.grid_rowconfigure(7, minsize = 5, pad = 0)
-        _labelframe_1.grid_rowconfigure(8, minsize = 6, pad = 0)
-        _labelframe_1.grid_columnconfigure(1, minsize = 34, pad = 0)
-        _labelframe_1.grid_columnconfigure(2, minsize = 1, pad = 0)
-
-
-    #=========================================================
-    # Function to open an url from the text of a tkinter label
-    #=========================================================
-    def open_url_text(self, event):
-        webbrowser.open_new(event.widget.cget("text"))
-
-
-    #===============================================================
-    # Function to open an url with a lambda function in the callback
-    #===============================================================
-    def open_url_lambda(self, url):
-        webbrowser.open_new(url)
-
-
-    #==========================================================
+        _label_19.grid(
+            in_    = _labelframe_1,
+            column = 1,
+            row    = 6,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "ne"
+        )
+        _label_20.grid(
+            in_    = _labelframe_1,
+            column = 1,
+            row    = 7,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "ne"
+        )
+        _label_21.grid(
+            in_    = _labelframe_1,
+            column = 1,
+            row    = 8,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "ne"
+        )
+        _label_22.grid(
+            in_    = _labelframe_1,
+            column = 1,
+            row    = 9,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "ne"
+        )
+        _label_23.grid(
+            in_    = _labelframe_1,
+            column = 1,
+            row    = 10,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "ne"
+        )
+        _label_24.grid(
+            in_    = _labelframe_1,
+            column = 1,
+            row    = 11,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "ne"
+        )
+        _label_25.grid(
+            in_    = _labelframe_1,
+            column = 1,
+            row    = 12,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "ne"
+        )
+        _label_26.grid(
+            in_    = _labelframe_1,
+            column = 1,
+            row    = 13,
+            columnspan = 1,
+            ipadx = 0,
+            ipady = 0,
+            padx = 0,
+            pady = 0,
+            rowspan = 1,
+            sticky = "ne"
+        )
+
+        # Resize Behavior
+        help_window.grid_rowconfigure(1, minsize = 4, pad = 0)
+        help_window.grid_columnconfigure(1, minsize = 15, pad = 0)
+        _frame_1.grid_rowconfigure(1, minsize = 39, pad = 0)
+        _frame_1.grid_columnconfigure(1, minsize = 384, pad = 0)
+        _frame_2.grid_rowconfigure(1, minsize = 2, pad = 0)
+        _frame_2.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_3.grid_rowconfigure(1, minsize = 23, pad = 0)
+        _frame_3.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_4.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_4.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_5.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_5.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_6.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_6.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_7.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_7.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_8.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_8.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_9.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_9.grid_columnconfigure(1, minsize = 5, pad = 0)
+        _frame_10.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_10.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_11.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_11.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_12.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_12.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_13.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_13.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_14.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_14.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_15.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_15.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_16.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_16.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _frame_17.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _frame_17.grid_columnconfigure(1, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(1, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(2, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(3, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(4, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(5, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(6, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(7, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(8, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(9, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(10, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(11, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(12, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(13, minsize = 40, pad = 0)
+        _labelframe_1.grid_rowconfigure(14, minsize = 11, pad = 0)
+        _labelframe_1.grid_rowconfigure(15, minsize = 5, pad = 0)
+        _labelframe_1.grid_rowconfigure(16, minsize = 6, pad = 0)
+        _labelframe_1.grid_columnconfigure(1, minsize = 34, pad = 0)
+        _labelframe_1.grid_columnconfigure(2, minsize = 1, pad = 0)
+
+
+    #=========================================================
+    # Function to open an url from the text of a tkinter label
+    #=========================================================
+    def open_url_text(self, event):
+        webbrowser.open_new(event.widget.cget("text"))
+
+
+    #===============================================================
+    # Function to open an url with a lambda function in the callback
+    #===============================================================
+    def open_url_lambda(self, url):
+        webbrowser.open_new(url)
+
+
+    #==========================================================
     # Function to add a search to the list of existing searches
     #==========================================================
     def add_list(self, *args):
         search_term = self.search_var.get()
 
-        if not search_term in searchhistory:
-            searchhistory.append(search_term)
+        add_search_history(search_term)
+
+
+    #==================================================================
+    # Function for filling the history menu with the recent searches,
+    # the ones whose hits are still in the result cache come first
+    #==================================================================
+    def fill_history_menu(self, *args):
+        self.menuHistory.delete(0, END)
+
+        queries = search_history()
+        for query in queries:
+            self.menuHistory.add_command(label = query,
+                                         command = lambda query=query: self.select_history(query))
+        if not queries:
+            self.menuHistory.add_command(label = "No searches yet", state = DISABLED)
+
+    # Helper function for opening the history menu below the searchbox
+    def show_history_menu(self, *args):
+        self.fill_history_menu()
+        self.menuHistory.post(self.entry.winfo_rootx(),
+                              self.entry.winfo_rooty() + self.entry.winfo_height())
+        return "break"
+
+    # Helper function for searching again for a query of the history menu
+    def select_history(self, query):
+        self.search_var.set(query)
+        self.action_findbutton()
 
 
     #===========================================================================
@@ -1097,15 +2097,45 @@ class CTRLF(Frame):
         interactive = self.interactive.get()
 
 
+    #===========================================================
+    # Function for the Find button and the Enter key, the search
+    # term is added to the search history before searching
+    #===========================================================
+    def action_findbutton(self, *args):
+        self.add_list()
+        self.action_searchbutton()
+
+
     #======================================
     # Function for the actual search action
     #======================================
     def action_searchbutton(self, *args):
 
+        # A search that is started directly (Find button or Enter key)
+        # makes a pending interactive search obsolete
+        self.cancel_scheduled_search()
+
         # Get the variables of the searchall and interactive checkboxes
         searchall = self.searchall.get()
         interactive = self.interactive.get()
 
+        # Lists of motifs and fuzzy searches have modes of their own
+        if self.search_mode.get() == "motif list":
+            self.action_searchbutton_motifs()
+            return
+        if self.search_mode.get().startswith("fuzzy"):
+            self.action_searchbutton_fuzzy()
+            return
+        if self.search_mode.get() == "PROSITE":
+            self.action_searchbutton_prosite()
+            return
+        if self.search_mode.get() == "alignment (BLOSUM62)":
+            self.action_searchbutton_alignment()
+            return
+        if self.search_mode.get() == "search library":
+            self.action_searchbutton_library()
+            return
+
         # Check if an interactive search should be performed
 
         # if no, do the normal searches
@@ -1140,60 +2170,37 @@ class CTRLF(Frame):
             self.searchstrings = []
             self.searchstrings.append(search_term)
 
-            # Try the following
-            # Go to except, e.g. when no selection or object from the pymol list has been selected
-            try:
-                # Get the single selected object/selection
+            # Get the single selected object/selection
+            search_selection = self.get_search_selection()
 
-                # If only one PyMol object is available, automatically select that
-                if len(cmd.get_names("objects",1)) == 1:
-                    search_selection = cmd.get_names("objects",1)[0]
-                # if not, let the user choose from the list of objects/selection
-                else:
-                    search_selection = self.pymol_selection
-
-                # do the search and name it tempsele
-                findseq(self.searchstrings[0], search_selection,
-                        selName="tempsele", het = 0, firstOnly = 0)
-
-                # if there are no atoms in the tempsele, i.e. nothing has been found, delete it
-                if cmd.count_atoms("tempsele") == 0:
-                    cmd.delete("tempsele")
-                    self.labelStatusDisplay.configure(text="Nothing found!")
-                # else, get the amino acid sequence of the returned sele
-                # and name the returned sele by its object and the returned amino acids
-                else:
-                    return_fasta = cmd.get_fastastr("tempsele")
-                    return_list = return_fasta.split("\n")
-                    return_seq = return_list[1]
-                    return_sele = "%s_%s" % (search_selection, return_seq)
-                    cmd.set_name("tempsele", return_sele)
+            if search_selection is None:
+                # Tell the user something went wrong
+                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+            else:
+                # do the search in the background, the hits are saved by finish_searchbutton_single
+                self.start_search(search_term, [search_selection],
+                                  lambda results: self.finish_searchbutton_single(search_selection, results))
 
-                    # Append the selection to a list that is needed for deleting old searches
-                    self.oldsearches.append(return_sele)
+    # Helper function for action_searchbutton_single, called with the results of the search
+    def finish_searchbutton_single(self, search_selection, results):
+        (haystack, index, spans) = results[0]
 
-                    # Display a status message
-                    self.labelStatusDisplay.configure(text="Search saved as %s" %
-                                                      return_sele)
+        # if nothing has been found, there is nothing to save
+        if len(spans) == 0:
+            self.labelStatusDisplay.configure(text="Nothing found!")
 
-                    # Enable the returned selection
-                    cmd.enable(return_sele)
+        # else, name the returned sele by its object and the returned amino acids
+        else:
+            (start, stop) = spans[0]
+            return_seq = index.AAs[start:stop]
+            return_sele = "%s_%s" % (search_selection, return_seq)
 
-            except:
-                # Tell the user something went wrong
-                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
-            
-            # Now try if the selection that has been found is empty, i.e. nothing has been found
-            # In this case delete the returned selection immediately
-            try:
-                # Check if the selection contains amino acids, thus something has been found
-                if cmd.count_atoms(return_sele) == 0:
-                    self.labelStatusDisplay.configure(text="Nothing found!")
-                    cmd.delete(return_sele)
+            # Append the selection to a list that is needed for deleting old searches
+            self.oldsearches.append(return_sele)
 
-            # If the returned selection has something in it (i.e. something has been found), do nothing
-            except:
-                pass
+            # Save and enable the returned selection and display a status message
+            self.save_selections([(return_sele, [(index, spans)])],
+                                 "Search saved as %s" % return_sele)
 
 
     #================================================================
@@ -1216,51 +2223,33 @@ class CTRLF(Frame):
                 self.searchstrings = []
                 self.searchstrings.append(search_term)
 
-                # Try the following
-                # Go to except, e.g. when no selection or object from the pymol list has been selected
-                try:
-                    # Get the single selected object/selection
-
-                    # If only one PyMol object is available, automatically select that
-                    if len(cmd.get_names("objects",1)) == 1:
-                        search_selection = cmd.get_names("objects",1)[0]
-                    # if not, let the user choose from the list of objects/selection
-                    else:
-                        search_selection = self.pymol_selection
-
-                    # Generate an empty pymol selection, called "interactive"
-                    cmd.select("interactive", "None")
-
-                    # Now do the actual find work
-                    # call the findseq function with the following arguments
-                    # needle = self.searchstrings[0]
-                    # haystack = search_selection
-                    # selName = "interactive" --> gets overwritten after each search
-                    findseq(self.searchstrings[0], search_selection, selName="interactive", het=0, firstOnly=0)
-
-                    # Tell a status
-                    self.labelStatusDisplay.configure(text="Search saved as \"interactive\"" )
-
-                    # Enable the returned selection
-                    cmd.enable("interactive")
-
+                # Get the single selected object/selection
+                search_selection = self.get_search_selection()
 
-                except:
+                if search_selection is None:
                     # Tell the user to select a pymol object/selection first
                     self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+                else:
+                    # Now do the actual find work in the background
+                    # the hits are saved as "interactive" --> gets overwritten after each search
+                    self.start_search(search_term, [search_selection],
+                                      lambda results: self.finish_interactive("interactive", results))
+
+    # Helper function for the interactive searches, called with the results of the search
+    def finish_interactive(self, return_selection, results):
+        # Combine the hits of all searched objects/selections into a single selection
+        parts = [(index, spans) for (haystack, index, spans) in results if spans]
 
-                
-                # Now try if the selection that has been found is empty, i.e. nothing has been found
-                # In this case delete the returned selection immediately
-                try:
-                    # Check if the selection contains amino acids, thus something has been found
-                    if cmd.count_atoms("interactive") == 0:
-                        self.labelStatusDisplay.configure(text="Nothing found!")
-                        cmd.delete("interactive")
+        # If nothing has been found, delete the returned selection of the last search
+        if len(parts) == 0:
+            self.labelStatusDisplay.configure(text="Nothing found!")
+            cmd.delete(return_selection)
+
+        else:
+            # Save and enable the returned selection and tell a status
+            self.save_selections([(return_selection, parts)],
+                                 "Search saved as \"%s\"" % return_selection)
 
-                # If the returned selection has something in it (i.e. something has been found), do nothing
-                except:
-                    pass
 
     #================================================================
     # Function for a search in all objects/selection, non-interactive
@@ -1277,85 +2266,49 @@ class CTRLF(Frame):
             self.searchstrings = []
             self.searchstrings.append(search_term)
 
-            # Try the following
-            # Go to except, e.g. when no selection or object from the pymol list has been selected
-            try: 
-                
-                # Generate a string for combining the intermediary search results into a single selection
-                selection_string = ""
-
-                # Itereate through all available pymol objects/selections
-                for i, ObjSel in enumerate(self.pymollist):
-                    search_selection = ObjSel            
-                    findseq(self.searchstrings[0], search_selection, selName="sele_%i" % i, het=0, firstOnly=0)
-
-                    # Append the current returned selection to the selection_string
-                    selection_string += "sele_%i," % i
-
-                # Remove last comma from selection string
-                selection_string = selection_string[:-1]
-
-                # Generate a return selection that is named "all_SEARCHSTRING"
-
-                # if no regex has been provided as a search string
-                if search_term.isalnum():
-                    return_selection = "all_%s" % self.searchstrings[0].upper()                    
-                    cmd.select(return_selection, selection_string)
-                    self.oldsearches.append("all_%s" % self.searchstrings[0])
-
-                    self.labelStatusDisplay.configure(text="Search saved as all_%s" %
-                                                      self.searchstrings[0])
-
-                    cmd.enable("all_%s" % self.searchstrings[0])
-
-                    # Delete the intermediary selections
-                    for i, ObjSel in enumerate(self.pymollist):
-                        cmd.delete("sele_%i" % i)
-
-                # if regex has been used as a search string
-                # it is not possible to name a Pymol selection (i.e. the returned hit)
-                # with regex special characters
-                # thus the returned hit will be named with the current datetime stamp
-                else:
-                    # get the current datetime
-                    now = datetime.datetime.now()
-                    # and make a timestamp out of it
-                    rand = "%i%i%i" % (now.hour, now.minute, now.second)
-
-                    # and generate a name for the returned hit selection
-                    return_selection = "all_%s" % rand
+            # Every object is searched once, selections only contain atoms of the objects
+            haystacks = self.get_search_all()
+            if len(haystacks) == 0:
+                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+            else:
+                # Search all available pymol objects in the background
+                self.start_search(search_term, haystacks,
+                                  lambda results: self.finish_searchbutton_all(search_term, results))
 
-                    # combine all temporary hit selection to the final return selection
-                    cmd.select(return_selection, selection_string)
+    # Helper function for action_searchbutton_all, called with the results of the search
+    def finish_searchbutton_all(self, search_term, results):
+        # Collect the search results for combining them into a single selection
+        parts = [(index, spans) for (haystack, index, spans) in results if spans]
 
-                    # append the hit to the list of previous hits
-                    self.oldsearches.append("all_%s" % rand)
+        if len(parts) == 0:
+            self.labelStatusDisplay.configure(text="Nothing found!")
+            return
 
-                    # display a status message
-                    self.labelStatusDisplay.configure(text="Search saved as all_%s" % rand)
+        # Generate a return selection that is named "all_SEARCHSTRING"
 
-                    # and show the returned selection
-                    cmd.enable("all_%s" % rand)
+        # if no regex has been provided as a search string
+        if search_term.isalnum():
+            return_selection = "all_%s" % search_term
 
-                    # Delete the intermediary selections
-                    for i, ObjSel in enumerate(self.pymollist):
-                        cmd.delete("sele_%i" % i)
+        # if regex has been used as a search string
+        # it is not possible to name a Pymol selection (i.e. the returned hit)
+        # with regex special characters
+        # thus the returned hit will be named with the current datetime stamp
+        else:
+            # get the current datetime
+            now = datetime.datetime.now()
+            # and make a timestamp out of it
+            rand = "%i%i%i" % (now.hour, now.minute, now.second)
 
-            except:
-                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+            # and generate a name for the returned hit selection
+            return_selection = "all_%s" % rand
 
-        
-        # Now try if the selection that has been found is empty, i.e. nothing has been found
-        # In this case delete the returned selection immediately
-        try:
-            # Check if the selection contains amino acids, thus something has been found
-            if cmd.count_atoms(self.oldsearches[-1]) == 0:
-                self.labelStatusDisplay.configure(text="Nothing found!")
-                cmd.delete(self.oldsearches[-1])
+        # append the hit to the list of previous hits
+        self.oldsearches.append(return_selection)
 
-        # If the returned selection has something in it (i.e. something has been found), do nothing
-        except:
-            pass
+        # combine all hits to the final return selection, show it and display a status message
+        self.save_selections([(return_selection, parts)],
+                             "Search saved as %s" % return_selection)
 
 
     #=================================================================
@@ -1379,398 +2332,3180 @@ class CTRLF(Frame):
                 self.searchstrings = []
                 self.searchstrings.append(search_term)
 
-                # Try the following
-                # Go to except, e.g. when no selection or object from the pymol list has been selected
-                try: 
-                    
-                    # Generate a string for combining the intermediary search results into a single selection
-                    selection_string = ""
+                haystacks = self.get_search_all()
+                if len(haystacks) == 0:
+                    self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+                else:
+                    # Search all available pymol objects in the background
+                    # the hits are saved as "interactive_all" --> gets overwritten after each search
+                    self.start_search(search_term, haystacks,
+                                      lambda results: self.finish_interactive("interactive_all", results))
 
-                    # Generate an empty pymol selection, called "interactive"
-                    cmd.select("interactive_all", "None")
 
-                    # Iterate through all available pymol objects/selections
-                    for i, ObjSel in enumerate(self.pymollist):
-                        # Select the pymol selection/object
-                        search_selection = ObjSel
+    #=======================================================================
+    # Function for a search of a list of motifs in a single or all selections
+    #=======================================================================
+    def action_searchbutton_motifs(self, *args):
+        # Get the motifs from the search term
+        motifs = parse_motifs(self.search_var.get())
 
-                        # Now do the actual find work
-                        # call the findseq function with the following arguments
-                        # needle = self.searchstrings[0]
-                        # haystack = search_selection
-                        # selName = "interactive" --> gets overwritten after each search
-                        findseq(self.searchstrings[0], search_selection, selName="sele_%i" % i, het=0, firstOnly=0)
+        if len(motifs) == 0:
+            self.labelStatusDisplay.configure(text="Please provide a search term")
 
-                        # Append the current returned selection to the selection_string
-                        selection_string += "sele_%i," % i
+        elif not all([motif.isalnum() for motif in motifs]):
+            self.labelStatusDisplay.configure(text="Regex not possible in motif lists")
 
-                    # Remove last comma from selection string
-                    selection_string = selection_string[:-1]
+        else:
+            # Get the objects/selections to search in
+            # and the prefix of the returned selections
+            if self.searchall.get() == 1:
+                haystacks = self.get_search_all()
+                prefix = "all"
+            else:
+                search_selection = self.get_search_selection()
+                haystacks = [search_selection] if search_selection is not None else []
+                prefix = search_selection
 
-                    # Generate a return selection that is named "all_SEARCHSTRING"
-                    return_selection = "interactive_all"
-                    cmd.select(return_selection, selection_string)
+            if len(haystacks) == 0:
+                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+            else:
+                # All motifs are searched in one pass over each sequence
+                automaton = MotifAutomaton(motifs)
+                self.start_search(automaton, haystacks,
+                                  lambda results: self.finish_searchbutton_motifs(prefix, automaton, results))
+
+    # Helper function for action_searchbutton_motifs, called with the results of the search
+    def finish_searchbutton_motifs(self, prefix, automaton, results):
+        # Save the hits of every motif as a selection of its own
+        selections = []
+        for motif in automaton.motifs:
+            parts = [(index, hits[motif]) for (haystack, index, hits) in results if hits[motif]]
+            if len(parts) == 0:
+                continue
+
+            return_selection = "%s_%s" % (prefix, motif)
+            self.oldsearches.append(return_selection)
+            selections.append((return_selection, parts))
+
+        if len(selections) == 0:
+            self.labelStatusDisplay.configure(text="Nothing found!")
+        else:
+            self.save_selections(selections, "Hits of %i of %i motifs saved as %s_MOTIF" %
+                                 (len(selections), len(automaton.motifs), prefix))
 
-                    # Delete the intermediary selections
-                    for i, ObjSel in enumerate(self.pymollist):
-                        cmd.delete("sele_%i" % i)
 
-                    # Append the returned search to the list of oldsearches
-                    # Required for cecking if the search is empty or not, see below
-                    # self.oldsearches.append("all_%s" % self.searchstrings[0])
+    #=====================================================================
+    # Function for an approximate search in a single or all selections,
+    # allowing for a maximum number of mismatches or edits
+    #=====================================================================
+    def action_searchbutton_fuzzy(self, *args):
+        # Get the search term
+        search_term = self.search_var.get().strip()
 
-                    # Tell a status
-                    self.labelStatusDisplay.configure(text="Search saved as interactive_all")
+        try:
+            max_distance = int(self.max_distance.get())
+        except (ValueError, TclError):
+            max_distance = -1
 
-                    # Enable the returned selection
-                    cmd.enable("interactive_all")
+        if search_term == "":
+            self.labelStatusDisplay.configure(text="Please provide a search term")
 
+        elif not search_term.isalnum():
+            self.labelStatusDisplay.configure(text="Regex not possible in fuzzy mode")
 
-                except:
-                    self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+        elif max_distance < 0:
+            self.labelStatusDisplay.configure(text="Please provide a valid max. distance")
 
-                
-                # Now try if the selection that has been found is empty, i.e. nothing has been found
-                # In this case delete the returned selection immediately
-                try:
-                    # Check if the selection contains amino acids, thus something has been found
-                    if cmd.count_atoms("interactive_all") == 0:
-                        self.labelStatusDisplay.configure(text="Nothing found!")
-                        cmd.delete("interactive_all")
+        else:
+            # Get the objects/selections to search in
+            # and the prefix of the returned selections
+            if self.searchall.get() == 1:
+                haystacks = self.get_search_all()
+                prefix = "all"
+            else:
+                search_selection = self.get_search_selection()
+                haystacks = [search_selection] if search_selection is not None else []
+                prefix = search_selection
 
-                # If the returned selection has something in it (i.e. something has been found), do nothing
-                except:
-                    pass
+            if len(haystacks) == 0:
+                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+            else:
+                indels = int(self.search_mode.get() == "fuzzy (edits)")
+                query = FuzzyQuery(search_term, max_distance, indels)
+                return_selection = "%s_%s_k%i" % (prefix, query.query, max_distance)
+                self.start_search(query, haystacks,
+                                  lambda results: self.finish_searchbutton_fuzzy(return_selection, results))
+
+    # Helper function for action_searchbutton_fuzzy, called with the results of the search
+    def finish_searchbutton_fuzzy(self, return_selection, results):
+        hits = [hit for (haystack, index, spans) in results for hit in spans]
+
+        if len(hits) == 0:
+            self.labelStatusDisplay.configure(text="Nothing found!")
+            return
+
+        # Save all hits, and the best hits as a selection of its own
+        best = min([distance for (start, stop, distance) in hits])
+        parts = [(index, spans) for (haystack, index, spans) in results if spans]
+        best_parts = [(index, [span for span in spans if span[2] == best]) for (index, spans) in parts]
+
+        self.oldsearches.append(return_selection)
+        self.oldsearches.append(return_selection + "_best")
+
+        # Tell how many hits have been found for each distance
+        counts = collections.Counter([distance for (start, stop, distance) in hits])
+        self.save_selections([(return_selection, parts), (return_selection + "_best", best_parts)],
+                             "%i hits (%s) saved as %s" %
+                             (len(hits),
+                              ", ".join(["%i with distance %i" % (counts[distance], distance)
+                                         for distance in sorted(counts)]),
+                              return_selection))
 
 
-    #====================================
-    # Function for deleting previous hits
-    #====================================
-    def action_deletebutton(self, *args):
-        # delete all old hits from non-interactive searches
-        # these hits are stored in the list self.oldsearches
-        for item in self.oldsearches:
-            cmd.delete(item)
+    #===============================================================
+    # Function for a search of a PROSITE pattern, e.g. N-{P}-[ST]-{P}
+    # in a single or all selections
+    #===============================================================
+    def action_searchbutton_prosite(self, *args):
+        # Get the search term
+        search_term = self.search_var.get().strip()
 
-        # delete the hits from interactive searches
-        # these are always named "interactive"
-        # or "interactive_all"
-        cmd.delete("interactive")
-        cmd.delete("interactive_all")
+        if search_term == "":
+            self.labelStatusDisplay.configure(text="Please provide a search term")
+            return
 
-        # Show a status message
-        self.labelStatusDisplay.configure(text="Cleared all hits")
+        try:
+            query = PrositeQuery(search_term)
+        except ValueError as e:
+            self.labelStatusDisplay.configure(text=str(e))
+            return
+
+        # The hits are saved like those of regular expressions
+        if self.searchall.get() == 1:
+            haystacks = self.get_search_all()
+            if len(haystacks) == 0:
+                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+            else:
+                self.start_search(query, haystacks,
+                                  lambda results: self.finish_searchbutton_all(search_term, results))
+        else:
+            search_selection = self.get_search_selection()
+            if search_selection is None:
+                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+            else:
+                self.start_search(query, [search_selection],
+                                  lambda results: self.finish_searchbutton_single(search_selection, results))
 
-        
 
+    #=====================================================================
+    # Function for a local alignment search of a peptide with BLOSUM62
+    # scores in every chain of a single or all selections
+    #=====================================================================
+    def action_searchbutton_alignment(self, *args):
+        # Get the search term
+        search_term = self.search_var.get().strip()
 
-"""
-Functions from findseq by Jason Vertrees, 2009
-"""
+        try:
+            min_score = int(self.min_score.get())
+        except (ValueError, TclError):
+            min_score = -1
 
-def findseq(needle, haystack, selName=None, het=0, firstOnly=0):
-    # set the name of the selection to return.
-    if selName == None:
-        rSelName = "foundSeq" + str(random.randint(0, 32000))
-        selName = rSelName
-    elif selName == "sele":
-        rSelName = "sele"
-    else:
-        rSelName = selName
+        if search_term == "":
+            self.labelStatusDisplay.configure(text="Please provide a search term")
 
-    # input checking
-    if not checkParams(needle, haystack, selName, het, firstOnly):
-        #print("There was an error with a parameter.  Please see")
-        #print("the above error message for how to fix it.")
-        return None
+        elif not search_term.isalpha():
+            self.labelStatusDisplay.configure(text="Regex not possible in alignment mode")
 
-    one_letter = {
-        '00C': 'C', '01W': 'X', '0A0': 'D', '0A1': 'Y', '0A2': 'K',
-        '0A8': 'C', '0AA': 'V', '0AB': 'V', '0AC': 'G', '0AD': 'G',
-        '0AF': 'W', '0AG': 'L', '0AH': 'S', '0AK': 'D', '0AM': 'A',
-        '0AP': 'C', '0AU': 'U', '0AV': 'A', '0AZ': 'P', '0BN': 'F',
-        '0C ': 'C', '0CS': 'A', '0DC': 'C', '0DG': 'G', '0DT': 'T',
-        '0G ': 'G', '0NC': 'A', '0SP': 'A', '0U ': 'U', '0YG': 'YG',
-        '10C': 'C', '125': 'U', '126': 'U', '127': 'U', '128': 'N',
-        '12A': 'A', '143': 'C', '175': 'ASG', '193': 'X', '1AP': 'A',
-        '1MA': 'A', '1MG': 'G', '1PA': 'F', '1PI': 'A', '1PR': 'N',
-        '1SC': 'C', '1TQ': 'W', '1TY': 'Y', '200': 'F', '23F': 'F',
-        '23S': 'X', '26B': 'T', '2AD': 'X', '2AG': 'G', '2AO': 'X',
-        '2AR': 'A', '2AS': 'X', '2AT': 'T', '2AU': 'U', '2BD': 'I',
-        '2BT': 'T', '2BU': 'A', '2CO': 'C', '2DA': 'A', '2DF': 'N',
-        '2DM': 'N', '2DO': 'X', '2DT': 'T', '2EG': 'G', '2FE': 'N',
-        '2FI': 'N', '2FM': 'M', '2GT': 'T', '2HF': 'H', '2LU': 'L',
-        '2MA': 'A', '2MG': 'G', '2ML': 'L', '2MR': 'R', '2MT': 'P',
-        '2MU': 'U', '2NT': 'T', '2OM': 'U', '2OT': 'T', '2PI': 'X',
-        '2PR': 'G', '2SA': 'N', '2SI': 'X', '2ST': 'T', '2TL': 'T',
-        '2TY': 'Y', '2VA': 'V', '32S': 'X', '32T': 'X', '3AH': 'H',
-        '3AR': 'X', '3CF': 'F', '3DA': 'A', '3DR': 'N', '3GA': 'A',
-        '3MD': 'D', '3ME': 'U', '3NF': 'Y', '3TY': 'X', '3XH': 'G',
-        '4AC': 'N', '4BF': 'Y', '4CF': 'F', '4CY': 'M', '4DP': 'W',
-        '4F3': 'GYG', '4FB': 'P', '4FW': 'W', '4HT': 'W', '4IN': 'X',
-        '4MF': 'N', '4MM': 'X', '4OC': 'C', '4PC': 'C', '4PD': 'C',
-        '4PE': 'C', '4PH': 'F', '4SC': 'C', '4SU': 'U', '4TA': 'N',
-        '5AA': 'A', '5AT': 'T', '5BU': 'U', '5CG': 'G', '5CM': 'C',
-        '5CS': 'C', '5FA': 'A', '5FC': 'C', '5FU': 'U', '5HP': 'E',
-        '5HT': 'T', '5HU': 'U', '5IC': 'C', '5IT': 'T', '5IU': 'U',
-        '5MC': 'C', '5MD': 'N', '5MU': 'U', '5NC': 'C', '5PC': 'C',
-        '5PY': 'T', '5SE': 'U', '5ZA': 'TWG', '64T': 'T', '6CL': 'K',
-        '6CT': 'T', '6CW': 'W', '6HA': 'A', '6HC': 'C', '6HG': 'G',
-        '6HN': 'K', '6HT': 'T', '6IA': 'A', '6MA': 'A', '6MC': 'A',
-        '6MI': 'N', '6MT': 'A', '6MZ': 'N', '6OG': 'G', '70U': 'U',
-        '7DA': 'A', '7GU': 'G', '7JA': 'I', '7MG': 'G', '8AN': 'A',
-        '8FG': 'G', '8MG': 'G', '8OG': 'G', '9NE': 'E', '9NF': 'F',
-        '9NR': 'R', '9NV': 'V', 'A  ': 'A', 'A1P': 'N', 'A23': 'A',
-        'A2L': 'A', 'A2M': 'A', 'A34': 'A', 'A35': 'A', 'A38': 'A',
-        'A39': 'A', 'A3A': 'A', 'A3P': 'A', 'A40': 'A', 'A43': 'A',
-        'A44': 'A', 'A47': 'A', 'A5L': 'A', 'A5M': 'C', 'A5O': 'A',
-        'A66': 'X', 'AA3': 'A', 'AA4': 'A', 'AAR': 'R', 'AB7': 'X',
-        'ABA': 'A', 'ABR': 'A', 'ABS': 'A', 'ABT': 'N', 'ACB': 'D',
-        'ACL': 'R', 'AD2': 'A', 'ADD': 'X', 'ADX': 'N', 'AEA': 'X',
-        'AEI': 'D', 'AET': 'A', 'AFA': 'N', 'AFF': 'N', 'AFG': 'G',
-        'AGM': 'R', 'AGT': 'X', 'AHB': 'N', 'AHH': 'X', 'AHO': 'A',
-        'AHP': 'A', 'AHS': 'X', 'AHT': 'X', 'AIB': 'A', 'AKL': 'D',
-        'ALA': 'A', 'ALC': 'A', 'ALG': 'R', 'ALM': 'A', 'ALN': 'A',
-        'ALO': 'T', 'ALQ': 'X', 'ALS': 'A', 'ALT': 'A', 'ALY': 'K',
-        'AP7': 'A', 'APE': 'X', 'APH': 'A', 'API': 'K', 'APK': 'K',
-        'APM': 'X', 'APP': 'X', 'AR2': 'R', 'AR4': 'E', 'ARG': 'R',
-        'ARM': 'R', 'ARO': 'R', 'ARV': 'X', 'AS ': 'A', 'AS2': 'D',
-        'AS9': 'X', 'ASA': 'D', 'ASB': 'D', 'ASI': 'D', 'ASK': 'D',
-        'ASL': 'D', 'ASM': 'X', 'ASN': 'N', 'ASP': 'D', 'ASQ': 'D',
-        'ASU': 'N', 'ASX': 'B', 'ATD': 'T', 'ATL': 'T', 'ATM': 'T',
-        'AVC': 'A', 'AVN': 'X', 'AYA': 'A', 'AYG': 'AYG', 'AZK': 'K',
-        'AZS': 'S', 'AZY': 'Y', 'B1F': 'F', 'B1P': 'N', 'B2A': 'A',
-        'B2F': 'F', 'B2I': 'I', 'B2V': 'V', 'B3A': 'A', 'B3D': 'D',
-        'B3E': 'E', 'B3K': 'K', 'B3L': 'X', 'B3M': 'X', 'B3Q': 'X',
-        'B3S': 'S', 'B3T': 'X', 'B3U': 'H', 'B3X': 'N', 'B3Y': 'Y',
-        'BB6': 'C', 'BB7': 'C', 'BB9': 'C', 'BBC': 'C', 'BCS': 'C',
-        'BCX': 'C', 'BE2': 'X', 'BFD': 'D', 'BG1': 'S', 'BGM': 'G',
-        'BHD': 'D', 'BIF': 'F', 'BIL': 'X', 'BIU': 'I', 'BJH': 'X',
-        'BLE': 'L', 'BLY': 'K', 'BMP': 'N', 'BMT': 'T', 'BNN': 'A',
-        'BNO': 'X', 'BOE': 'T', 'BOR': 'R', 'BPE': 'C', 'BRU': 'U',
-        'BSE': 'S', 'BT5': 'N', 'BTA': 'L', 'BTC': 'C', 'BTR': 'W',
-        'BUC': 'C', 'BUG': 'V', 'BVP': 'U', 'BZG': 'N', 'C  ': 'C',
-        'C12': 'TYG', 'C1X': 'K', 'C25': 'C', 'C2L': 'C', 'C2S': 'C',
-        'C31': 'C', 'C32': 'C', 'C34': 'C', 'C36': 'C', 'C37': 'C',
-        'C38': 'C', 'C3Y': 'C', 'C42': 'C', 'C43': 'C', 'C45': 'C',
-        'C46': 'C', 'C49': 'C', 'C4R': 'C', 'C4S': 'C', 'C5C': 'C',
-        'C66': 'X', 'C6C': 'C', 'C99': 'TFG', 'CAF': 'C', 'CAL': 'X',
-        'CAR': 'C', 'CAS': 'C', 'CAV': 'X', 'CAY': 'C', 'CB2': 'C',
-        'CBR': 'C', 'CBV': 'C', 'CCC': 'C', 'CCL': 'K', 'CCS': 'C',
-        'CCY': 'CYG', 'CDE': 'X', 'CDV': 'X', 'CDW': 'C', 'CEA': 'C',
-        'CFL': 'C', 'CFY': 'FCYG', 'CG1': 'G', 'CGA': 'E', 'CGU': 'E',
-        'CH ': 'C', 'CH6': 'MYG', 'CH7': 'KYG', 'CHF': 'X', 'CHG': 'X',
-        'CHP': 'G', 'CHS': 'X', 'CIR': 'R', 'CJO': 'GYG', 'CLE': 'L',
-        'CLG': 'K', 'CLH': 'K', 'CLV': 'AFG', 'CM0': 'N', 'CME': 'C',
-        'CMH': 'C', 'CML': 'C', 'CMR': 'C', 'CMT': 'C', 'CNU': 'U',
-        'CP1': 'C', 'CPC': 'X', 'CPI': 'X', 'CQR': 'GYG', 'CR0': 'TLG',
-        'CR2': 'GYG', 'CR5': 'G', 'CR7': 'KYG', 'CR8': 'HYG', 'CRF': 'TWG',
-        'CRG': 'THG', 'CRK': 'MYG', 'CRO': 'GYG', 'CRQ': 'QYG', 'CRU': 'E',
-        'CRW': 'ASG', 'CRX': 'ASG', 'CS0': 'C', 'CS1': 'C', 'CS3': 'C',
-        'CS4': 'C', 'CS8': 'N', 'CSA': 'C', 'CSB': 'C', 'CSD': 'C',
-        'CSE': 'C', 'CSF': 'C', 'CSH': 'SHG', 'CSI': 'G', 'CSJ': 'C',
-        'CSL': 'C', 'CSO': 'C', 'CSP': 'C', 'CSR': 'C', 'CSS': 'C',
-        'CSU': 'C', 'CSW': 'C', 'CSX': 'C', 'CSY': 'SYG', 'CSZ': 'C',
-        'CTE': 'W', 'CTG': 'T', 'CTH': 'T', 'CUC': 'X', 'CWR': 'S',
-        'CXM': 'M', 'CY0': 'C', 'CY1': 'C', 'CY3': 'C', 'CY4': 'C',
-        'CYA': 'C', 'CYD': 'C', 'CYF': 'C', 'CYG': 'C', 'CYJ': 'X',
-        'CYM': 'C', 'CYQ': 'C', 'CYR': 'C', 'CYS': 'C', 'CZ2': 'C',
-        'CZO': 'GYG', 'CZZ': 'C', 'D11': 'T', 'D1P': 'N', 'D3 ': 'N',
-        'D33': 'N', 'D3P': 'G', 'D3T': 'T', 'D4M': 'T', 'D4P': 'X',
-        'DA ': 'A', 'DA2': 'X', 'DAB': 'A', 'DAH': 'F', 'DAL': 'A',
-        'DAR': 'R', 'DAS': 'D', 'DBB': 'T', 'DBM': 'N', 'DBS': 'S',
-        'DBU': 'T', 'DBY': 'Y', 'DBZ': 'A', 'DC ': 'C', 'DC2': 'C',
-        'DCG': 'G', 'DCI': 'X', 'DCL': 'X', 'DCT': 'C', 'DCY': 'C',
-        'DDE': 'H', 'DDG': 'G', 'DDN': 'U', 'DDX': 'N', 'DFC': 'C',
-        'DFG': 'G', 'DFI': 'X', 'DFO': 'X', 'DFT': 'N', 'DG ': 'G',
-        'DGH': 'G', 'DGI': 'G', 'DGL': 'E', 'DGN': 'Q', 'DHA': 'A',
-        'DHI': 'H', 'DHL': 'X', 'DHN': 'V', 'DHP': 'X', 'DHU': 'U',
-        'DHV': 'V', 'DI ': 'I', 'DIL': 'I', 'DIR': 'R', 'DIV': 'V',
-        'DLE': 'L', 'DLS': 'K', 'DLY': 'K', 'DM0': 'K', 'DMH': 'N',
-        'DMK': 'D', 'DMT': 'X', 'DN ': 'N', 'DNE': 'L', 'DNG': 'L',
-        'DNL': 'K', 'DNM': 'L', 'DNP': 'A', 'DNR': 'C', 'DNS': 'K',
-        'DOA': 'X', 'DOC': 'C', 'DOH': 'D', 'DON': 'L', 'DPB': 'T',
-        'DPH': 'F', 'DPL': 'P', 'DPP': 'A', 'DPQ': 'Y', 'DPR': 'P',
-        'DPY': 'N', 'DRM': 'U', 'DRP': 'N', 'DRT': 'T', 'DRZ': 'N',
-        'DSE': 'S', 'DSG': 'N', 'DSN': 'S', 'DSP': 'D', 'DT ': 'T',
-        'DTH': 'T', 'DTR': 'W', 'DTY': 'Y', 'DU ': 'U', 'DVA': 'V',
-        'DXD': 'N', 'DXN': 'N', 'DYG': 'DYG', 'DYS': 'C', 'DZM': 'A',
-        'E  ': 'A', 'E1X': 'A', 'EDA': 'A', 'EDC': 'G', 'EFC': 'C',
-        'EHP': 'F', 'EIT': 'T', 'ENP': 'N', 'ESB': 'Y', 'ESC': 'M',
-        'EXY': 'L', 'EY5': 'N', 'EYS': 'X', 'F2F': 'F', 'FA2': 'A',
-        'FA5': 'N', 'FAG': 'N', 'FAI': 'N', 'FCL': 'F', 'FFD': 'N',
-        'FGL': 'G', 'FGP': 'S', 'FHL': 'X', 'FHO': 'K', 'FHU': 'U',
-        'FLA': 'A', 'FLE': 'L', 'FLT': 'Y', 'FME': 'M', 'FMG': 'G',
-        'FMU': 'N', 'FOE': 'C', 'FOX': 'G', 'FP9': 'P', 'FPA': 'F',
-        'FRD': 'X', 'FT6': 'W', 'FTR': 'W', 'FTY': 'Y', 'FZN': 'K',
-        'G  ': 'G', 'G25': 'G', 'G2L': 'G', 'G2S': 'G', 'G31': 'G',
-        'G32': 'G', 'G33': 'G', 'G36': 'G', 'G38': 'G', 'G42': 'G',
-        'G46': 'G', 'G47': 'G', 'G48': 'G', 'G49': 'G', 'G4P': 'N',
-        'G7M': 'G', 'GAO': 'G', 'GAU': 'E', 'GCK': 'C', 'GCM': 'X',
-        'GDP': 'G', 'GDR': 'G', 'GFL': 'G', 'GGL': 'E', 'GH3': 'G',
-        'GHG': 'Q', 'GHP': 'G', 'GL3': 'G', 'GLH': 'Q', 'GLM': 'X',
-        'GLN': 'Q', 'GLQ': 'E', 'GLU': 'E', 'GLX': 'Z', 'GLY': 'G',
-        'GLZ': 'G', 'GMA': 'E', 'GMS': 'G', 'GMU': 'U', 'GN7': 'G',
-        'GND': 'X', 'GNE': 'N', 'GOM': 'G', 'GPL': 'K', 'GS ': 'G',
-        'GSC': 'G', 'GSR': 'G', 'GSS': 'G', 'GSU': 'E', 'GT9': 'C',
-        'GTP': 'G', 'GVL': 'X', 'GYC': 'CYG', 'GYS': 'SYG', 'H2U': 'U',
-        'H5M': 'P', 'HAC': 'A', 'HAR': 'R', 'HBN': 'H', 'HCS': 'X',
-        'HDP': 'U', 'HEU': 'U', 'HFA': 'X', 'HGL': 'X', 'HHI': 'H',
-        'HHK': 'AK', 'HIA': 'H', 'HIC': 'H', 'HIP': 'H', 'HIQ': 'H',
-        'HIS': 'H', 'HL2': 'L', 'HLU': 'L', 'HMF': 'A', 'HMR': 'R',
-        'HOL': 'N', 'HPC': 'F', 'HPE': 'F', 'HPQ': 'F', 'HQA': 'A',
-        'HRG': 'R', 'HRP': 'W', 'HS8': 'H', 'HS9': 'H', 'HSE': 'S',
-        'HSL': 'S', 'HSO': 'H', 'HTI': 'C', 'HTN': 'N', 'HTR': 'W',
-        'HV5': 'A', 'HVA': 'V', 'HY3': 'P', 'HYP': 'P', 'HZP': 'P',
-        'I  ': 'I', 'I2M': 'I', 'I58': 'K', 'I5C': 'C', 'IAM': 'A',
-        'IAR': 'R', 'IAS': 'D', 'IC ': 'C', 'IEL': 'K', 'IEY': 'HYG',
-        'IG ': 'G', 'IGL': 'G', 'IGU': 'G', 'IIC': 'SHG', 'IIL': 'I',
-        'ILE': 'I', 'ILG': 'E', 'ILX': 'I', 'IMC': 'C', 'IML': 'I',
-        'IOY': 'F', 'IPG': 'G', 'IPN': 'N', 'IRN': 'N', 'IT1': 'K',
-        'IU ': 'U', 'IYR': 'Y', 'IYT': 'T', 'JJJ': 'C', 'JJK': 'C',
-        'JJL': 'C', 'JW5': 'N', 'K1R': 'C', 'KAG': 'G', 'KCX': 'K',
-        'KGC': 'K', 'KOR': 'M', 'KPI': 'K', 'KST': 'K', 'KYQ': 'K',
-        'L2A': 'X', 'LA2': 'K', 'LAA': 'D', 'LAL': 'A', 'LBY': 'K',
-        'LC ': 'C', 'LCA': 'A', 'LCC': 'N', 'LCG': 'G', 'LCH': 'N',
-        'LCK': 'K', 'LCX': 'K', 'LDH': 'K', 'LED': 'L', 'LEF': 'L',
-        'LEH': 'L', 'LEI': 'V', 'LEM': 'L', 'LEN': 'L', 'LET': 'X',
-        'LEU': 'L', 'LG ': 'G', 'LGP': 'G', 'LHC': 'X', 'LHU': 'U',
-        'LKC': 'N', 'LLP': 'K', 'LLY': 'K', 'LME': 'E', 'LMQ': 'Q',
-        'LMS': 'N', 'LP6': 'K', 'LPD': 'P', 'LPG': 'G', 'LPL': 'X',
-        'LPS': 'S', 'LSO': 'X', 'LTA': 'X', 'LTR': 'W', 'LVG': 'G',
-        'LVN': 'V', 'LYM': 'K', 'LYN': 'K', 'LYR': 'K', 'LYS': 'K',
-        'LYX': 'K', 'LYZ': 'K', 'M0H': 'C', 'M1G': 'G', 'M2G': 'G',
-        'M2L': 'K', 'M2S': 'M', 'M3L': 'K', 'M5M': 'C', 'MA ': 'A',
-        'MA6': 'A', 'MA7': 'A', 'MAA': 'A', 'MAD': 'A', 'MAI': 'R',
-        'MBQ': 'Y', 'MBZ': 'N', 'MC1': 'S', 'MCG': 'X', 'MCL': 'K',
-        'MCS': 'C', 'MCY': 'C', 'MDH': 'X', 'MDO': 'ASG', 'MDR': 'N',
-        'MEA': 'F', 'MED': 'M', 'MEG': 'E', 'MEN': 'N', 'MEP': 'U',
-        'MEQ': 'Q', 'MET': 'M', 'MEU': 'G', 'MF3': 'X', 'MFC': 'GYG',
-        'MG1': 'G', 'MGG': 'R', 'MGN': 'Q', 'MGQ': 'A', 'MGV': 'G',
-        'MGY': 'G', 'MHL': 'L', 'MHO': 'M', 'MHS': 'H', 'MIA': 'A',
-        'MIS': 'S', 'MK8': 'L', 'ML3': 'K', 'MLE': 'L', 'MLL': 'L',
-        'MLY': 'K', 'MLZ': 'K', 'MME': 'M', 'MMT': 'T', 'MND': 'N',
-        'MNL': 'L', 'MNU': 'U', 'MNV': 'V', 'MOD': 'X', 'MP8': 'P',
-        'MPH': 'X', 'MPJ': 'X', 'MPQ': 'G', 'MRG': 'G', 'MSA': 'G',
-        'MSE': 'M', 'MSL': 'M', 'MSO': 'M', 'MSP': 'X', 'MT2': 'M',
-        'MTR': 'T', 'MTU': 'A', 'MTY': 'Y', 'MVA': 'V', 'N  ': 'N',
-        'N10': 'S', 'N2C': 'X', 'N5I': 'N', 'N5M': 'C', 'N6G': 'G',
-        'N7P': 'P', 'NA8': 'A', 'NAL': 'A', 'NAM': 'A', 'NB8': 'N',
-        'NBQ': 'Y', 'NC1': 'S', 'NCB': 'A', 'NCX': 'N', 'NCY': 'X',
-        'NDF': 'F', 'NDN': 'U', 'NEM': 'H', 'NEP': 'H', 'NF2': 'N',
-        'NFA': 'F', 'NHL': 'E', 'NIT': 'X', 'NIY': 'Y', 'NLE': 'L',
-        'NLN': 'L', 'NLO': 'L', 'NLP': 'L', 'NLQ': 'Q', 'NMC': 'G',
-        'NMM': 'R', 'NMS': 'T', 'NMT': 'T', 'NNH': 'R', 'NP3': 'N',
-        'NPH': 'C', 'NRP': 'LYG', 'NRQ': 'MYG', 'NSK': 'X', 'NTY': 'Y',
-        'NVA': 'V', 'NYC': 'TWG', 'NYG': 'NYG', 'NYM': 'N', 'NYS': 'C',
-        'NZH': 'H', 'O12': 'X', 'O2C': 'N', 'O2G': 'G', 'OAD': 'N',
-        'OAS': 'S', 'OBF': 'X', 'OBS': 'X', 'OCS': 'C', 'OCY': 'C',
-        'ODP': 'N', 'OHI': 'H', 'OHS': 'D', 'OIC': 'X', 'OIP': 'I',
-        'OLE': 'X', 'OLT': 'T', 'OLZ': 'S', 'OMC': 'C', 'OMG': 'G',
-        'OMT': 'M', 'OMU': 'U', 'ONE': 'U', 'ONL': 'X', 'OPR': 'R',
-        'ORN': 'A', 'ORQ': 'R', 'OSE': 'S', 'OTB': 'X', 'OTH': 'T',
-        'OTY': 'Y', 'OXX': 'D', 'P  ': 'G', 'P1L': 'C', 'P1P': 'N',
-        'P2T': 'T', 'P2U': 'U', 'P2Y': 'P', 'P5P': 'A', 'PAQ': 'Y',
-        'PAS': 'D', 'PAT': 'W', 'PAU': 'A', 'PBB': 'C', 'PBF': 'F',
-        'PBT': 'N', 'PCA': 'E', 'PCC': 'P', 'PCE': 'X', 'PCS': 'F',
-        'PDL': 'X', 'PDU': 'U', 'PEC': 'C', 'PF5': 'F', 'PFF': 'F',
-        'PFX': 'X', 'PG1': 'S', 'PG7': 'G', 'PG9': 'G', 'PGL': 'X',
-        'PGN': 'G', 'PGP': 'G', 'PGY': 'G', 'PHA': 'F', 'PHD': 'D',
-        'PHE': 'F', 'PHI': 'F', 'PHL': 'F', 'PHM': 'F', 'PIV': 'X',
-        'PLE': 'L', 'PM3': 'F', 'PMT': 'C', 'POM': 'P', 'PPN': 'F',
-        'PPU': 'A', 'PPW': 'G', 'PQ1': 'N', 'PR3': 'C', 'PR5': 'A',
-        'PR9': 'P', 'PRN': 'A', 'PRO': 'P', 'PRS': 'P', 'PSA': 'F',
-        'PSH': 'H', 'PST': 'T', 'PSU': 'U', 'PSW': 'C', 'PTA': 'X',
-        'PTH': 'Y', 'PTM': 'Y', 'PTR': 'Y', 'PU ': 'A', 'PUY': 'N',
-        'PVH': 'H', 'PVL': 'X', 'PYA': 'A', 'PYO': 'U', 'PYX': 'C',
-        'PYY': 'N', 'QLG': 'QLG', 'QUO': 'G', 'R  ': 'A', 'R1A': 'C',
-        'R1B': 'C', 'R1F': 'C', 'R7A': 'C', 'RC7': 'HYG', 'RCY': 'C',
-        'RIA': 'A', 'RMP': 'A', 'RON': 'X', 'RT ': 'T', 'RTP': 'N',
-        'S1H': 'S', 'S2C': 'C', 'S2D': 'A', 'S2M': 'T', 'S2P': 'A',
-        'S4A': 'A', 'S4C': 'C', 'S4G': 'G', 'S4U': 'U', 'S6G': 'G',
-        'SAC': 'S', 'SAH': 'C', 'SAR': 'G', 'SBL': 'S', 'SC ': 'C',
-        'SCH': 'C', 'SCS': 'C', 'SCY': 'C', 'SD2': 'X', 'SDG': 'G',
-        'SDP': 'S', 'SEB': 'S', 'SEC': 'A', 'SEG': 'A', 'SEL': 'S',
-        'SEM': 'X', 'SEN': 'S', 'SEP': 'S', 'SER': 'S', 'SET': 'S',
-        'SGB': 'S', 'SHC': 'C', 'SHP': 'G', 'SHR': 'K', 'SIB': 'C',
-        'SIC': 'DC', 'SLA': 'P', 'SLR': 'P', 'SLZ': 'K', 'SMC': 'C',
-        'SME': 'M', 'SMF': 'F', 'SMP': 'A', 'SMT': 'T', 'SNC': 'C',
-        'SNN': 'N', 'SOC': 'C', 'SOS': 'N', 'SOY': 'S', 'SPT': 'T',
-        'SRA': 'A', 'SSU': 'U', 'STY': 'Y', 'SUB': 'X', 'SUI': 'DG',
-        'SUN': 'S', 'SUR': 'U', 'SVA': 'S', 'SVX': 'S', 'SVZ': 'X',
-        'SYS': 'C', 'T  ': 'T', 'T11': 'F', 'T23': 'T', 'T2S': 'T',
-        'T2T': 'N', 'T31': 'U', 'T32': 'T', 'T36': 'T', 'T37': 'T',
-        'T38': 'T', 'T39': 'T', 'T3P': 'T', 'T41': 'T', 'T48': 'T',
-        'T49': 'T', 'T4S': 'T', 'T5O': 'U', 'T5S': 'T', 'T66': 'X',
-        'T6A': 'A', 'TA3': 'T', 'TA4': 'X', 'TAF': 'T', 'TAL': 'N',
-        'TAV': 'D', 'TBG': 'V', 'TBM': 'T', 'TC1': 'C', 'TCP': 'T',
-        'TCQ': 'X', 'TCR': 'W', 'TCY': 'A', 'TDD': 'L', 'TDY': 'T',
-        'TFE': 'T', 'TFO': 'A', 'TFQ': 'F', 'TFT': 'T', 'TGP': 'G',
-        'TH6': 'T', 'THC': 'T', 'THO': 'X', 'THR': 'T', 'THX': 'N',
-        'THZ': 'R', 'TIH': 'A', 'TLB': 'N', 'TLC': 'T', 'TLN': 'U',
-        'TMB': 'T', 'TMD': 'T', 'TNB': 'C', 'TNR': 'S', 'TOX': 'W',
-        'TP1': 'T', 'TPC': 'C', 'TPG': 'G', 'TPH': 'X', 'TPL': 'W',
-        'TPO': 'T', 'TPQ': 'Y', 'TQQ': 'W', 'TRF': 'W', 'TRG': 'K',
-        'TRN': 'W', 'TRO': 'W', 'TRP': 'W', 'TRQ': 'W', 'TRW': 'W',
-        'TRX': 'W', 'TS ': 'N', 'TST': 'X', 'TT ': 'N', 'TTD': 'T',
-        'TTI': 'U', 'TTM': 'T', 'TTQ': 'W', 'TTS': 'Y', 'TY2': 'Y',
-        'TY3': 'Y', 'TYB': 'Y', 'TYI': 'Y', 'TYN': 'Y', 'TYO': 'Y',
-        'TYQ': 'Y', 'TYR': 'Y', 'TYS': 'Y', 'TYT': 'Y', 'TYU': 'N',
-        'TYX': 'X', 'TYY': 'Y', 'TZB': 'X', 'TZO': 'X', 'U  ': 'U',
-        'U25': 'U', 'U2L': 'U', 'U2N': 'U', 'U2P': 'U', 'U31': 'U',
-        'U33': 'U', 'U34': 'U', 'U36': 'U', 'U37': 'U', 'U8U': 'U',
-        'UAR': 'U', 'UCL': 'U', 'UD5': 'U', 'UDP': 'N', 'UFP': 'N',
-        'UFR': 'U', 'UFT': 'U', 'UMA': 'A', 'UMP': 'U', 'UMS': 'U',
-        'UN1': 'X', 'UN2': 'X', 'UNK': 'X', 'UR3': 'U', 'URD': 'U',
-        'US1': 'U', 'US2': 'U', 'US3': 'T', 'US5': 'U', 'USM': 'U',
-        'V1A': 'C', 'VAD': 'V', 'VAF': 'V', 'VAL': 'V', 'VB1': 'K',
-        'VDL': 'X', 'VLL': 'X', 'VLM': 'X', 'VMS': 'X', 'VOL': 'X',
-        'X  ': 'G', 'X2W': 'E', 'X4A': 'N', 'X9Q': 'AFG', 'XAD': 'A',
-        'XAE': 'N', 'XAL': 'A', 'XAR': 'N', 'XCL': 'C', 'XCP': 'X',
-        'XCR': 'C', 'XCS': 'N', 'XCT': 'C', 'XCY': 'C', 'XGA': 'N',
-        'XGL': 'G', 'XGR': 'G', 'XGU': 'G', 'XTH': 'T', 'XTL': 'T',
-        'XTR': 'T', 'XTS': 'G', 'XTY': 'N', 'XUA': 'A', 'XUG': 'G',
-        'XX1': 'K', 'XXY': 'THG', 'XYG': 'DYG', 'Y  ': 'A', 'YCM': 'C',
-        'YG ': 'G', 'YOF': 'Y', 'YRR': 'N', 'YYG': 'G', 'Z  ': 'C',
-        'ZAD': 'A', 'ZAL': 'A', 'ZBC': 'C', 'ZCY': 'C', 'ZDU': 'U',
-        'ZFB': 'X', 'ZGU': 'G', 'ZHP': 'N', 'ZTH': 'T', 'ZZJ': 'A'}
+        elif min_score < 0:
+            self.labelStatusDisplay.configure(text="Please provide a valid min. score")
 
-    # remove hetero atoms (waters/ligands/etc) from consideration?
-    if het:
-        cmd.select("__h", "br. " + haystack)
-    else:
-        cmd.select("__h", "br. " + haystack + " and not het")
+        else:
+            # Get the objects/selections to search in
+            # and the prefix of the returned selections
+            if self.searchall.get() == 1:
+                haystacks = self.get_search_all()
+                prefix = "all"
+            else:
+                search_selection = self.get_search_selection()
+                haystacks = [search_selection] if search_selection is not None else []
+                prefix = search_selection
 
-    # get the AAs in the haystack
-    aaDict = {'aaList': []}
-    cmd.iterate("(name ca) and __h", "aaList.append((resi,resn,chain))", space=aaDict)
+            if len(haystacks) == 0:
+                self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+            else:
+                query = AlignmentQuery(search_term, min_score)
+                self.start_search(query, haystacks,
+                                  lambda results: self.finish_searchbutton_alignment(prefix + "_aln", results))
+
+    # Helper function for action_searchbutton_alignment, called with the results of the search
+    def finish_searchbutton_alignment(self, group, results):
+        # Rank the alignments of all searched objects/selections by their score
+        hits = [(hit[2], index, hit) for (haystack, index, spans) in results for hit in spans]
+        hits.sort(key=lambda hit: -hit[0])
+
+        if len(hits) == 0:
+            self.labelStatusDisplay.configure(text="Nothing found!")
+            return
+
+        # Save each alignment as a selection, named by its rank, in a group
+        cmd.delete(group)
+        selections = [("%s_%i" % (group, rank + 1), [(index, [hit])])
+                      for rank, (score, index, hit) in enumerate(hits)]
+        self.oldsearches.append(group)
+        self.save_selections(selections, "%i alignments saved in %s, best score %i" %
+                             (len(hits), group, hits[0][0]), group)
+
+
+    #=====================================================================
+    # Function for searching the library index of a local structure
+    # library, the structures with hits are loaded into PyMol
+    #=====================================================================
+    def action_searchbutton_library(self, *args):
+        # Get the search term
+        search_term = self.search_var.get().strip()
 
-    IDs = [int(x[0]) for x in aaDict['aaList']]
-    AAs = ''.join([one_letter[x[1]] for x in aaDict['aaList']])
-    chains = [x[2] for x in aaDict['aaList']]
+        if search_term == "":
+            self.labelStatusDisplay.configure(text="Please provide a search term")
+            return
+
+        # Ask for the library index when none is open yet
+        if library_index is None:
+            filename = tkFileDialog.askopenfilename(parent=self, title="Open library index",
+                                                    filetypes=[("Library index", "*.json")])
+            if not filename or set_library_index(filename) is None:
+                self.labelStatusDisplay.configure(text="Please open a library index")
+                return
+
+        # Name the selection like those of the search all mode
+        if search_term.isalnum():
+            return_selection = "lib_" + search_term
+        else:
+            return_selection = "lib_" + datetime.datetime.now().strftime("%H%M%S")
+
+        # Search the library in the background, the structures with hits are loaded when it is done
+        self.labelStatusDisplay.configure(text="Searching %s..." % os.path.basename(library_index.path))
+        self.start_search(search_term, [library_index.path],
+                          lambda results: self.finish_library(results, return_selection),
+                          worker=library_search_worker)
+
+    # Helper function for action_searchbutton_library, loads and selects the hits of the library
+    def finish_library(self, results, return_selection):
+        hits = [hit for result in results for hit in result[2]]
+        if len(hits) == 0:
+            self.labelStatusDisplay.configure(text="Nothing found!")
+            return
+        select_library_hits(hits, return_selection)
+        self.oldsearches.append(return_selection)
+        structures = len(set(hit.object for hit in hits))
+        self.labelStatusDisplay.configure(text="%i hits in %i structures, saved in %s" %
+                                          (len(hits), structures, return_selection))
+
+
+    #=======================================================================
+    # Function for scanning a single or all selections for all motifs of the
+    # bundled library, the hits are saved like those of a list of motifs
+    #=======================================================================
+    def action_librarybutton(self, *args):
+        # Get the objects/selections to search in
+        # and the prefix of the returned selections
+        if self.searchall.get() == 1:
+            haystacks = self.get_search_all()
+            prefix = "all"
+        else:
+            search_selection = self.get_search_selection()
+            haystacks = [search_selection] if search_selection is not None else []
+            prefix = search_selection
+
+        if len(haystacks) == 0:
+            self.labelStatusDisplay.configure(text="Warning, select Object/Selection first!")
+        else:
+            scan = MotifLibraryScan()
+            self.start_search(scan, haystacks,
+                              lambda results: self.finish_searchbutton_motifs(prefix, scan, results))
+
+
+    #============================================
+    # Function for loading motifs from a text file
+    #============================================
+    def action_loadmotifs(self, *args):
+        filename = tkFileDialog.askopenfilename(parent=self, title="Load motifs")
+
+        if filename:
+            # Put the motifs into the search field and switch to the motif list mode
+            motifs = parse_motifs(filename)
+            self.search_mode.set("motif list")
+            self.search_var.set(", ".join(motifs))
+            self.labelStatusDisplay.configure(text="Loaded %i motifs" % len(motifs))
+
+
+    #=======================================================================
+    # Function for getting the object/selection to search in for the single
+    # searches, returns None if no object/selection has been selected yet
+    #=======================================================================
+    def get_search_selection(self, *args):
+        # If only one PyMol object is available, automatically select that
+        if len(cmd.get_names("objects",1)) == 1:
+            return cmd.get_names("objects",1)[0]
+        # if not, let the user choose from the list of objects/selection
+        elif cmd.is_string(self.pymol_selection) and self.pymol_selection != "":
+            return self.pymol_selection
+        else:
+            return None
+
+
+    #==========================================================================
+    # Function for saving hits as selections and enabling the first of them
+    # selections is a list of (name, parts), parts a list of (index, spans).
+    # Many hits are added to the selections in chunks scheduled with after(),
+    # so that the viewer and the window stay responsive in between. The
+    # chunk size adapts to the time budget selection_chunk_time per chunk.
+    # With a group name all selections are put into that group when saved.
+    #==========================================================================
+    def save_selections(self, selections, status, group=None):
+        # Saving new hits supersedes saving the hits of the last search
+        self.cancel_selection()
+
+        # keep notices like "showing first N hits" when all hits are saved
+        status += self.status_notice
+
+        jobs = [(name, [(index, span) for (index, spans) in parts for span in spans])
+                for (name, parts) in selections]
+
+        if sum([len(hits) for (name, hits) in jobs]) < progressive_min_hits:
+            for name, hits in jobs:
+                cmd.select(name, hits_selection(hits))
+            self.finish_selection(jobs, status, group)
+        else:
+            self.selection_job = self.after(1, self.save_selection_chunk, jobs, 0, 0,
+                                            progressive_chunk_size, status, group)
+
+    # Helper function for save_selections, adds the next chunk of hits to a selection
+    def save_selection_chunk(self, jobs, job, position, size, status, group=None):
+        (name, hits) = jobs[job]
+        start = time.time()
+
+        # the first chunk replaces the selection of an earlier search with the same name,
+        # the others are merged into it, also if it is not enabled (merge=2)
+        chunk = hits[position:position + size]
+        cmd.select(name, hits_selection(chunk), merge=2 if position > 0 else 0)
+        if job == 0 and position == 0:
+            cmd.enable(name)
+
+        # make the next chunk larger or smaller to fit into the time budget
+        elapsed = max(time.time() - start, 0.001)
+        size = max(10, int(size * min(2.0, max(0.5, selection_chunk_time / elapsed))))
+
+        position += len(chunk)
+        saved = sum([len(previous) for (previous_name, previous) in jobs[:job]]) + position
+        total = sum([len(job_hits) for (job_name, job_hits) in jobs])
+        self.labelStatusDisplay.configure(text="Saving hits in %s (%i/%i)" % (name, saved, total))
+
+        if position >= len(hits):
+            job += 1
+            position = 0
+        if job == len(jobs):
+            self.selection_job = None
+            self.finish_selection(jobs, status, group)
+        else:
+            self.selection_job = self.after(1, self.save_selection_chunk, jobs, job, position, size,
+                                            status, group)
+
+    # Helper function for save_selections, called when all hits are saved
+    def finish_selection(self, jobs, status, group=None):
+        if group is not None:
+            cmd.group(group, " ".join([name for (name, hits) in jobs]))
+        cmd.enable(jobs[0][0])
+        self.labelStatusDisplay.configure(text=status)
+
+    # Helper function for stopping to save the hits of the last search
+    def cancel_selection(self, *args):
+        if self.selection_job is not None:
+            self.after_cancel(self.selection_job)
+            self.selection_job = None
+
+
+    #==========================================================================
+    # Function for browsing the hits of a search one by one in a window
+    # Only the rows of the current page are put into its listbox, and a
+    # selection is only created for the hit the user steps to
+    #==========================================================================
+    def show_hit_browser(self, results, score_label="score"):
+        # Collect the hits as (index, span, motif) from the results of the search
+        hits = []
+        for (haystack, index, spans) in results:
+            if isinstance(spans, dict):
+                for motif in sorted(spans):
+                    hits.extend([(index, span, motif) for span in spans[motif]])
+            else:
+                hits.extend([(index, span, None) for span in spans])
+
+        self.browser_hits = hits
+        self.browser_score_label = score_label
+        self.browser_page = None
+        self.browser_current = None
+
+        if len(hits) == 0:
+            self.labelStatusDisplay.configure(text="Nothing found!")
+        else:
+            self.labelStatusDisplay.configure(text="%i hits, step through them in the hit browser" % len(hits))
+
+        # Reuse the window of the last search
+        if self.browser_window is None or not self.browser_window.winfo_exists():
+            self.create_hit_browser()
+        self.show_hit_page(0)
+
+    # Helper function for show_hit_browser, creates the window
+    def create_hit_browser(self, *args):
+        browser_window = Toplevel(self)
+        browser_window.wm_title("Hits")
+        browser_window.minsize(width=300, height=200)
+        browser_window.wm_geometry("")
+        self.browser_window = browser_window
+
+        # Generate the widgets
+        self.labelBrowserPage = Label(browser_window,
+            text = "",
+        )
+        self.lboxBrowser = Listbox(browser_window,
+            font = "Courier 9",
+            height = hit_page_size,
+            width = 60,
+        )
+        _button_prev_page = Button(browser_window,
+            text = "<< Page",
+            width = 10,
+        )
+        _button_prev_hit = Button(browser_window,
+            text = "< Previous",
+            width = 10,
+        )
+        _button_next_hit = Button(browser_window,
+            text = "Next >",
+            width = 10,
+        )
+        _button_next_page = Button(browser_window,
+            text = "Page >>",
+            width = 10,
+        )
+
+        # widget commands
+        _button_prev_page.configure(
+            command = lambda: self.show_hit_page(self.browser_page - 1)
+        )
+        _button_prev_hit.configure(
+            command = self.previous_hit
+        )
+        _button_next_hit.configure(
+            command = self.next_hit
+        )
+        _button_next_page.configure(
+            command = lambda: self.show_hit_page(self.browser_page + 1)
+        )
+        self.lboxBrowser.bind("<<ListboxSelect>>", self.select_hit)
+        self.lboxBrowser.bind("<Down>", self.next_hit)
+        self.lboxBrowser.bind("<Up>", self.previous_hit)
+        browser_window.bind("<Down>", self.next_hit)
+        browser_window.bind("<Up>", self.previous_hit)
+        browser_window.bind("n", self.next_hit)
+        browser_window.bind("p", self.previous_hit)
+        browser_window.bind("<Next>", lambda e: self.show_hit_page(self.browser_page + 1))
+        browser_window.bind("<Prior>", lambda e: self.show_hit_page(self.browser_page - 1))
+
+        # Geometry Management
+        self.labelBrowserPage.grid(
+            in_    = browser_window,
+            column = 1,
+            row    = 1,
+            columnspan = 4,
+            padx = 3,
+            pady = 3,
+            sticky = "nw"
+        )
+        self.lboxBrowser.grid(
+            in_    = browser_window,
+            column = 1,
+            row    = 2,
+            columnspan = 4,
+            padx = 3,
+            pady = 3,
+            sticky = "news"
+        )
+        for column, button in enumerate([_button_prev_page, _button_prev_hit,
+                                         _button_next_hit, _button_next_page]):
+            button.grid(
+                in_    = browser_window,
+                column = column + 1,
+                row    = 3,
+                padx = 3,
+                pady = 3,
+                sticky = ""
+            )
+
+        # Resize Behavior
+        browser_window.grid_rowconfigure(2, weight = 1)
+        for column in range(1, 5):
+            browser_window.grid_columnconfigure(column, weight = 1)
+
+    # Helper function for the text of a row of the hit browser
+    def format_hit(self, hit):
+        (index, span, motif) = hit
+        (start, stop) = span[:2]
+        text = "%-12s %-4s %5i-%-5i %s" % (index.models[start], index.chains[start],
+                                          index.IDs[start], index.IDs[stop - 1],
+                                          index.AAs[start:stop])
+        if motif is not None:
+            text += "  (%s)" % motif
+        if len(span) > 2:
+            text += "  %s %s" % (self.browser_score_label, span[2])
+        return text
+
+    # Helper function for showing a page of hits in the hit browser
+    def show_hit_page(self, page):
+        pages = max(1, (len(self.browser_hits) + hit_page_size - 1) // hit_page_size)
+        page = max(0, min(page, pages - 1))
+        self.browser_page = page
+
+        first = page * hit_page_size
+        rows = self.browser_hits[first:first + hit_page_size]
+        self.lboxBrowser.delete(0, END)
+        self.lboxBrowser.insert(END, *[self.format_hit(hit) for hit in rows])
+
+        self.labelBrowserPage.configure(text="Hits %i-%i of %i (page %i of %i)" %
+                                        (min(first + 1, len(self.browser_hits)), first + len(rows),
+                                         len(self.browser_hits), page + 1, pages))
+
+        # Mark the current hit, if it is on this page
+        if self.browser_current is not None and first <= self.browser_current < first + len(rows):
+            self.lboxBrowser.selection_set(self.browser_current - first)
+
+    # Helper function for stepping to a hit, only now it is selected and zoomed to
+    def go_to_hit(self, n):
+        if len(self.browser_hits) == 0:
+            return
+        n = max(0, min(n, len(self.browser_hits) - 1))
+        self.browser_current = n
+
+        if n // hit_page_size != self.browser_page:
+            self.show_hit_page(n // hit_page_size)
+        row = n - self.browser_page * hit_page_size
+        self.lboxBrowser.selection_clear(0, END)
+        self.lboxBrowser.selection_set(row)
+        self.lboxBrowser.see(row)
+
+        (index, span, motif) = self.browser_hits[n]
+        cmd.select(hit_browser_selection, index.selection([span]))
+        cmd.zoom(hit_browser_selection)
+        cmd.enable(hit_browser_selection)
+        if hit_browser_selection not in self.oldsearches:
+            self.oldsearches.append(hit_browser_selection)
+        self.labelStatusDisplay.configure(text="Hit %i of %i" % (n + 1, len(self.browser_hits)))
+
+    # Helper function for the next hit button and key
+    def next_hit(self, *args):
+        self.go_to_hit(0 if self.browser_current is None else self.browser_current + 1)
+        return "break"
+
+    # Helper function for the previous hit button and key
+    def previous_hit(self, *args):
+        self.go_to_hit(0 if self.browser_current is None else self.browser_current - 1)
+        return "break"
+
+    # Helper function for clicking on a hit in the hit browser
+    def select_hit(self, *args):
+        selected = self.lboxBrowser.curselection()
+        if selected:
+            n = self.browser_page * hit_page_size + int(selected[0])
+            if n != self.browser_current:
+                self.go_to_hit(n)
+
+
+    #====================================================================
+    # Function for getting the objects to search in the search all mode
+    #====================================================================
+    def get_search_all(self, *args):
+        # Only the distinct molecule objects, the named selections in the
+        # list consist of their atoms and would be searched more than once
+        return molecule_objects()
+
+
+    #==========================================================================
+    # Function for starting a search in a background thread
+    # The sequences are scanned by search_worker, which hands the results back
+    # through a queue that is polled by poll_search in the Tk main loop.
+    # on_done is called with the list of (haystack, index, spans) results
+    # and is the only part of the search that creates selections in PyMol
+    # search_term is a sequence/regular expression or a matcher like MotifAutomaton
+    # The results of previews (preview=1) are always passed to on_done,
+    # not to the hit browser, and the list of objects is not refreshed
+    # Sequences and regular expressions stop after max. hits hits
+    # worker replaces search_worker, e.g. library_search_worker for the library
+    #==========================================================================
+    def start_search(self, search_term, haystacks, on_done, preview=0, worker=None):
+        # A new search supersedes the one that is still running
+        self.cancel_search()
+
+        self.search_queue = Queue.Queue()
+        self.search_cancelled = threading.Event()
+        self.search_results = []
+        self.search_done = on_done
+        self.search_preview = preview
+        # only the hits of search_worker can be shown in the hit browser
+        self.search_browse = worker is None and not preview
+        # e.g. the distances of fuzzy hits are not scores
+        self.search_score_label = getattr(search_term, "score_label", "score")
+
+        thread = threading.Thread(target=worker or search_worker,
+                                  args=(search_term, haystacks, 0, 0,
+                                        self.search_queue, self.search_cancelled,
+                                        self.get_max_hits()))
+        thread.daemon = True
+        thread.start()
+
+        # Allow cancelling the search
+        self.buttonCancel.configure(state=NORMAL)
+
+        self.after(search_poll_interval, self.poll_search, self.search_queue)
+
+    # Helper function for start_search, delivers the results of the worker thread
+    def poll_search(self, search_queue):
+        # Stop polling if the search has been cancelled or superseded by a newer one
+        if search_queue is not self.search_queue:
+            return
+
+        try:
+            while True:
+                message = search_queue.get_nowait()
+
+                if message[0] == "progress":
+                    (done, total, haystack) = message[1:]
+                    self.labelStatusDisplay.configure(text="Searching %s (%i/%i)" %
+                                                      (haystack, done + 1, total))
+
+                elif message[0] == "hits":
+                    self.search_results.append(message[1:])
+
+                elif message[0] == "limited":
+                    self.search_limited = message[1]
+
+                elif message[0] in ("timeout", "failed"):
+                    self.end_search()
+                    self.labelStatusDisplay.configure(text=message[1])
+                    return
+
+                elif message[0] == "error":
+                    (haystack, error) = message[1:]
+                    self.end_search()
+                    if haystack is None:
+                        self.labelStatusDisplay.configure(text="Error: %s" % error)
+                    else:
+                        self.labelStatusDisplay.configure(text="Error in %s: %s" % (haystack, error))
+                    return
+
+                elif message[0] == "done":
+                    on_done = self.search_done
+                    results = self.search_results
+                    preview = self.search_preview
+                    browse = self.search_browse
+                    score_label = self.search_score_label
+                    limited = self.search_limited
+                    self.end_search()
+                    # tell that the search stopped at max. hits, also after saving the hits
+                    if limited is not None:
+                        self.status_notice = " (showing first %i hits)" % limited
+                    # The hits are either browsed one by one or all saved as selections
+                    if self.browse_hits.get() == 1 and browse:
+                        self.show_hit_browser(results, score_label)
+                    else:
+                        on_done(results)
+                    # hits that are still being saved get the notice when they are done
+                    text = self.labelStatusDisplay.cget("text")
+                    if self.selection_job is None and not text.endswith(self.status_notice):
+                        self.labelStatusDisplay.configure(text=text + self.status_notice)
+                    self.status_notice = ""
+                    # show the new selections in the list
+                    if not preview:
+                        self.refresh()
+                    return
+
+        except Queue.Empty:
+            pass
+
+        self.after(search_poll_interval, self.poll_search, search_queue)
+
+    # Helper function for getting the maximum number of hits, 0 for all hits
+    def get_max_hits(self, *args):
+        try:
+            return max(0, int(self.max_hits.get()))
+        except (ValueError, TclError):
+            return 0
+
+    # Helper function for forgetting the current search
+    def end_search(self, *args):
+        self.search_queue = None
+        self.search_cancelled = None
+        self.search_results = []
+        self.search_done = None
+        self.search_preview = 0
+        self.search_browse = 1
+        self.search_limited = None
+        self.search_score_label = "score"
+        self.buttonCancel.configure(state=DISABLED)
+
+    # Helper function for stopping the current search
+    def cancel_search(self, *args):
+        # and saving the hits of the last one
+        self.cancel_selection()
+        if self.search_cancelled is not None:
+            self.search_cancelled.set()
+            self.end_search()
+            return True
+        return False
+
+
+    #=======================================
+    # Function for the search cancel button
+    #=======================================
+    def action_cancelbutton(self, *args):
+        if self.cancel_search():
+            self.labelStatusDisplay.configure(text="Search cancelled")
+
+
+    #====================================
+    # Function for deleting previous hits
+    #====================================
+    def action_deletebutton(self, *args):
+        # stop a running search, it would save its hits again
+        self.cancel_search()
+
+        # delete all old hits from non-interactive searches
+        # these hits are stored in the list self.oldsearches
+        for item in self.oldsearches:
+            cmd.delete(item)
+
+        # delete the hits from interactive searches
+        # these are always named "interactive"
+        # or "interactive_all"
+        cmd.delete("interactive")
+        cmd.delete("interactive_all")
+
+        # Show a status message
+        self.labelStatusDisplay.configure(text="Cleared all hits")
+        self.refresh()
+
+        
+
+
+#===========================================================
+# Residue vocabulary for translating residue names to one
+# letter codes, shared by findseq and all sequence indices
+#===========================================================
+
+# Table of residue names and their one letter codes
+# (a few modified residues and chromophores map to more than one letter)
+one_letter = {
+    '00C': 'C', '01W': 'X', '0A0': 'D', '0A1': 'Y', '0A2': 'K',
+    '0A8': 'C', '0AA': 'V', '0AB': 'V', '0AC': 'G', '0AD': 'G',
+    '0AF': 'W', '0AG': 'L', '0AH': 'S', '0AK': 'D', '0AM': 'A',
+    '0AP': 'C', '0AU': 'U', '0AV': 'A', '0AZ': 'P', '0BN': 'F',
+    '0C ': 'C', '0CS': 'A', '0DC': 'C', '0DG': 'G', '0DT': 'T',
+    '0G ': 'G', '0NC': 'A', '0SP': 'A', '0U ': 'U', '0YG': 'YG',
+    '10C': 'C', '125': 'U', '126': 'U', '127': 'U', '128': 'N',
+    '12A': 'A', '143': 'C', '175': 'ASG', '193': 'X', '1AP': 'A',
+    '1MA': 'A', '1MG': 'G', '1PA': 'F', '1PI': 'A', '1PR': 'N',
+    '1SC': 'C', '1TQ': 'W', '1TY': 'Y', '200': 'F', '23F': 'F',
+    '23S': 'X', '26B': 'T', '2AD': 'X', '2AG': 'G', '2AO': 'X',
+    '2AR': 'A', '2AS': 'X', '2AT': 'T', '2AU': 'U', '2BD': 'I',
+    '2BT': 'T', '2BU': 'A', '2CO': 'C', '2DA': 'A', '2DF': 'N',
+    '2DM': 'N', '2DO': 'X', '2DT': 'T', '2EG': 'G', '2FE': 'N',
+    '2FI': 'N', '2FM': 'M', '2GT': 'T', '2HF': 'H', '2LU': 'L',
+    '2MA': 'A', '2MG': 'G', '2ML': 'L', '2MR': 'R', '2MT': 'P',
+    '2MU': 'U', '2NT': 'T', '2OM': 'U', '2OT': 'T', '2PI': 'X',
+    '2PR': 'G', '2SA': 'N', '2SI': 'X', '2ST': 'T', '2TL': 'T',
+    '2TY': 'Y', '2VA': 'V', '32S': 'X', '32T': 'X', '3AH': 'H',
+    '3AR': 'X', '3CF': 'F', '3DA': 'A', '3DR': 'N', '3GA': 'A',
+    '3MD': 'D', '3ME': 'U', '3NF': 'Y', '3TY': 'X', '3XH': 'G',
+    '4AC': 'N', '4BF': 'Y', '4CF': 'F', '4CY': 'M', '4DP': 'W',
+    '4F3': 'GYG', '4FB': 'P', '4FW': 'W', '4HT': 'W', '4IN': 'X',
+    '4MF': 'N', '4MM': 'X', '4OC': 'C', '4PC': 'C', '4PD': 'C',
+    '4PE': 'C', '4PH': 'F', '4SC': 'C', '4SU': 'U', '4TA': 'N',
+    '5AA': 'A', '5AT': 'T', '5BU': 'U', '5CG': 'G', '5CM': 'C',
+    '5CS': 'C', '5FA': 'A', '5FC': 'C', '5FU': 'U', '5HP': 'E',
+    '5HT': 'T', '5HU': 'U', '5IC': 'C', '5IT': 'T', '5IU': 'U',
+    '5MC': 'C', '5MD': 'N', '5MU': 'U', '5NC': 'C', '5PC': 'C',
+    '5PY': 'T', '5SE': 'U', '5ZA': 'TWG', '64T': 'T', '6CL': 'K',
+    '6CT': 'T', '6CW': 'W', '6HA': 'A', '6HC': 'C', '6HG': 'G',
+    '6HN': 'K', '6HT': 'T', '6IA': 'A', '6MA': 'A', '6MC': 'A',
+    '6MI': 'N', '6MT': 'A', '6MZ': 'N', '6OG': 'G', '70U': 'U',
+    '7DA': 'A', '7GU': 'G', '7JA': 'I', '7MG': 'G', '8AN': 'A',
+    '8FG': 'G', '8MG': 'G', '8OG': 'G', '9NE': 'E', '9NF': 'F',
+    '9NR': 'R', '9NV': 'V', 'A  ': 'A', 'A1P': 'N', 'A23': 'A',
+    'A2L': 'A', 'A2M': 'A', 'A34': 'A', 'A35': 'A', 'A38': 'A',
+    'A39': 'A', 'A3A': 'A', 'A3P': 'A', 'A40': 'A', 'A43': 'A',
+    'A44': 'A', 'A47': 'A', 'A5L': 'A', 'A5M': 'C', 'A5O': 'A',
+    'A66': 'X', 'AA3': 'A', 'AA4': 'A', 'AAR': 'R', 'AB7': 'X',
+    'ABA': 'A', 'ABR': 'A', 'ABS': 'A', 'ABT': 'N', 'ACB': 'D',
+    'ACL': 'R', 'AD2': 'A', 'ADD': 'X', 'ADX': 'N', 'AEA': 'X',
+    'AEI': 'D', 'AET': 'A', 'AFA': 'N', 'AFF': 'N', 'AFG': 'G',
+    'AGM': 'R', 'AGT': 'X', 'AHB': 'N', 'AHH': 'X', 'AHO': 'A',
+    'AHP': 'A', 'AHS': 'X', 'AHT': 'X', 'AIB': 'A', 'AKL': 'D',
+    'ALA': 'A', 'ALC': 'A', 'ALG': 'R', 'ALM': 'A', 'ALN': 'A',
+    'ALO': 'T', 'ALQ': 'X', 'ALS': 'A', 'ALT': 'A', 'ALY': 'K',
+    'AP7': 'A', 'APE': 'X', 'APH': 'A', 'API': 'K', 'APK': 'K',
+    'APM': 'X', 'APP': 'X', 'AR2': 'R', 'AR4': 'E', 'ARG': 'R',
+    'ARM': 'R', 'ARO': 'R', 'ARV': 'X', 'AS ': 'A', 'AS2': 'D',
+    'AS9': 'X', 'ASA': 'D', 'ASB': 'D', 'ASI': 'D', 'ASK': 'D',
+    'ASL': 'D', 'ASM': 'X', 'ASN': 'N', 'ASP': 'D', 'ASQ': 'D',
+    'ASU': 'N', 'ASX': 'B', 'ATD': 'T', 'ATL': 'T', 'ATM': 'T',
+    'AVC': 'A', 'AVN': 'X', 'AYA': 'A', 'AYG': 'AYG', 'AZK': 'K',
+    'AZS': 'S', 'AZY': 'Y', 'B1F': 'F', 'B1P': 'N', 'B2A': 'A',
+    'B2F': 'F', 'B2I': 'I', 'B2V': 'V', 'B3A': 'A', 'B3D': 'D',
+    'B3E': 'E', 'B3K': 'K', 'B3L': 'X', 'B3M': 'X', 'B3Q': 'X',
+    'B3S': 'S', 'B3T': 'X', 'B3U': 'H', 'B3X': 'N', 'B3Y': 'Y',
+    'BB6': 'C', 'BB7': 'C', 'BB9': 'C', 'BBC': 'C', 'BCS': 'C',
+    'BCX': 'C', 'BE2': 'X', 'BFD': 'D', 'BG1': 'S', 'BGM': 'G',
+    'BHD': 'D', 'BIF': 'F', 'BIL': 'X', 'BIU': 'I', 'BJH': 'X',
+    'BLE': 'L', 'BLY': 'K', 'BMP': 'N', 'BMT': 'T', 'BNN': 'A',
+    'BNO': 'X', 'BOE': 'T', 'BOR': 'R', 'BPE': 'C', 'BRU': 'U',
+    'BSE': 'S', 'BT5': 'N', 'BTA': 'L', 'BTC': 'C', 'BTR': 'W',
+    'BUC': 'C', 'BUG': 'V', 'BVP': 'U', 'BZG': 'N', 'C  ': 'C',
+    'C12': 'TYG', 'C1X': 'K', 'C25': 'C', 'C2L': 'C', 'C2S': 'C',
+    'C31': 'C', 'C32': 'C', 'C34': 'C', 'C36': 'C', 'C37': 'C',
+    'C38': 'C', 'C3Y': 'C', 'C42': 'C', 'C43': 'C', 'C45': 'C',
+    'C46': 'C', 'C49': 'C', 'C4R': 'C', 'C4S': 'C', 'C5C': 'C',
+    'C66': 'X', 'C6C': 'C', 'C99': 'TFG', 'CAF': 'C', 'CAL': 'X',
+    'CAR': 'C', 'CAS': 'C', 'CAV': 'X', 'CAY': 'C', 'CB2': 'C',
+    'CBR': 'C', 'CBV': 'C', 'CCC': 'C', 'CCL': 'K', 'CCS': 'C',
+    'CCY': 'CYG', 'CDE': 'X', 'CDV': 'X', 'CDW': 'C', 'CEA': 'C',
+    'CFL': 'C', 'CFY': 'FCYG', 'CG1': 'G', 'CGA': 'E', 'CGU': 'E',
+    'CH ': 'C', 'CH6': 'MYG', 'CH7': 'KYG', 'CHF': 'X', 'CHG': 'X',
+    'CHP': 'G', 'CHS': 'X', 'CIR': 'R', 'CJO': 'GYG', 'CLE': 'L',
+    'CLG': 'K', 'CLH': 'K', 'CLV': 'AFG', 'CM0': 'N', 'CME': 'C',
+    'CMH': 'C', 'CML': 'C', 'CMR': 'C', 'CMT': 'C', 'CNU': 'U',
+    'CP1': 'C', 'CPC': 'X', 'CPI': 'X', 'CQR': 'GYG', 'CR0': 'TLG',
+    'CR2': 'GYG', 'CR5': 'G', 'CR7': 'KYG', 'CR8': 'HYG', 'CRF': 'TWG',
+    'CRG': 'THG', 'CRK': 'MYG', 'CRO': 'GYG', 'CRQ': 'QYG', 'CRU': 'E',
+    'CRW': 'ASG', 'CRX': 'ASG', 'CS0': 'C', 'CS1': 'C', 'CS3': 'C',
+    'CS4': 'C', 'CS8': 'N', 'CSA': 'C', 'CSB': 'C', 'CSD': 'C',
+    'CSE': 'C', 'CSF': 'C', 'CSH': 'SHG', 'CSI': 'G', 'CSJ': 'C',
+    'CSL': 'C', 'CSO': 'C', 'CSP': 'C', 'CSR': 'C', 'CSS': 'C',
+    'CSU': 'C', 'CSW': 'C', 'CSX': 'C', 'CSY': 'SYG', 'CSZ': 'C',
+    'CTE': 'W', 'CTG': 'T', 'CTH': 'T', 'CUC': 'X', 'CWR': 'S',
+    'CXM': 'M', 'CY0': 'C', 'CY1': 'C', 'CY3': 'C', 'CY4': 'C',
+    'CYA': 'C', 'CYD': 'C', 'CYF': 'C', 'CYG': 'C', 'CYJ': 'X',
+    'CYM': 'C', 'CYQ': 'C', 'CYR': 'C', 'CYS': 'C', 'CZ2': 'C',
+    'CZO': 'GYG', 'CZZ': 'C', 'D11': 'T', 'D1P': 'N', 'D3 ': 'N',
+    'D33': 'N', 'D3P': 'G', 'D3T': 'T', 'D4M': 'T', 'D4P': 'X',
+    'DA ': 'A', 'DA2': 'X', 'DAB': 'A', 'DAH': 'F', 'DAL': 'A',
+    'DAR': 'R', 'DAS': 'D', 'DBB': 'T', 'DBM': 'N', 'DBS': 'S',
+    'DBU': 'T', 'DBY': 'Y', 'DBZ': 'A', 'DC ': 'C', 'DC2': 'C',
+    'DCG': 'G', 'DCI': 'X', 'DCL': 'X', 'DCT': 'C', 'DCY': 'C',
+    'DDE': 'H', 'DDG': 'G', 'DDN': 'U', 'DDX': 'N', 'DFC': 'C',
+    'DFG': 'G', 'DFI': 'X', 'DFO': 'X', 'DFT': 'N', 'DG ': 'G',
+    'DGH': 'G', 'DGI': 'G', 'DGL': 'E', 'DGN': 'Q', 'DHA': 'A',
+    'DHI': 'H', 'DHL': 'X', 'DHN': 'V', 'DHP': 'X', 'DHU': 'U',
+    'DHV': 'V', 'DI ': 'I', 'DIL': 'I', 'DIR': 'R', 'DIV': 'V',
+    'DLE': 'L', 'DLS': 'K', 'DLY': 'K', 'DM0': 'K', 'DMH': 'N',
+    'DMK': 'D', 'DMT': 'X', 'DN ': 'N', 'DNE': 'L', 'DNG': 'L',
+    'DNL': 'K', 'DNM': 'L', 'DNP': 'A', 'DNR': 'C', 'DNS': 'K',
+    'DOA': 'X', 'DOC': 'C', 'DOH': 'D', 'DON': 'L', 'DPB': 'T',
+    'DPH': 'F', 'DPL': 'P', 'DPP': 'A', 'DPQ': 'Y', 'DPR': 'P',
+    'DPY': 'N', 'DRM': 'U', 'DRP': 'N', 'DRT': 'T', 'DRZ': 'N',
+    'DSE': 'S', 'DSG': 'N', 'DSN': 'S', 'DSP': 'D', 'DT ': 'T',
+    'DTH': 'T', 'DTR': 'W', 'DTY': 'Y', 'DU ': 'U', 'DVA': 'V',
+    'DXD': 'N', 'DXN': 'N', 'DYG': 'DYG', 'DYS': 'C', 'DZM': 'A',
+    'E  ': 'A', 'E1X': 'A', 'EDA': 'A', 'EDC': 'G', 'EFC': 'C',
+    'EHP': 'F', 'EIT': 'T', 'ENP': 'N', 'ESB': 'Y', 'ESC': 'M',
+    'EXY': 'L', 'EY5': 'N', 'EYS': 'X', 'F2F': 'F', 'FA2': 'A',
+    'FA5': 'N', 'FAG': 'N', 'FAI': 'N', 'FCL': 'F', 'FFD': 'N',
+    'FGL': 'G', 'FGP': 'S', 'FHL': 'X', 'FHO': 'K', 'FHU': 'U',
+    'FLA': 'A', 'FLE': 'L', 'FLT': 'Y', 'FME': 'M', 'FMG': 'G',
+    'FMU': 'N', 'FOE': 'C', 'FOX': 'G', 'FP9': 'P', 'FPA': 'F',
+    'FRD': 'X', 'FT6': 'W', 'FTR': 'W', 'FTY': 'Y', 'FZN': 'K',
+    'G  ': 'G', 'G25': 'G', 'G2L': 'G', 'G2S': 'G', 'G31': 'G',
+    'G32': 'G', 'G33': 'G', 'G36': 'G', 'G38': 'G', 'G42': 'G',
+    'G46': 'G', 'G47': 'G', 'G48': 'G', 'G49': 'G', 'G4P': 'N',
+    'G7M': 'G', 'GAO': 'G', 'GAU': 'E', 'GCK': 'C', 'GCM': 'X',
+    'GDP': 'G', 'GDR': 'G', 'GFL': 'G', 'GGL': 'E', 'GH3': 'G',
+    'GHG': 'Q', 'GHP': 'G', 'GL3': 'G', 'GLH': 'Q', 'GLM': 'X',
+    'GLN': 'Q', 'GLQ': 'E', 'GLU': 'E', 'GLX': 'Z', 'GLY': 'G',
+    'GLZ': 'G', 'GMA': 'E', 'GMS': 'G', 'GMU': 'U', 'GN7': 'G',
+    'GND': 'X', 'GNE': 'N', 'GOM': 'G', 'GPL': 'K', 'GS ': 'G',
+    'GSC': 'G', 'GSR': 'G', 'GSS': 'G', 'GSU': 'E', 'GT9': 'C',
+    'GTP': 'G', 'GVL': 'X', 'GYC': 'CYG', 'GYS': 'SYG', 'H2U': 'U',
+    'H5M': 'P', 'HAC': 'A', 'HAR': 'R', 'HBN': 'H', 'HCS': 'X',
+    'HDP': 'U', 'HEU': 'U', 'HFA': 'X', 'HGL': 'X', 'HHI': 'H',
+    'HHK': 'AK', 'HIA': 'H', 'HIC': 'H', 'HIP': 'H', 'HIQ': 'H',
+    'HIS': 'H', 'HL2': 'L', 'HLU': 'L', 'HMF': 'A', 'HMR': 'R',
+    'HOL': 'N', 'HPC': 'F', 'HPE': 'F', 'HPQ': 'F', 'HQA': 'A',
+    'HRG': 'R', 'HRP': 'W', 'HS8': 'H', 'HS9': 'H', 'HSE': 'S',
+    'HSL': 'S', 'HSO': 'H', 'HTI': 'C', 'HTN': 'N', 'HTR': 'W',
+    'HV5': 'A', 'HVA': 'V', 'HY3': 'P', 'HYP': 'P', 'HZP': 'P',
+    'I  ': 'I', 'I2M': 'I', 'I58': 'K', 'I5C': 'C', 'IAM': 'A',
+    'IAR': 'R', 'IAS': 'D', 'IC ': 'C', 'IEL': 'K', 'IEY': 'HYG',
+    'IG ': 'G', 'IGL': 'G', 'IGU': 'G', 'IIC': 'SHG', 'IIL': 'I',
+    'ILE': 'I', 'ILG': 'E', 'ILX': 'I', 'IMC': 'C', 'IML': 'I',
+    'IOY': 'F', 'IPG': 'G', 'IPN': 'N', 'IRN': 'N', 'IT1': 'K',
+    'IU ': 'U', 'IYR': 'Y', 'IYT': 'T', 'JJJ': 'C', 'JJK': 'C',
+    'JJL': 'C', 'JW5': 'N', 'K1R': 'C', 'KAG': 'G', 'KCX': 'K',
+    'KGC': 'K', 'KOR': 'M', 'KPI': 'K', 'KST': 'K', 'KYQ': 'K',
+    'L2A': 'X', 'LA2': 'K', 'LAA': 'D', 'LAL': 'A', 'LBY': 'K',
+    'LC ': 'C', 'LCA': 'A', 'LCC': 'N', 'LCG': 'G', 'LCH': 'N',
+    'LCK': 'K', 'LCX': 'K', 'LDH': 'K', 'LED': 'L', 'LEF': 'L',
+    'LEH': 'L', 'LEI': 'V', 'LEM': 'L', 'LEN': 'L', 'LET': 'X',
+    'LEU': 'L', 'LG ': 'G', 'LGP': 'G', 'LHC': 'X', 'LHU': 'U',
+    'LKC': 'N', 'LLP': 'K', 'LLY': 'K', 'LME': 'E', 'LMQ': 'Q',
+    'LMS': 'N', 'LP6': 'K', 'LPD': 'P', 'LPG': 'G', 'LPL': 'X',
+    'LPS': 'S', 'LSO': 'X', 'LTA': 'X', 'LTR': 'W', 'LVG': 'G',
+    'LVN': 'V', 'LYM': 'K', 'LYN': 'K', 'LYR': 'K', 'LYS': 'K',
+    'LYX': 'K', 'LYZ': 'K', 'M0H': 'C', 'M1G': 'G', 'M2G': 'G',
+    'M2L': 'K', 'M2S': 'M', 'M3L': 'K', 'M5M': 'C', 'MA ': 'A',
+    'MA6': 'A', 'MA7': 'A', 'MAA': 'A', 'MAD': 'A', 'MAI': 'R',
+    'MBQ': 'Y', 'MBZ': 'N', 'MC1': 'S', 'MCG': 'X', 'MCL': 'K',
+    'MCS': 'C', 'MCY': 'C', 'MDH': 'X', 'MDO': 'ASG', 'MDR': 'N',
+    'MEA': 'F', 'MED': 'M', 'MEG': 'E', 'MEN': 'N', 'MEP': 'U',
+    'MEQ': 'Q', 'MET': 'M', 'MEU': 'G', 'MF3': 'X', 'MFC': 'GYG',
+    'MG1': 'G', 'MGG': 'R', 'MGN': 'Q', 'MGQ': 'A', 'MGV': 'G',
+    'MGY': 'G', 'MHL': 'L', 'MHO': 'M', 'MHS': 'H', 'MIA': 'A',
+    'MIS': 'S', 'MK8': 'L', 'ML3': 'K', 'MLE': 'L', 'MLL': 'L',
+    'MLY': 'K', 'MLZ': 'K', 'MME': 'M', 'MMT': 'T', 'MND': 'N',
+    'MNL': 'L', 'MNU': 'U', 'MNV': 'V', 'MOD': 'X', 'MP8': 'P',
+    'MPH': 'X', 'MPJ': 'X', 'MPQ': 'G', 'MRG': 'G', 'MSA': 'G',
+    'MSE': 'M', 'MSL': 'M', 'MSO': 'M', 'MSP': 'X', 'MT2': 'M',
+    'MTR': 'T', 'MTU': 'A', 'MTY': 'Y', 'MVA': 'V', 'N  ': 'N',
+    'N10': 'S', 'N2C': 'X', 'N5I': 'N', 'N5M': 'C', 'N6G': 'G',
+    'N7P': 'P', 'NA8': 'A', 'NAL': 'A', 'NAM': 'A', 'NB8': 'N',
+    'NBQ': 'Y', 'NC1': 'S', 'NCB': 'A', 'NCX': 'N', 'NCY': 'X',
+    'NDF': 'F', 'NDN': 'U', 'NEM': 'H', 'NEP': 'H', 'NF2': 'N',
+    'NFA': 'F', 'NHL': 'E', 'NIT': 'X', 'NIY': 'Y', 'NLE': 'L',
+    'NLN': 'L', 'NLO': 'L', 'NLP': 'L', 'NLQ': 'Q', 'NMC': 'G',
+    'NMM': 'R', 'NMS': 'T', 'NMT': 'T', 'NNH': 'R', 'NP3': 'N',
+    'NPH': 'C', 'NRP': 'LYG', 'NRQ': 'MYG', 'NSK': 'X', 'NTY': 'Y',
+    'NVA': 'V', 'NYC': 'TWG', 'NYG': 'NYG', 'NYM': 'N', 'NYS': 'C',
+    'NZH': 'H', 'O12': 'X', 'O2C': 'N', 'O2G': 'G', 'OAD': 'N',
+    'OAS': 'S', 'OBF': 'X', 'OBS': 'X', 'OCS': 'C', 'OCY': 'C',
+    'ODP': 'N', 'OHI': 'H', 'OHS': 'D', 'OIC': 'X', 'OIP': 'I',
+    'OLE': 'X', 'OLT': 'T', 'OLZ': 'S', 'OMC': 'C', 'OMG': 'G',
+    'OMT': 'M', 'OMU': 'U', 'ONE': 'U', 'ONL': 'X', 'OPR': 'R',
+    'ORN': 'A', 'ORQ': 'R', 'OSE': 'S', 'OTB': 'X', 'OTH': 'T',
+    'OTY': 'Y', 'OXX': 'D', 'P  ': 'G', 'P1L': 'C', 'P1P': 'N',
+    'P2T': 'T', 'P2U': 'U', 'P2Y': 'P', 'P5P': 'A', 'PAQ': 'Y',
+    'PAS': 'D', 'PAT': 'W', 'PAU': 'A', 'PBB': 'C', 'PBF': 'F',
+    'PBT': 'N', 'PCA': 'E', 'PCC': 'P', 'PCE': 'X', 'PCS': 'F',
+    'PDL': 'X', 'PDU': 'U', 'PEC': 'C', 'PF5': 'F', 'PFF': 'F',
+    'PFX': 'X', 'PG1': 'S', 'PG7': 'G', 'PG9': 'G', 'PGL': 'X',
+    'PGN': 'G', 'PGP': 'G', 'PGY': 'G', 'PHA': 'F', 'PHD': 'D',
+    'PHE': 'F', 'PHI': 'F', 'PHL': 'F', 'PHM': 'F', 'PIV': 'X',
+    'PLE': 'L', 'PM3': 'F', 'PMT': 'C', 'POM': 'P', 'PPN': 'F',
+    'PPU': 'A', 'PPW': 'G', 'PQ1': 'N', 'PR3': 'C', 'PR5': 'A',
+    'PR9': 'P', 'PRN': 'A', 'PRO': 'P', 'PRS': 'P', 'PSA': 'F',
+    'PSH': 'H', 'PST': 'T', 'PSU': 'U', 'PSW': 'C', 'PTA': 'X',
+    'PTH': 'Y', 'PTM': 'Y', 'PTR': 'Y', 'PU ': 'A', 'PUY': 'N',
+    'PVH': 'H', 'PVL': 'X', 'PYA': 'A', 'PYO': 'U', 'PYX': 'C',
+    'PYY': 'N', 'QLG': 'QLG', 'QUO': 'G', 'R  ': 'A', 'R1A': 'C',
+    'R1B': 'C', 'R1F': 'C', 'R7A': 'C', 'RC7': 'HYG', 'RCY': 'C',
+    'RIA': 'A', 'RMP': 'A', 'RON': 'X', 'RT ': 'T', 'RTP': 'N',
+    'S1H': 'S', 'S2C': 'C', 'S2D': 'A', 'S2M': 'T', 'S2P': 'A',
+    'S4A': 'A', 'S4C': 'C', 'S4G': 'G', 'S4U': 'U', 'S6G': 'G',
+    'SAC': 'S', 'SAH': 'C', 'SAR': 'G', 'SBL': 'S', 'SC ': 'C',
+    'SCH': 'C', 'SCS': 'C', 'SCY': 'C', 'SD2': 'X', 'SDG': 'G',
+    'SDP': 'S', 'SEB': 'S', 'SEC': 'A', 'SEG': 'A', 'SEL': 'S',
+    'SEM': 'X', 'SEN': 'S', 'SEP': 'S', 'SER': 'S', 'SET': 'S',
+    'SGB': 'S', 'SHC': 'C', 'SHP': 'G', 'SHR': 'K', 'SIB': 'C',
+    'SIC': 'DC', 'SLA': 'P', 'SLR': 'P', 'SLZ': 'K', 'SMC': 'C',
+    'SME': 'M', 'SMF': 'F', 'SMP': 'A', 'SMT': 'T', 'SNC': 'C',
+    'SNN': 'N', 'SOC': 'C', 'SOS': 'N', 'SOY': 'S', 'SPT': 'T',
+    'SRA': 'A', 'SSU': 'U', 'STY': 'Y', 'SUB': 'X', 'SUI': 'DG',
+    'SUN': 'S', 'SUR': 'U', 'SVA': 'S', 'SVX': 'S', 'SVZ': 'X',
+    'SYS': 'C', 'T  ': 'T', 'T11': 'F', 'T23': 'T', 'T2S': 'T',
+    'T2T': 'N', 'T31': 'U', 'T32': 'T', 'T36': 'T', 'T37': 'T',
+    'T38': 'T', 'T39': 'T', 'T3P': 'T', 'T41': 'T', 'T48': 'T',
+    'T49': 'T', 'T4S': 'T', 'T5O': 'U', 'T5S': 'T', 'T66': 'X',
+    'T6A': 'A', 'TA3': 'T', 'TA4': 'X', 'TAF': 'T', 'TAL': 'N',
+    'TAV': 'D', 'TBG': 'V', 'TBM': 'T', 'TC1': 'C', 'TCP': 'T',
+    'TCQ': 'X', 'TCR': 'W', 'TCY': 'A', 'TDD': 'L', 'TDY': 'T',
+    'TFE': 'T', 'TFO': 'A', 'TFQ': 'F', 'TFT': 'T', 'TGP': 'G',
+    'TH6': 'T', 'THC': 'T', 'THO': 'X', 'THR': 'T', 'THX': 'N',
+    'THZ': 'R', 'TIH': 'A', 'TLB': 'N', 'TLC': 'T', 'TLN': 'U',
+    'TMB': 'T', 'TMD': 'T', 'TNB': 'C', 'TNR': 'S', 'TOX': 'W',
+    'TP1': 'T', 'TPC': 'C', 'TPG': 'G', 'TPH': 'X', 'TPL': 'W',
+    'TPO': 'T', 'TPQ': 'Y', 'TQQ': 'W', 'TRF': 'W', 'TRG': 'K',
+    'TRN': 'W', 'TRO': 'W', 'TRP': 'W', 'TRQ': 'W', 'TRW': 'W',
+    'TRX': 'W', 'TS ': 'N', 'TST': 'X', 'TT ': 'N', 'TTD': 'T',
+    'TTI': 'U', 'TTM': 'T', 'TTQ': 'W', 'TTS': 'Y', 'TY2': 'Y',
+    'TY3': 'Y', 'TYB': 'Y', 'TYI': 'Y', 'TYN': 'Y', 'TYO': 'Y',
+    'TYQ': 'Y', 'TYR': 'Y', 'TYS': 'Y', 'TYT': 'Y', 'TYU': 'N',
+    'TYX': 'X', 'TYY': 'Y', 'TZB': 'X', 'TZO': 'X', 'U  ': 'U',
+    'U25': 'U', 'U2L': 'U', 'U2N': 'U', 'U2P': 'U', 'U31': 'U',
+    'U33': 'U', 'U34': 'U', 'U36': 'U', 'U37': 'U', 'U8U': 'U',
+    'UAR': 'U', 'UCL': 'U', 'UD5': 'U', 'UDP': 'N', 'UFP': 'N',
+    'UFR': 'U', 'UFT': 'U', 'UMA': 'A', 'UMP': 'U', 'UMS': 'U',
+    'UN1': 'X', 'UN2': 'X', 'UNK': 'X', 'UR3': 'U', 'URD': 'U',
+    'US1': 'U', 'US2': 'U', 'US3': 'T', 'US5': 'U', 'USM': 'U',
+    'V1A': 'C', 'VAD': 'V', 'VAF': 'V', 'VAL': 'V', 'VB1': 'K',
+    'VDL': 'X', 'VLL': 'X', 'VLM': 'X', 'VMS': 'X', 'VOL': 'X',
+    'X  ': 'G', 'X2W': 'E', 'X4A': 'N', 'X9Q': 'AFG', 'XAD': 'A',
+    'XAE': 'N', 'XAL': 'A', 'XAR': 'N', 'XCL': 'C', 'XCP': 'X',
+    'XCR': 'C', 'XCS': 'N', 'XCT': 'C', 'XCY': 'C', 'XGA': 'N',
+    'XGL': 'G', 'XGR': 'G', 'XGU': 'G', 'XTH': 'T', 'XTL': 'T',
+    'XTR': 'T', 'XTS': 'G', 'XTY': 'N', 'XUA': 'A', 'XUG': 'G',
+    'XX1': 'K', 'XXY': 'THG', 'XYG': 'DYG', 'Y  ': 'A', 'YCM': 'C',
+    'YG ': 'G', 'YOF': 'Y', 'YRR': 'N', 'YYG': 'G', 'Z  ': 'C',
+    'ZAD': 'A', 'ZAL': 'A', 'ZBC': 'C', 'ZCY': 'C', 'ZDU': 'U',
+    'ZFB': 'X', 'ZGU': 'G', 'ZHP': 'N', 'ZTH': 'T', 'ZZJ': 'A'}
+
+# Lookup table that additionally contains the residue names without the
+# blank padding of the table above, built on first use
+one_letter_lookup = {}
+
+
+def three_to_one(resn, default="X"):
+    """
+    Return the one letter code of the residue name resn,
+    or default if the residue name is unknown
+    """
+    if not one_letter_lookup:
+        for name, code in one_letter.items():
+            one_letter_lookup[name] = code
+            one_letter_lookup[name.strip()] = code
+    try:
+        return one_letter_lookup[resn]
+    except KeyError:
+        return one_letter_lookup.get(resn.strip().upper(), default)
+
+
+def register_residue(resn, code):
+    """
+    Register a non-standard residue name with its one letter code(s), e.g.
+    register_residue("MYK", "K"), so it is recognized by all searches
+    """
+    resn = resn.strip().upper()
+    code = code.strip().upper()
+    if not resn or not code.isalpha():
+        print("Error: register_residue needs a residue name and a one letter code.")
+        return
+    one_letter[resn] = code
+    if one_letter_lookup:
+        one_letter_lookup[resn] = code
+
+    # Residues might have been translated with the old code, so rebuild all indices
+    invalidate_sequence_index()
+
+extend_command("register_residue", register_residue)
+
+
+#=====================================================
+# Per object/selection cache of the residue sequences
+#=====================================================
+
+# Cached SequenceIndex instances, keyed by (haystack, het)
+sequence_index_cache = {}
+
+# Counter that is increased whenever cached indices have to be considered stale
+# e.g. after structures have been edited in place with alter, remove or fab
+modification_counter = 0
+
+
+class SequenceIndex(object):
+    """
+    Residue sequence of a PyMol object/selection as used by findseq.
+    IDs, AAs and chains are aligned per residue (one entry per CA atom).
+    """
+    def __init__(self, haystack, het, fingerprint, aaList):
+        self.haystack = haystack
+        self.het = het
+        self.fingerprint = fingerprint
+        self.IDs = []
+        self.chains = []
+        self.models = []
+        AAs = []
+        for resi, resn, chain, model in aaList:
+            code = three_to_one(resn)
+            # residues with more than one letter get one entry per letter,
+            # which keeps IDs and chains aligned with the sequence
+            for letter in code:
+                self.IDs.append(int(resi))
+                self.chains.append(chain)
+                self.models.append(model)
+            AAs.append(code)
+        self.AAs = ''.join(AAs)
+
+        # Start positions of the chains in the sequence,
+        # a new chain starts whenever the chain or the object changes
+        self.segments = [p for p in range(len(self.AAs))
+                         if p == 0 or self.chains[p] != self.chains[p - 1]
+                         or self.models[p] != self.models[p - 1]]
+
+        # Chains with identical sequences, e.g. the copies in symmetric assemblies,
+        # as (first, last, starts of all copies) of the first copy of each sequence.
+        # Matchers only search the first copies, see fan_out.
+        self.unique_chains = []
+        copies = {}
+        bounds = self.segments + [len(self.AAs)]
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            sequence = self.AAs[first:last]
+            if sequence in copies:
+                copies[sequence].append(first)
+            else:
+                copies[sequence] = [first]
+                self.unique_chains.append((first, last, copies[sequence]))
+
+        # Stack of (query, occurrences) of the last plain queries, each query
+        # being an extension of the one below, used by find_literal
+        # The lock guards it against searches running in parallel threads
+        self.refinements = []
+        self.lock = threading.Lock()
+
+    def find(self, reNeedle, firstOnly=0, memo=None, cancelled=None, deadline=None):
+        """
+        Return the (start, stop) spans of all matches of the regular
+        expression reNeedle, compiled with compile_pattern, that lie
+        within a single chain. Each distinct chain sequence is matched
+        once, also across indices if they share the dictionary memo.
+        cancelled and deadline are passed on to chain_spans.
+        """
+        if memo is None:
+            memo = {}
+        sequences = [self.AAs[first:last] for first, last, starts in self.unique_chains]
+        todo = [AAs for AAs in set(sequences) if AAs not in memo]
+        found = chain_spans(reNeedle, todo, firstOnly, cancelled, deadline)
+        # the matches of a cancelled search are incomplete
+        if cancelled is not None and cancelled.is_set():
+            return []
+        memo.update(zip(todo, found))
+
+        spans = []
+        for (first, last, starts), AAs in zip(self.unique_chains, sequences):
+            spans.extend([(first + start, first + stop) for start, stop in memo[AAs]])
+        return self.fan_out(spans, firstOnly)
+
+    def iter_find(self, reNeedle, memo=None, cancelled=None, deadline=None):
+        """
+        Yield the spans of the matches of reNeedle like find, but chain by
+        chain in the order of the chains. Identical chains are matched once,
+        also across indices if they share the dictionary memo. Stops when
+        the event cancelled is set, guarded patterns raise SearchTimeout
+        after the time deadline (or regex_timeout per chain if it is None).
+        """
+        if memo is None:
+            memo = {}
+        bounds = self.segments + [len(self.AAs)]
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            if cancelled is not None and cancelled.is_set():
+                return
+            AAs = self.AAs[first:last]
+            if AAs not in memo:
+                found = chain_spans(reNeedle, [AAs], 0, cancelled, deadline)[0]
+                if cancelled is not None and cancelled.is_set():
+                    return
+                memo[AAs] = found
+            for start, stop in memo[AAs]:
+                yield (first + start, first + stop)
+
+    def fan_out(self, spans, firstOnly=0):
+        """
+        Return the spans found in the first copies of the chains together
+        with the same spans in all identical copies, sorted by position
+        """
+        if len(self.unique_chains) == len(self.segments):
+            return sorted(spans)[:1] if int(firstOnly) else sorted(spans)
+        copies = dict([(first, starts) for first, last, starts in self.unique_chains])
+        result = []
+        for span in spans:
+            first = self.segments[bisect.bisect_right(self.segments, span[0]) - 1]
+            for start in copies[first]:
+                shift = start - first
+                result.append((span[0] + shift, span[1] + shift) + tuple(span[2:]))
+        result.sort()
+        if int(firstOnly):
+            return result[:1]
+        return result
+
+    def find_literal(self, query, firstOnly=0):
+        """
+        Return the spans of the plain (alphanumeric) query like find does.
+        If the query extends or shortens one of the last queries, only the
+        occurrences of that query are checked instead of the whole sequence.
+        """
+        query = query.upper()
+        with self.lock:
+            occurrences = self.refine(query)
+
+        # the occurrences are those in the first copies of the chains,
+        # refined occurrences can reach into the next chain
+        spans = self.fan_out([(p, p + len(query)) for p in occurrences
+                              if self.in_one_chain(p, p + len(query))])
+        return literal_spans([start for start, stop in spans], len(query), None, firstOnly)
+
+    def refine(self, query):
+        """
+        Return all occurrences of query, using and updating the refinement stack
+        """
+        stack = self.refinements
+
+        # forget the queries that the new query does not extend
+        while stack and not query.startswith(stack[-1][0]):
+            stack.pop()
+
+        if stack and stack[-1][0] == query:
+            occurrences = stack[-1][1]
+        elif stack:
+            # every occurrence of the query is an occurrence of the shorter one,
+            # so only check if these continue with the additional letters
+            prev_query, prev_occurrences = stack[-1]
+            extension = query[len(prev_query):]
+            offset = len(prev_query)
+            AAs = self.AAs
+            occurrences = [p for p in prev_occurrences if AAs.startswith(extension, p + offset)]
+            stack.append((query, occurrences))
+        else:
+            # all, also overlapping occurrences, are needed for refining them later on,
+            # identical copies of chains are left to fan_out
+            occurrences = []
+            for first, last, starts in self.unique_chains:
+                p = self.AAs.find(query, first, last)
+                while p != -1:
+                    occurrences.append(p)
+                    p = self.AAs.find(query, p + 1, last)
+            stack.append((query, occurrences))
+
+        return occurrences
+
+    def in_one_chain(self, start, stop):
+        """
+        Check if the residues from start to stop belong to the same chain
+        """
+        return in_one_segment(self.segments, start, stop)
+
+    def selection(self, spans):
+        """
+        Return a single selection expression for the residues of all spans,
+        with the residue ranges merged per object and chain
+        """
+        ranges = {}
+        for span in spans:
+            # spans of approximate hits additionally carry their distance
+            (start, stop) = span[:2]
+            key = (self.models[start], self.chains[start])
+            first = self.IDs[start]
+            last = self.IDs[stop - 1]
+            ranges.setdefault(key, []).append((min(first, last), max(first, last)))
+
+        if not ranges:
+            return "none"
+
+        terms = []
+        for (model, chain), chain_ranges in sorted(ranges.items()):
+            chain_ranges.sort()
+            merged = [list(chain_ranges[0])]
+            for first, last in chain_ranges[1:]:
+                if first <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], last)
+                else:
+                    merged.append([first, last])
+            resi = "+".join(["%s-%s" % (resi_string(first), resi_string(last))
+                             for first, last in merged])
+            terms.append("(model %s and c. %s and i. %s)" % (model, chain or "''", resi))
+
+        return "(%s) and (%s)" % (index_selection(self.haystack, self.het),
+                                  " or ".join(terms))
+
+
+def in_one_segment(segments, start, stop):
+    """
+    Check if start to stop lies within one of the chains starting at segments
+    """
+    return bisect.bisect_right(segments, start) == bisect.bisect_right(segments, stop - 1)
+
+
+def match_spans(reNeedle, AAs, segments, firstOnly=0):
+    """
+    Return the (start, stop) spans of all matches of the compiled regular
+    expression reNeedle in AAs that lie within a single chain
+    """
+    spans = []
+    for i in reNeedle.finditer(AAs):
+        (start, stop) = i.span()
+        # are all residues from one chain of one object?
+        if start == stop or not in_one_segment(segments, start, stop):
+            # now they are not, this match is not really a match, skip it
+            continue
+        spans.append((start, stop))
+        if int(firstOnly):
+            break
+    return spans
+
+
+def literal_spans(occurrences, length, segments=None, firstOnly=0):
+    """
+    Return the spans of the sorted occurrences of a plain sequence of the
+    given length, that finditer would return for it
+    """
+    spans = []
+    last = 0
+    for p in occurrences:
+        # like finditer, skip occurrences overlapping the previous match
+        if p < last:
+            continue
+        last = p + length
+        if segments is not None and not in_one_segment(segments, p, last):
+            continue
+        spans.append((p, last))
+        if int(firstOnly):
+            break
+    return spans
+
+
+def resi_string(resi):
+    """
+    Residue number for a selection expression, negative numbers need escaping
+    """
+    if resi < 0:
+        return "\\%i" % resi
+    return "%i" % resi
+
+
+def index_selection(haystack, het):
+    """
+    Selection of the residues of haystack that are considered for the sequence
+    """
+    # remove hetero atoms (waters/ligands/etc) from consideration?
+    if het:
+        return "br. " + haystack
+    else:
+        return "br. " + haystack + " and not het"
+
+
+def hits_selection(hits):
+    """
+    Return a single selection expression for a list of (index, span) hits,
+    the spans of consecutive hits in the same index are merged
+    """
+    terms = ["(%s)" % index.selection([span for (same_index, span) in group])
+             for index, group in itertools.groupby(hits, key=lambda hit: hit[0])]
+    return " or ".join(terms) or "none"
+
+
+def hit_counts(results):
+    """
+    Return the number of hits and of the chains with hits
+    in a list of (haystack, index, spans) search results
+    """
+    hits = 0
+    chains = set()
+    for haystack, index, spans in results:
+        hits += len(spans)
+        chains.update([(index.models[span[0]], index.chains[span[0]]) for span in spans])
+    return (hits, len(chains))
+
+
+def molecule_objects():
+    """
+    Return the names of all molecule objects, which together contain
+    the atoms of every selection exactly once
+    """
+    return [name for name in cmd.get_names("objects")
+            if cmd.get_type(name) == "object:molecule"]
+
+
+def index_fingerprint(haystack, het):
+    """
+    Cheap fingerprint of a haystack, the index is rebuilt when it changes
+    """
+    sele = index_selection(haystack, het)
+    fingerprint = (cmd.count_atoms(sele),
+                   cmd.count_atoms("(name ca) and " + sele),
+                   cmd.count_states(haystack),
+                   cmd.get_state(),
+                   modification_counter)
+
+    # selections can be moved to other atoms without changing the counts,
+    # e.g. from one chain of a homodimer to the other
+    if cmd.get_type(haystack) != "object:molecule":
+        fingerprint += (hash(tuple(cmd.identify("(name ca) and " + sele, 1))),)
+    return fingerprint
+
+
+def get_sequence_index(haystack, het):
+    """
+    Return the SequenceIndex of haystack, only iterating over the atoms
+    if there is no cached index or the haystack changed since it was built
+    """
+    het = int(het)
+    key = (haystack, het)
+    fingerprint = index_fingerprint(haystack, het)
+
+    index = sequence_index_cache.get(key)
+    if index is not None and index.fingerprint == fingerprint:
+        return index
+
+    # get the AAs in the haystack
+    aaDict = {'aaList': []}
+    cmd.iterate("(name ca) and " + index_selection(haystack, het),
+                "aaList.append((resi,resn,chain,model))", space=aaDict)
+
+    index = SequenceIndex(haystack, het, fingerprint, aaDict['aaList'])
+    sequence_index_cache[key] = index
+    return index
+
+
+def find_spans(index, needle, firstOnly=0, memo=None, cancelled=None, deadline=None):
+    """
+    Return the spans of the hits of needle in the SequenceIndex index.
+    needle is a sequence, a regular expression or a matcher object
+    with a find(index, firstOnly) method, like MotifAutomaton.
+    Regular expressions share the matches of identical chains of
+    different indices in the dictionary memo, and raise SearchTimeout
+    if they take too long, or run past the time deadline of a search of
+    many indices. The hits of recent needles are looked up in the result cache.
+    """
+    if not is_string(needle):
+        return needle.find(index, firstOnly)
+
+    spans = cached_spans(needle, index, firstOnly)
+    if spans is not None:
+        return spans
+
+    # plain sequences are refined from the previous search, e.g. while typing
+    if needle.isalnum():
+        spans = index.find_literal(needle, firstOnly)
+    else:
+        reNeedle = compile_pattern(needle.upper())
+        spans = index.find(reNeedle, firstOnly, memo, cancelled, deadline)
+
+    # the hits of a cancelled search may be incomplete
+    if cancelled is None or not cancelled.is_set():
+        cache_spans(needle, index, firstOnly, spans)
+    return spans
+
+
+def iter_spans(index, needle, memo=None, cancelled=None, deadline=None):
+    """
+    Yield the spans of the hits of needle in the SequenceIndex index like
+    find_spans, but chain by chain, so that the search stops when no more
+    hits are taken or the event cancelled is set (see iter_find for the
+    deadline). The hits of matchers are all found at once.
+    """
+    spans = None
+    if is_string(needle):
+        spans = cached_spans(needle, index)
+    else:
+        spans = find_spans(index, needle)
+
+    if spans is None:
+        spans = index.iter_find(compile_pattern(needle.upper()), memo, cancelled, deadline)
+    for span in spans:
+        yield span
+
+
+def first_spans(index, needle, max_hits, memo=None, cancelled=None, deadline=None):
+    """
+    Return the spans of the first max_hits hits of needle in index,
+    and if there are more hits. Guarded patterns raise SearchTimeout
+    after the time deadline, by default regex_timeout from now.
+    """
+    if deadline is None:
+        deadline = time.time() + regex_timeout
+    spans = list(itertools.islice(iter_spans(index, needle, memo, cancelled, deadline),
+                                  max_hits + 1))
+    return (spans[:max_hits], len(spans) > max_hits)
+
+
+# The pool of processes for searching many objects, started on first use
+search_pool = None
+
+
+def get_search_pool():
+    """
+    Return the process pool for searching, sized to the number of cores
+    """
+    global search_pool
+    if search_pool is None:
+        search_pool = multiprocessing.Pool(search_processes or multiprocessing.cpu_count())
+    return search_pool
+
+
+def stop_search_pool():
+    """
+    Terminate the processes of the search pool, also if they are still
+    matching, the pool is started again when needed
+    """
+    global search_pool
+    if search_pool is not None:
+        search_pool.terminate()
+        search_pool = None
+
+
+def use_search_pool(needle, haystacks):
+    """
+    Check if the haystacks are numerous enough for being searched with the process pool
+    """
+    return (is_string(needle) and search_processes != 1 and
+            len(haystacks) >= pool_min_objects)
+
+
+def pool_search_worker(needle, haystacks, het, firstOnly, results, cancelled):
+    """
+    Like search_worker, but the sequences of all haystacks are exported once
+    and then matched in parallel by the processes of the search pool
+    """
+    indices = []
+    for n, haystack in enumerate(haystacks):
+        if cancelled.is_set():
+            return
+        if n % 50 == 0:
+            results.put(("progress", n, len(haystacks), haystack))
+        indices.append(get_sequence_index(haystack, het))
+
+    # identical chains of all haystacks are matched only once,
+    # as (index number, chain start) of all copies of each sequence
+    copies = collections.OrderedDict()
+    for n, index in enumerate(indices):
+        for first, last, starts in index.unique_chains:
+            copies.setdefault(index.AAs[first:last], []).append((n, first))
+    sequences = list(copies)
+
+    # the sequences are matched in chunks, each chunk is one job of the pool
+    pattern = needle.upper()
+    chunksize = max(1, len(sequences) // (4 * multiprocessing.cpu_count()))
+    chunks = [sequences[i:i + chunksize] for i in range(0, len(sequences), chunksize)]
+    pool = get_search_pool()
+    jobs = [pool.apply_async(scan_sequences, ((pattern, chunk, firstOnly),)) for chunk in chunks]
+
+    # patterns that may backtrack for very long get a time limit
+    deadline = None
+    if isinstance(compile_pattern(pattern), GuardedPattern):
+        deadline = time.time() + regex_timeout
+
+    found = [[] for index in indices]
+    m = 0
+    for job in jobs:
+        if not wait_pool_job(job, deadline, cancelled):
+            return
+        if cancelled.is_set():
+            return
+        results.put(("progress", m, len(sequences), haystacks[copies[sequences[m]][0][0]]))
+        for spans in job.get():
+            for n, first in copies[sequences[m]]:
+                found[n].extend([(first + start, first + stop) for start, stop in spans])
+            m += 1
+
+    for n, index in enumerate(indices):
+        spans = index.fan_out(found[n], firstOnly)
+        cache_spans(needle, index, firstOnly, spans)
+        results.put(("hits", haystacks[n], index, spans))
+
+    results.put(("done",))
+
+
+def search_worker(needle, haystacks, het, firstOnly, results, cancelled, max_hits=0):
+    """
+    Search needle in all haystacks, meant to be run in a background thread.
+    needle is anything find_spans accepts, e.g. a sequence or a MotifAutomaton.
+    Progress and hits are put into the queue results as
+    ("progress", n, total, haystack), ("hits", haystack, index, spans),
+    followed by ("done",), ("timeout", message) or ("error", haystack, message).
+    The search stops as soon as the event cancelled is set, and for sequences
+    and regular expressions after max_hits hits unless it is 0.
+    """
+    haystack = None
+    try:
+        # the objects are searched one by one until there are enough hits
+        if int(max_hits) > 0 and is_string(needle):
+            limited_search_worker(needle, haystacks, het, max_hits, results, cancelled)
+            return
+
+        # repeated searches are looked up in the result cache
+        cached = cached_hits(needle, haystacks, het, firstOnly)
+        if cached is not None:
+            for haystack, index, spans in cached:
+                results.put(("hits", haystack, index, spans))
+            results.put(("done",))
+            return
+
+        # plain sequences are looked up in the suffix array of many objects
+        if use_session_index(needle, haystacks):
+            session_search_worker(needle, haystacks, het, firstOnly, results, cancelled)
+            return
+
+        # many objects are searched in parallel processes
+        if use_search_pool(needle, haystacks):
+            pool_search_worker(needle, haystacks, het, firstOnly, results, cancelled)
+            return
+
+        # identical chains in different objects are matched only once,
+        # guarded patterns get regex_timeout for all objects together
+        memo = {}
+        deadline = time.time() + regex_timeout
+        for n, haystack in enumerate(haystacks):
+            if cancelled.is_set():
+                return
+            results.put(("progress", n, len(haystacks), haystack))
+
+            index = get_sequence_index(haystack, het)
+            spans = find_spans(index, needle, firstOnly, memo, cancelled, deadline)
+            results.put(("hits", haystack, index, spans))
+
+        results.put(("done",))
+
+    except SearchTimeout as e:
+        results.put(("timeout", str(e)))
+    except Exception as e:
+        results.put(("error", haystack, str(e)))
+
+
+def limited_search_worker(needle, haystacks, het, max_hits, results, cancelled):
+    """
+    Like search_worker, but the haystacks are searched one by one and
+    chain by chain until max_hits hits have been found. If there are more
+    hits ("limited", max_hits) is put into results before ("done",).
+    Guarded patterns get regex_timeout for all haystacks together.
+    """
+    memo = {}
+    found = 0
+    deadline = time.time() + regex_timeout
+    for n, haystack in enumerate(haystacks):
+        if cancelled.is_set():
+            return
+        results.put(("progress", n, len(haystacks), haystack))
+
+        index = get_sequence_index(haystack, het)
+        (spans, more) = first_spans(index, needle, max_hits - found, memo, cancelled, deadline)
+        if cancelled.is_set():
+            return
+        results.put(("hits", haystack, index, spans))
+        found += len(spans)
+
+        # the hits of the remaining haystacks are not needed anymore
+        if more or (found == max_hits and n + 1 < len(haystacks) and
+                    any_hits(needle, haystacks[n + 1:], het, memo, cancelled, deadline)):
+            results.put(("limited", max_hits))
+            break
+
+    if cancelled.is_set():
+        return
+    results.put(("done",))
+
+
+def any_hits(needle, haystacks, het, memo=None, cancelled=None, deadline=None):
+    """
+    Check if needle has at least one hit in any of the haystacks
+    """
+    for haystack in haystacks:
+        if cancelled is not None and cancelled.is_set():
+            return False
+        index = get_sequence_index(haystack, het)
+        if first_spans(index, needle, 0, memo, cancelled, deadline)[1]:
+            return True
+    return False
+
+
+def invalidate_sequence_index(haystack=None):
+    """
+    Drop the cached index of haystack, or of everything if haystack is None.
+    Call this after modifying structures in place, e.g. with cmd.alter.
+    """
+    global modification_counter
+    modification_counter += 1
+
+    if haystack is None:
+        sequence_index_cache.clear()
+    else:
+        for key in list(sequence_index_cache.keys()):
+            if key[0] == haystack:
+                del sequence_index_cache[key]
+
+extend_command("invalidate_sequence_index", invalidate_sequence_index)
+
+
+#=====================================================================
+# Linear-time matching of regular expressions with a lazily built DFA,
+# and matching with a time limit in a worker process for the rest
+#=====================================================================
+
+class SearchTimeout(Exception):
+    """
+    Raised when matching a regular expression takes longer than regex_timeout
+    """
+
+
+class UnsupportedPattern(Exception):
+    """
+    Raised for regular expressions that cannot be compiled to an automaton,
+    e.g. with backreferences, lookarounds or lazy repeats
+    """
+
+
+class AutomatonMatch(object):
+    """
+    Match of a PatternAutomaton, with the span method of a re match
+    """
+    __slots__ = ("start", "stop")
+
+    def __init__(self, start, stop):
+        self.start = start
+        self.stop = stop
+
+    def span(self):
+        return (self.start, self.stop)
+
+
+def charset_contains(charset, letter):
+    """
+    Check if the (negate, codes, ranges) character set of an automaton contains letter
+    """
+    (negate, codes, ranges) = charset
+    code = ord(letter)
+    found = code in codes or any([low <= code <= high for low, high in ranges])
+    return found != negate
+
+
+class LazyDFA(object):
+    """
+    DFA over the sets of states of an NFA, each state and transition is
+    built the first time it is needed. With restart=True the start state
+    is added after every letter, for finding matches that start anywhere.
+    """
+    def __init__(self, edges, epsilon, start, accept, restart=False):
+        self.edges = edges
+        self.epsilon = epsilon
+        self.start = start
+        self.accept = accept
+        self.restart = restart
+        self.clear()
+
+    def clear(self):
+        self.ids = {}
+        self.sets = []
+        self.accepting = []
+        self.dead = []
+        self.transitions = []
+        self.initial = self.state_id(self.closure([self.start]))
+
+    def closure(self, states):
+        seen = set(states)
+        stack = list(states)
+        while stack:
+            for t in self.epsilon[stack.pop()]:
+                if t not in seen:
+                    seen.add(t)
+                    stack.append(t)
+        return frozenset(seen)
+
+    def state_id(self, states):
+        d = self.ids.get(states)
+        if d is None:
+            d = len(self.sets)
+            self.ids[states] = d
+            self.sets.append(states)
+            self.accepting.append(self.accept in states)
+            self.dead.append(not states)
+            self.transitions.append({})
+        return d
+
+    def step(self, d, letter):
+        """
+        Return the state after reading letter in state d
+        """
+        following = self.transitions[d].get(letter)
+        if following is not None:
+            return following
+
+        moved = [t for s in self.sets[d] for charset, t in self.edges[s]
+                 if charset_contains(charset, letter)]
+        if self.restart:
+            moved.append(self.start)
+        states = self.closure(moved)
+
+        # forget all states if there are too many, they are built again when needed
+        if len(self.sets) >= automaton_max_dfa_states:
+            self.clear()
+            following = self.state_id(states)
+        else:
+            following = self.state_id(states)
+            self.transitions[d][letter] = following
+        return following
+
+
+class PatternAutomaton(object):
+    """
+    Regular expression compiled to a Thompson NFA, which is matched with
+    lazily built DFAs: a backward pass over the sequence marks where
+    matches start and a forward pass from each start finds its end.
+    Unlike the backtracking of the re module this never takes exponential
+    time, but the matches are the leftmost longest ones instead of the
+    leftmost first ones, which only differs for ambiguous patterns.
+    The NFA is shared by all threads using the cached automaton, but
+    each thread builds DFAs of its own.
+    """
+    def __init__(self, pattern, parsed=None):
+        self.pattern = pattern
+        if parsed is None:
+            parsed = sre_parse.parse(pattern)
+        state = getattr(parsed, "state", None) or parsed.pattern
+        if state.flags & re.IGNORECASE:
+            raise UnsupportedPattern("case insensitive patterns")
+
+        items = list(parsed)
+        self.anchored_start = bool(items) and items[0] == (sre_constants.AT, sre_constants.AT_BEGINNING)
+        if self.anchored_start:
+            items = items[1:]
+        self.anchored_end = bool(items) and items[-1] == (sre_constants.AT, sre_constants.AT_END)
+        if self.anchored_end:
+            items = items[:-1]
+
+        self.edges = []
+        self.epsilon = []
+        (start, accept) = self.build(items)
+
+        # the same NFA with all edges reversed for the backward pass
+        reverse_edges = [[] for s in self.edges]
+        reverse_epsilon = [[] for s in self.edges]
+        for s in range(len(self.edges)):
+            for charset, t in self.edges[s]:
+                reverse_edges[t].append((charset, s))
+            for t in self.epsilon[s]:
+                reverse_epsilon[t].append(s)
+
+        self.forward_nfa = (self.edges, self.epsilon, start, accept, False)
+        self.backward_nfa = (reverse_edges, reverse_epsilon, accept, start, not self.anchored_end)
+        self.local = threading.local()
+
+    def dfas(self):
+        """
+        Return the backward and forward LazyDFA of the current thread,
+        as the states of a LazyDFA are built while matching
+        """
+        local = self.local
+        if not hasattr(local, "forward"):
+            local.backward = LazyDFA(*self.backward_nfa)
+            local.forward = LazyDFA(*self.forward_nfa)
+        return (local.backward, local.forward)
+
+    def new_state(self):
+        if len(self.edges) >= automaton_max_nfa_states:
+            raise UnsupportedPattern("too many repeats")
+        self.edges.append([])
+        self.epsilon.append([])
+        return len(self.edges) - 1
+
+    def build(self, items):
+        """
+        Return the (start, end) states of the NFA of the parsed items
+        """
+        start = end = self.new_state()
+        for op, av in items:
+            (first, last) = self.build_item(op, av)
+            self.epsilon[end].append(first)
+            end = last
+        return (start, end)
+
+    def build_item(self, op, av):
+        if op in (sre_constants.LITERAL, sre_constants.NOT_LITERAL,
+                  sre_constants.ANY, sre_constants.IN):
+            (start, end) = (self.new_state(), self.new_state())
+            self.edges[start].append((self.charset(op, av), end))
+            return (start, end)
+
+        if op == sre_constants.SUBPATTERN:
+            return self.build(av[-1])
+
+        if op == sre_constants.BRANCH:
+            (start, end) = (self.new_state(), self.new_state())
+            for items in av[1]:
+                (first, last) = self.build(items)
+                self.epsilon[start].append(first)
+                self.epsilon[last].append(end)
+            return (start, end)
+
+        if op == sre_constants.MAX_REPEAT:
+            (low, high, items) = av
+            start = end = self.new_state()
+            for i in range(low):
+                (first, last) = self.build(items)
+                self.epsilon[end].append(first)
+                end = last
+            if high == sre_constants.MAXREPEAT:
+                (first, last) = self.build(items)
+                loop = self.new_state()
+                self.epsilon[end].append(loop)
+                self.epsilon[loop].append(first)
+                self.epsilon[last].append(loop)
+                end = loop
+            elif high > low:
+                exits = []
+                for i in range(high - low):
+                    (first, last) = self.build(items)
+                    self.epsilon[end].append(first)
+                    exits.append(end)
+                    end = last
+                final = self.new_state()
+                for s in exits + [end]:
+                    self.epsilon[s].append(final)
+                end = final
+            return (start, end)
+
+        raise UnsupportedPattern(str(op))
+
+    def charset(self, op, av):
+        """
+        Return the (negate, codes, ranges) character set of a parsed item
+        """
+        if op == sre_constants.LITERAL:
+            return (False, frozenset([av]), ())
+        if op == sre_constants.NOT_LITERAL:
+            return (True, frozenset([av]), ())
+        if op == sre_constants.ANY:
+            return (True, frozenset([ord("\n")]), ())
+
+        negate = False
+        codes = set()
+        ranges = []
+        for item_op, item_av in av:
+            if item_op == sre_constants.NEGATE:
+                negate = True
+            elif item_op == sre_constants.LITERAL:
+                codes.add(item_av)
+            elif item_op == sre_constants.RANGE:
+                ranges.append(item_av)
+            else:
+                raise UnsupportedPattern(str(item_op))
+        return (negate, frozenset(codes), tuple(ranges))
+
+    def finditer(self, AAs):
+        """
+        Iterate over the non-overlapping matches in AAs like re's finditer
+        """
+        n = len(AAs)
+
+        (backward, forward) = self.dfas()
+
+        # mark where matches start, reading AAs backwards
+        starts = bytearray(n + 1)
+        dfa = backward
+        d = dfa.initial
+        starts[n] = dfa.accepting[d]
+        for i in range(n - 1, -1, -1):
+            d = dfa.step(d, AAs[i])
+            if dfa.dead[d]:
+                break
+            starts[i] = dfa.accepting[d]
+
+        dfa = forward
+        position = 0
+        while position <= n:
+            start = starts.find(b"\x01", position)
+            if start < 0 or (self.anchored_start and start > 0):
+                return
+
+            # the longest match from start
+            d = dfa.initial
+            stop = start
+            i = start
+            while i < n and not dfa.dead[d]:
+                d = dfa.step(d, AAs[i])
+                i += 1
+                if dfa.accepting[d] and (i == n or not self.anchored_end):
+                    stop = i
+
+            if stop > start:
+                yield AutomatonMatch(start, stop)
+                position = stop
+            else:
+                position = start + 1
+
+
+class GuardedPattern(object):
+    """
+    Compiled regular expression that may backtrack for a very long time,
+    it is matched in the search pool with a time limit, see chain_spans
+    """
+    def __init__(self, reNeedle):
+        self.reNeedle = reNeedle
+        self.pattern = reNeedle.pattern
+
+    def finditer(self, AAs):
+        return self.reNeedle.finditer(AAs)
+
+
+def pattern_is_risky(items, repeated=False, wide=None):
+    """
+    Check if backtracking over the parsed pattern items can take very long,
+    which is the case for variable repeats or alternatives within repeats
+    and for more than one wide repeat, e.g. (A+)+C or .*.*.*X
+    """
+    if wide is None:
+        wide = []
+    for op, av in items:
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                  getattr(sre_constants, "POSSESSIVE_REPEAT", None)):
+            (low, high, sub) = av
+            if repeated and high != low:
+                return True
+            if high == sre_constants.MAXREPEAT or high - low > automaton_wide_repeat:
+                wide.append(op)
+            if pattern_is_risky(sub, repeated or high > 1, wide):
+                return True
+        elif op == sre_constants.BRANCH:
+            if repeated:
+                return True
+            for sub in av[1]:
+                if pattern_is_risky(sub, repeated, wide):
+                    return True
+        elif op == sre_constants.SUBPATTERN:
+            if pattern_is_risky(av[-1], repeated, wide):
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if pattern_is_risky(av[1], repeated, wide):
+                return True
+    return len(wide) > 1
+
+
+def compile_pattern(pattern):
+    """
+    Compile the regular expression pattern for matching sequences:
+    patterns that backtrack harmlessly are compiled by the re module,
+    the others to a PatternAutomaton, or if that is not possible to a
+    GuardedPattern. Raises re.error for invalid patterns.
+    The compiled patterns are kept in the pattern cache.
+    """
+    compiled = pattern_cache.get(pattern)
+    if compiled is not None:
+        return compiled
+
+    compiled = re.compile(pattern)
+    parsed = sre_parse.parse(pattern)
+    if pattern_is_risky(parsed):
+        try:
+            compiled = PatternAutomaton(pattern, parsed)
+        except UnsupportedPattern:
+            compiled = GuardedPattern(compiled)
+    pattern_cache.put(pattern, compiled)
+    return compiled
+
+
+def scan_sequences(job):
+    """
+    Return the spans of the matches of a pattern in each of the
+    sequences, this is run in a process of the search pool
+    """
+    (pattern, sequences, firstOnly) = job
+    reNeedle = compile_pattern(pattern)
+    return [match_spans(reNeedle, AAs, [0], firstOnly) for AAs in sequences]
+
+
+def wait_pool_job(job, deadline=None, cancelled=None):
+    """
+    Wait for the result of a job of the search pool. The pool is stopped
+    if the event cancelled is set (returning False) or if the job is not
+    done at the time deadline (raising SearchTimeout).
+    """
+    while not job.ready():
+        if cancelled is not None and cancelled.is_set():
+            stop_search_pool()
+            return False
+        if deadline is not None and time.time() > deadline:
+            stop_search_pool()
+            raise SearchTimeout("Search timed out after %g s, try a simpler pattern" % regex_timeout)
+        job.wait(0.05)
+    return True
+
+
+def chain_spans(reNeedle, sequences, firstOnly=0, cancelled=None, deadline=None):
+    """
+    Return the spans of the matches of the compiled pattern in each of the
+    chain sequences. A GuardedPattern is matched in the search pool, which
+    is stopped if that takes longer than regex_timeout or until the time
+    deadline (raising SearchTimeout) or the event cancelled is set
+    (returning no hits), as the re module does not release the interpreter
+    lock while matching.
+    """
+    # processes of a pool cannot start a pool of their own
+    if (not isinstance(reNeedle, GuardedPattern) or not sequences or
+            search_processes == 1 or multiprocessing.current_process().daemon):
+        return [match_spans(reNeedle, AAs, [0], firstOnly) for AAs in sequences]
+
+    job = get_search_pool().apply_async(scan_sequences,
+                                        ((reNeedle.pattern, sequences, firstOnly),))
+    if deadline is None:
+        deadline = time.time() + regex_timeout
+    if not wait_pool_job(job, deadline, cancelled):
+        return [[] for AAs in sequences]
+    return job.get()
+
+
+#=====================================================================
+# Least recently used caches of compiled patterns and of the hits
+# of recent searches, which also back the search history
+#=====================================================================
+
+class LRUCache(object):
+    """
+    Cache that drops the least recently used entries when it holds more than
+    max_entries entries or, if max_bytes is not None, more than max_bytes
+    estimated bytes. It counts its hits and misses and is locked, as the
+    searches in the background use it too.
+    """
+    def __init__(self, max_entries, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (value, estimated bytes), the most recently used last
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the value of key, or None if it is not cached
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size=0):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            self.shrink()
+
+    def shrink(self):
+        while self.entries and (len(self.entries) > self.max_entries or
+                                (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            (key, (value, size)) = self.entries.popitem(last=False)
+            self.bytes -= size
+
+    def resize(self, max_entries, max_bytes=None):
+        with self.lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.shrink()
+
+    def keys(self):
+        """
+        Return the cached keys, the most recently used first
+        """
+        with self.lock:
+            return list(reversed(self.entries))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+def normalize_query(needle):
+    """
+    Return needle as it is searched, e.g. for looking it up in the result cache
+    """
+    return needle.upper()
+
+
+def result_key(needle, index, firstOnly=0):
+    """
+    Return the key of the hits of needle in the SequenceIndex index in
+    the result cache, or None if they are not cached, e.g. for matchers
+    """
+    if not is_string(needle) or index.fingerprint is None:
+        return None
+    return (normalize_query(needle), index.haystack, index.het,
+            index.fingerprint, int(firstOnly))
+
+
+def cached_spans(needle, index, firstOnly=0):
+    """
+    Return the cached spans of the hits of needle in index, or None
+    """
+    key = result_key(needle, index, firstOnly)
+    if key is None:
+        return None
+    spans = result_cache.get(key)
+    if spans is None:
+        return None
+    return list(spans)
+
+
+def cache_spans(needle, index, firstOnly, spans):
+    """
+    Save the spans of the hits of needle in index in the result cache
+    """
+    key = result_key(needle, index, firstOnly)
+    if key is not None:
+        # a tuple of two integers in a list takes about 100 bytes
+        result_cache.put(key, list(spans), 200 + 100 * len(spans))
+
+
+def cached_hits(needle, haystacks, het, firstOnly=0):
+    """
+    Return (haystack, index, spans) of each haystack if the hits of needle
+    in all of them are cached, otherwise None
+    """
+    if not is_string(needle):
+        return None
+    found = []
+    for haystack in haystacks:
+        index = get_sequence_index(haystack, het)
+        spans = cached_spans(needle, index, firstOnly)
+        if spans is None:
+            return None
+        found.append((haystack, index, spans))
+    return found
+
+
+def search_history():
+    """
+    Return the recent queries, most recent first: those with hits in the
+    result cache, followed by the older ones of searchhistory
+    """
+    queries = []
+    for key in result_cache.keys():
+        if key[0] not in queries:
+            queries.append(key[0])
+    for query in reversed(searchhistory):
+        if normalize_query(query) not in queries:
+            queries.append(normalize_query(query))
+    return queries[:history_length]
+
+
+def add_search_history(query):
+    """
+    Add query to the searchhistory, or move it to its end if it is in there
+    """
+    query = normalize_query(query.strip())
+    if not query:
+        return
+    if query in searchhistory:
+        searchhistory.remove(query)
+    searchhistory.append(query)
+    del searchhistory[:-history_length]
+
+
+#=====================================================================
+# Session wide suffix array over the sequences of many objects
+# for looking up plain sequences without scanning all of them
+#=====================================================================
+
+# The last built SessionIndex, rebuilt when the searched objects change
+session_index = None
+
+
+def build_suffix_array(codes):
+    """
+    Return the suffix array of the list of integers codes (prefix doubling)
+    """
+    n = len(codes)
+    if n == 0:
+        return array.array("i")
+
+    sa = sorted(range(n), key=codes.__getitem__)
+
+    # rank the suffixes by their first letter
+    rank = [0] * n
+    r = 0
+    for j in range(1, n):
+        if codes[sa[j]] != codes[sa[j - 1]]:
+            r += 1
+        rank[sa[j]] = r
+
+    # and then by the first 2, 4, 8, ... letters until all ranks are different
+    k = 1
+    while r < n - 1:
+        shifted = rank[k:] + [-1] * min(k, n)
+        keys = [a * (n + 1) + b + 1 for a, b in zip(rank, shifted)]
+        sa.sort(key=keys.__getitem__)
+        r = 0
+        rank[sa[0]] = 0
+        for j in range(1, n):
+            if keys[sa[j]] != keys[sa[j - 1]]:
+                r += 1
+            rank[sa[j]] = r
+        k *= 2
+
+    return array.array("i", sa)
+
+
+class SessionIndex(object):
+    """
+    Suffix array over the chains of several SequenceIndex instances.
+    All distinct chain sequences are concatenated, each followed by a unique
+    sentinel, so no hit can span two chains or objects.
+    """
+    def __init__(self, indices):
+        self.indices = indices
+        self.signature = session_signature(indices)
+
+        # for every distinct chain sequence its position in the text and
+        # the (number of the index, position in its sequence) of all its copies
+        self.block_starts = []
+        self.blocks = []
+        blocks = {}
+        parts = []
+        codes = []
+        position = 0
+        for n, index in enumerate(indices):
+            segments = index.segments + [len(index.AAs)]
+            for start, stop in zip(segments[:-1], segments[1:]):
+                sequence = index.AAs[start:stop]
+                if sequence in blocks:
+                    blocks[sequence].append((n, start))
+                    continue
+                blocks[sequence] = [(n, start)]
+                self.block_starts.append(position)
+                self.blocks.append(blocks[sequence])
+                parts.append(sequence + "$")
+                codes.extend([ord(letter) for letter in sequence])
+                # the sentinels are all different and sort before every letter
+                codes.append(-len(self.blocks))
+                position += len(sequence) + 1
+
+        self.text = "".join(parts)
+        self.sa = build_suffix_array(codes)
+
+    def occurrences(self, query):
+        """
+        Return the positions of all occurrences of query in the text
+        """
+        text = self.text
+        sa = self.sa
+        m = len(query)
+
+        # first suffix that starts with query or is larger
+        lo, hi = 0, len(sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if text[sa[mid]:sa[mid] + m] < query:
+                lo = mid + 1
+            else:
+                hi = mid
+        first = lo
+
+        # first suffix that is larger and does not start with query
+        hi = len(sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if text[sa[mid]:sa[mid] + m] == query:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return sa[first:lo]
+
+    def find(self, query, firstOnly=0):
+        """
+        Return a list with the spans of the hits of the plain query in each index,
+        like find_literal returns them
+        """
+        query = query.upper()
+        found = [[] for index in self.indices]
+        for p in self.occurrences(query):
+            block = bisect.bisect_right(self.block_starts, p) - 1
+            offset = p - self.block_starts[block]
+            for n, start in self.blocks[block]:
+                found[n].append(start + offset)
+
+        # the sentinels already separate the chains
+        results = []
+        for occurrences in found:
+            occurrences.sort()
+            results.append(literal_spans(occurrences, len(query), None, firstOnly))
+        return results
+
+
+def session_signature(indices):
+    """
+    Identify the state of the indices, the session index is rebuilt when it changes
+    """
+    return tuple([(index.haystack, index.het, index.fingerprint) for index in indices])
+
+
+def get_session_index(indices):
+    """
+    Return the SessionIndex over indices, building it only if they changed
+    """
+    global session_index
+    index = session_index
+    if index is None or index.signature != session_signature(indices):
+        index = SessionIndex(indices)
+        session_index = index
+    return index
+
+
+def use_session_index(needle, haystacks):
+    """
+    Check if needle should be looked up in the suffix array of the haystacks
+    """
+    return (session_index_min_objects is not None and is_string(needle) and
+            needle.isalnum() and len(haystacks) >= session_index_min_objects)
+
+
+def session_search_worker(needle, haystacks, het, firstOnly, results, cancelled):
+    """
+    Like search_worker, but plain needles are looked up in the session index
+    """
+    indices = []
+    for n, haystack in enumerate(haystacks):
+        if cancelled.is_set():
+            return
+        if n % 50 == 0:
+            results.put(("progress", n, len(haystacks), haystack))
+        indices.append(get_sequence_index(haystack, het))
+
+    all_spans = get_session_index(indices).find(needle, firstOnly)
+    if cancelled.is_set():
+        return
+
+    for haystack, index, spans in zip(haystacks, indices, all_spans):
+        cache_spans(needle, index, firstOnly, spans)
+        results.put(("hits", haystack, index, spans))
+
+    results.put(("done",))
+
+
+#=====================================================================
+# Search for many plain motifs at once with an Aho-Corasick automaton
+#=====================================================================
+
+class MotifAutomaton(object):
+    """
+    Aho-Corasick automaton matching a list of plain motifs
+    in a single pass over a sequence
+    """
+    def __init__(self, motifs):
+        self.motifs = []
+        for motif in motifs:
+            motif = motif.upper()
+            if motif not in self.motifs:
+                self.motifs.append(motif)
+
+        # trie of the motifs, with the numbers of the motifs ending in each state
+        self.goto = [{}]
+        self.output = [[]]
+        for n, motif in enumerate(self.motifs):
+            state = 0
+            for letter in motif:
+                if letter not in self.goto[state]:
+                    self.goto[state][letter] = len(self.goto)
+                    self.goto.append({})
+                    self.output.append([])
+                state = self.goto[state][letter]
+            self.output[state].append(n)
+
+        # failure links to the longest suffix that is also in the trie (breadth first)
+        self.fail = [0] * len(self.goto)
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for letter, target in self.goto[state].items():
+                queue.append(target)
+                fail = self.fail[state]
+                while fail and letter not in self.goto[fail]:
+                    fail = self.fail[fail]
+                if state != 0 and letter in self.goto[fail]:
+                    self.fail[target] = self.goto[fail][letter]
+                self.output[target] = self.output[target] + self.output[self.fail[target]]
+
+    def occurrences(self, AAs):
+        """
+        Return a list with the start positions of all occurrences of each motif
+        """
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        lengths = [len(motif) for motif in self.motifs]
+        found = [[] for motif in self.motifs]
+
+        state = 0
+        for i, letter in enumerate(AAs):
+            while state and letter not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(letter, 0)
+            for n in output[state]:
+                found[n].append(i - lengths[n] + 1)
+
+        for occurrences in found:
+            occurrences.sort()
+        return found
+
+    def find(self, index, firstOnly=0):
+        """
+        Return a dictionary with the spans of the hits of each motif in the
+        SequenceIndex index, as findseq would return them for each motif
+        """
+        found = [[] for motif in self.motifs]
+        for first, last, starts in index.unique_chains:
+            for n, occurrences in enumerate(self.occurrences(index.AAs[first:last])):
+                found[n].extend([(first + p, first + p + len(self.motifs[n])) for p in occurrences])
+
+        hits = {}
+        for motif, spans in zip(self.motifs, found):
+            occurrences = [start for start, stop in index.fan_out(spans)]
+            hits[motif] = literal_spans(occurrences, len(motif), index.segments, firstOnly)
+        return hits
+
+
+def parse_motifs(motifs):
+    """
+    Return the list of motifs from a list, a string of motifs separated by
+    commas, semicolons or whitespace, or the name of a file with one motif
+    per line (empty lines and lines starting with # are ignored)
+    """
+    if is_string(motifs):
+        if os.path.isfile(motifs):
+            with open(motifs) as motif_file:
+                lines = [line.split("#")[0] for line in motif_file]
+            motifs = " ".join(lines)
+        motifs = re.split(r"[\s,;]+", motifs)
+    return [motif.strip().upper() for motif in motifs if motif.strip()]
+
+
+def findseq_multi(motifs, haystack, selName=None, het=0, separate=0, firstOnly=0):
+    """
+    Search many plain motifs in haystack in a single pass.
+
+    motifs is a list of motifs, a string of motifs separated by commas or
+    whitespace or the name of a file with one motif per line.
+    The hits of all motifs are saved in the selection selName, or, with
+    separate=1, in one selection per motif named selName_MOTIF.
+
+    Returns a dictionary with a list of the hits of each motif as SeqHit
+    records (without atom indices).
+    """
+    if selName is None:
+        selName = "foundMotifs" + str(random.randint(0, 32000))
+
+    if not checkParams("", haystack, selName, het, firstOnly):
+        return None
+
+    motifs = parse_motifs(motifs)
+    for motif in motifs:
+        if not motif.isalnum():
+            print("Error: %s is not a plain sequence, it is skipped." % motif)
+    automaton = MotifAutomaton([motif for motif in motifs if motif.isalnum()])
+
+    index = get_sequence_index(haystack, het)
+    hits = automaton.find(index, firstOnly)
+
+    if int(separate):
+        for motif in automaton.motifs:
+            cmd.select("%s_%s" % (selName, motif), index.selection(hits[motif]))
+    else:
+        cmd.select(selName, index.selection([span for motif in automaton.motifs
+                                             for span in hits[motif]]))
+
+    return dict([(motif, hit_records(index, hits[motif], atoms=0))
+                 for motif in automaton.motifs])
+
+extend_command("findseq_multi", findseq_multi)
+
+
+#=====================================================================
+# Approximate search for sequences with a maximum number of
+# mismatches (Wu-Manber) or edits (Myers) using bit-parallel algorithms
+#=====================================================================
+
+def pattern_bitmasks(pattern):
+    """
+    Return a dictionary with the bit mask of the positions of each letter in pattern
+    """
+    masks = {}
+    for i, letter in enumerate(pattern):
+        masks[letter] = masks.get(letter, 0) | (1 << i)
+    return masks
+
+
+def mismatch_ends(pattern, text, k):
+    """
+    Return (end, distance) of all substrings of text that differ from pattern
+    in at most k positions, with the Wu-Manber extension of Shift-And
+    """
+    m = len(pattern)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    masks = pattern_bitmasks(pattern)
+
+    # R[d] has bit i set if pattern[:i + 1] ends here with at most d mismatches
+    R = [0] * (k + 1)
+    ends = []
+    for j, letter in enumerate(text):
+        B = masks.get(letter, 0)
+        previous = R[0]
+        R[0] = ((R[0] << 1) | 1) & B
+        for d in range(1, k + 1):
+            current = R[d]
+            R[d] = ((((current << 1) | 1) & B) | ((previous << 1) | 1)) & mask
+            previous = current
+        for d in range(k + 1):
+            if R[d] & high:
+                ends.append((j, d))
+                break
+    return ends
+
+
+def edit_ends(pattern, text, k):
+    """
+    Return (end, distance) of all positions in text where a substring ending
+    there has an edit distance of at most k to pattern (Myers' algorithm)
+    """
+    m = len(pattern)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    masks = pattern_bitmasks(pattern)
+
+    Pv = mask
+    Mv = 0
+    score = m
+    ends = []
+    for j, letter in enumerate(text):
+        Eq = masks.get(letter, 0)
+        Xv = Eq | Mv
+        Xh = (((Eq & Pv) + Pv) ^ Pv) | Eq
+        Ph = Mv | (~(Xh | Pv) & mask)
+        Mh = Pv & Xh
+        if Ph & high:
+            score += 1
+        elif Mh & high:
+            score -= 1
+        Ph = (Ph << 1) & mask
+        Mh = (Mh << 1) & mask
+        Pv = Mh | (~(Xv | Ph) & mask)
+        Mv = Ph & Xv
+        if score <= k:
+            ends.append((j, score))
+    return ends
+
+
+def edit_distance(a, b):
+    """
+    Return the edit distance of the strings a and b
+    """
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        diagonal = row[0]
+        row[0] = i
+        for j in range(1, len(b) + 1):
+            current = row[j]
+            row[j] = min(row[j] + 1, row[j - 1] + 1, diagonal + (a[i - 1] != b[j - 1]))
+            diagonal = current
+    return row[-1]
+
+
+class FuzzyQuery(object):
+    """
+    Matcher for the hits of a plain query with at most mismatches
+    substitutions, or with indels=1 at most mismatches edits
+    """
+    # Label of the third value of the spans, e.g. in the hit browser
+    score_label = "distance"
+
+    def __init__(self, query, mismatches=1, indels=0):
+        self.query = query.upper()
+        self.mismatches = int(mismatches)
+        self.indels = int(indels)
+
+    def find(self, index, firstOnly=0):
+        """
+        Return the (start, stop, distance) of the best, non-overlapping hits
+        within the chains of the SequenceIndex index, ordered by distance
+        """
+        query = self.query
+        k = self.mismatches
+        m = len(query)
+        candidates = []
+
+        for first, last, starts in index.unique_chains:
+            text = index.AAs[first:last]
+
+            if not self.indels:
+                for end, distance in mismatch_ends(query, text, k):
+                    candidates.append((distance, first + end - m + 1, first + end + 1))
+                continue
+
+            for end, distance in edit_ends(query, text, k):
+                # find the start of the hit, the length can differ from the query by up to k
+                starts = [start for start in range(max(0, end - m - k + 1), end - m + k + 2)
+                          if start <= end and edit_distance(query, text[start:end + 1]) == distance]
+                start = min(starts, key=lambda start: (abs(end + 1 - start - m), -start))
+                candidates.append((distance, first + start, first + end + 1))
+
+        # select the best hits first and skip everything overlapping them
+        candidates.sort()
+        taken = []
+        hits = []
+        for distance, start, stop in candidates:
+            position = bisect.bisect_right(taken, (start, stop))
+            if position > 0 and taken[position - 1][1] > start:
+                continue
+            if position < len(taken) and taken[position][0] < stop:
+                continue
+            taken.insert(position, (start, stop))
+            hits.append((start, stop, distance))
+
+        # the hits in identical copies of the chains are just as good
+        hits = index.fan_out(hits)
+        hits.sort(key=lambda hit: (hit[2], hit[0]))
+        if int(firstOnly):
+            return hits[:1]
+        return hits
+
+
+#=====================================================================
+# PROSITE patterns and a library of common motifs
+#=====================================================================
+
+# Library of common PROSITE motifs as (name, accession, pattern),
+# the names are used for naming the returned selections
+motif_library = [
+    ("N_glycosylation", "PS00001", "N-{P}-[ST]-{P}"),
+    ("GAG_attachment", "PS00002", "S-G-x-G"),
+    ("cAMP_kinase_site", "PS00004", "[RK](2)-x-[ST]"),
+    ("PKC_site", "PS00005", "[ST]-x-[RK]"),
+    ("CK2_site", "PS00006", "[ST]-x(2)-[DE]"),
+    ("Tyr_kinase_site", "PS00007", "[RK]-x(2)-[DE]-x(3)-Y"),
+    ("N_myristoylation", "PS00008", "G-{EDRKHPFYW}-x(2)-[STAGCN]-{P}"),
+    ("Amidation", "PS00009", "x-G-[RK]-[RK]"),
+    ("ER_retention", "PS00014", "[KRHQSA]-[DENQ]-E-L>"),
+    ("RGD", "PS00016", "R-G-D"),
+    ("P_loop", "PS00017", "[AG]-x(4)-G-K-[ST]"),
+    ("Zinc_finger_C2H2", "PS00028", "C-x(2,4)-C-x(3)-[LIVMFYWC]-x(8)-H-x(3,5)-H"),
+    ("Leucine_zipper", "PS00029", "L-x(6)-L-x(6)-L-x(6)-L"),
+    ("Microbody_target", "PS00342", "[STAGCN]-[RKH]-[LIVMAFY]>"),
+]
+
+# Compiled regular expressions of PROSITE patterns, keyed by the pattern
+prosite_cache = {}
+
+# One element of a PROSITE pattern, e.g. <x, [ST], {P}, x(2,4) or L>
+prosite_element = re.compile(r"^(<?)([A-Z]|\[[A-Z<>]+\]|\{[A-Z]+\})(?:\((\d+)(?:,(\d+))?\))?(>?)$")
+
+
+def prosite_to_regex(pattern):
+    """
+    Translate a PROSITE pattern like N-{P}-[ST]-{P} or C-x(2,4)-C
+    into a regular expression, raises ValueError for invalid patterns
+    """
+    pattern = pattern.strip().upper().rstrip(".")
+    elements = pattern.split("-")
+    regex = []
+    for n, element in enumerate(elements):
+        match = prosite_element.match(element)
+        if match is None:
+            raise ValueError("Invalid PROSITE element %s" % element)
+        (start, residue, low, high, end) = match.groups()
+        if (start and n != 0) or (end and n != len(elements) - 1):
+            raise ValueError("< and > are only possible at the ends of a PROSITE pattern")
+
+        # x (upper case after the conversion above) is any amino acid
+        if residue == "X":
+            term = "."
+        elif residue.startswith("{"):
+            term = "[^%s]" % residue[1:-1]
+        elif residue.startswith("["):
+            # [G>] means G or the C-terminus, [<M] M or the N-terminus
+            letters = residue[1:-1].replace("<", "").replace(">", "")
+            term = "[%s]" % letters
+            if "<" in residue:
+                term = "(?:^|%s)" % term
+            if ">" in residue:
+                term = "(?:%s|$)" % term
+        else:
+            term = residue
+
+        if high:
+            term += "{%s,%s}" % (low, high)
+        elif low:
+            term += "{%s}" % low
+
+        regex.append(("^" if start else "") + term + ("$" if end else ""))
+    return "".join(regex)
+
+
+def compile_prosite(pattern):
+    """
+    Return the compiled regular expression of a PROSITE pattern
+    """
+    if pattern not in prosite_cache:
+        prosite_cache[pattern] = re.compile(prosite_to_regex(pattern))
+    return prosite_cache[pattern]
+
+
+class PrositeQuery(object):
+    """
+    Matcher for a PROSITE pattern, the chain ends are the
+    termini for the < and > anchors of the pattern
+    """
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.regex = compile_prosite(pattern)
+
+    def find(self, index, firstOnly=0):
+        spans = []
+        for first, last, starts in index.unique_chains:
+            for i in self.regex.finditer(index.AAs[first:last]):
+                (start, stop) = i.span()
+                if start == stop:
+                    continue
+                spans.append((first + start, first + stop))
+                if int(firstOnly):
+                    break
+        return index.fan_out(spans, firstOnly)
+
+
+class MotifLibraryScan(object):
+    """
+    Matcher for all motifs of a library like motif_library in one pass over
+    each chain, with one lookahead group per motif in a combined expression
+    """
+    def __init__(self, library=None):
+        if library is None:
+            library = motif_library
+        self.motifs = [name for (name, accession, pattern) in library]
+
+        # Python limits the number of groups of one expression
+        self.regexes = []
+        for first in range(0, len(library), 90):
+            part = library[first:first + 90]
+            self.regexes.append((
+                [name for (name, accession, pattern) in part],
+                re.compile("".join(["(?:(?=(%s)))?" % prosite_to_regex(pattern)
+                                    for (name, accession, pattern) in part]))))
+
+    def find(self, index, firstOnly=0):
+        """
+        Return a dictionary with the spans of the hits of each motif,
+        as PrositeQuery would return them for each motif
+        """
+        hits = dict([(name, []) for name in self.motifs])
+        for first, last, starts in index.unique_chains:
+            AAs = index.AAs[first:last]
+            for names, regex in self.regexes:
+                ends = dict([(name, 0) for name in names])
+                for i in regex.finditer(AAs):
+                    for n, name in enumerate(names):
+                        (start, stop) = i.span(n + 1)
+                        # like finditer, skip hits overlapping the previous one
+                        if start == stop or start < ends[name]:
+                            continue
+                        if int(firstOnly) and hits[name]:
+                            continue
+                        ends[name] = stop
+                        hits[name].append((first + start, first + stop))
+        for name in self.motifs:
+            hits[name] = index.fan_out(hits[name], firstOnly)
+        return hits
+
+
+def findseq_prosite(pattern, haystack, selName=None, het=0, firstOnly=0):
+    """
+    Search the PROSITE pattern, e.g. N-{P}-[ST]-{P}, in haystack
+    and save the hits in the selection selName
+    """
+    if selName is None:
+        selName = "foundProsite" + str(random.randint(0, 32000))
+
+    if not checkParams(pattern, haystack, selName, het, firstOnly):
+        return None
+
+    try:
+        query = PrositeQuery(pattern)
+    except ValueError as e:
+        print("Error: %s" % e)
+        return None
+
+    index = get_sequence_index(haystack, het)
+    cmd.select(selName, index.selection(query.find(index, firstOnly)))
+    return selName
+
+extend_command("findseq_prosite", findseq_prosite)
 
-    reNeedle = re.compile(needle.upper())
-    it = reNeedle.finditer(AAs)
 
-    # make an empty selection to which we add residues
-    cmd.select(rSelName, 'None')
+def scan_motif_library(haystack, prefix=None, het=0):
+    """
+    Search all motifs of motif_library in haystack in one pass and save
+    the hits of each motif as selection prefix_NAME.
+    Returns a dictionary with the number of hits of each motif.
+    """
+    if prefix is None:
+        prefix = haystack
 
-    for i in it:
-        (start, stop) = i.span()
-        # we found some residues, which chains are they from?
-        i_chains = chains[start:stop]
-        # are all residues from one chain?
-        if len(set(i_chains)) != 1:
-        	# now they are not, this match is not really a match, skip it
-        	continue
-        chain = i_chains[0]
-        cmd.select(rSelName, rSelName + " or (__h and i. " + str(IDs[start]) + "-" + str(IDs[stop - 1]) + " and c. " + chain + " )")
+    if not checkParams("", haystack, prefix, het, 0):
+        return None
+
+    index = get_sequence_index(haystack, het)
+    hits = MotifLibraryScan().find(index)
+    for name in hits:
+        if hits[name]:
+            cmd.select("%s_%s" % (prefix, name), index.selection(hits[name]))
+    return dict([(name, len(hits[name])) for name in hits])
+
+extend_command("scan_motif_library", scan_motif_library)
+
+
+#=====================================================================
+# Local alignment search with BLOSUM62 scores (Smith-Waterman),
+# vectorized over all chains with NumPy if it is available
+#=====================================================================
+
+# BLOSUM62 substitution matrix
+blosum62_matrix = """
+   A  R  N  D  C  Q  E  G  H  I  L  K  M  F  P  S  T  W  Y  V  B  Z  X  *
+A  4 -1 -2 -2  0 -1 -1  0 -2 -1 -1 -1 -1 -2 -1  1  0 -3 -2  0 -2 -1  0 -4
+R -1  5  0 -2 -3  1  0 -2  0 -3 -2  2 -1 -3 -2 -1 -1 -3 -2 -3 -1  0 -1 -4
+N -2  0  6  1 -3  0  0  0  1 -3 -3  0 -2 -3 -2  1  0 -4 -2 -3  3  0 -1 -4
+D -2 -2  1  6 -3  0  2 -1 -1 -3 -4 -1 -3 -3 -1  0 -1 -4 -3 -3  4  1 -1 -4
+C  0 -3 -3 -3  9 -3 -4 -3 -3 -1 -1 -3 -1 -2 -3 -1 -1 -2 -2 -1 -3 -3 -2 -4
+Q -1  1  0  0 -3  5  2 -2  0 -3 -2  1  0 -3 -1  0 -1 -2 -1 -2  0  3 -1 -4
+E -1  0  0  2 -4  2  5 -2  0 -3 -3  1 -2 -3 -1  0 -1 -3 -2 -2  1  4 -1 -4
+G  0 -2  0 -1 -3 -2 -2  6 -2 -4 -4 -2 -3 -3 -2  0 -2 -2 -3 -3 -1 -2 -1 -4
+H -2  0  1 -1 -3  0  0 -2  8 -3 -3 -1 -2 -1 -2 -1 -2 -2  2 -3  0  0 -1 -4
+I -1 -3 -3 -3 -1 -3 -3 -4 -3  4  2 -3  1  0 -3 -2 -1 -3 -1  3 -3 -3 -1 -4
+L -1 -2 -3 -4 -1 -2 -3 -4 -3  2  4 -2  2  0 -3 -2 -1 -2 -1  1 -4 -3 -1 -4
+K -1  2  0 -1 -3  1  1 -2 -1 -3 -2  5 -1 -3 -1  0 -1 -3 -2 -2  0  1 -1 -4
+M -1 -1 -2 -3 -1  0 -2 -3 -2  1  2 -1  5  0 -2 -1 -1 -1 -1  1 -3 -1 -1 -4
+F -2 -3 -3 -3 -2 -3 -3 -3 -1  0  0 -3  0  6 -4 -2 -2  1  3 -1 -3 -3 -1 -4
+P -1 -2 -2 -1 -3 -1 -1 -2 -2 -3 -3 -1 -2 -4  7 -1 -1 -4 -3 -2 -2 -1 -2 -4
+S  1 -1  1  0 -1  0  0  0 -1 -2 -2  0 -1 -2 -1  4  1 -3 -2 -2  0  0  0 -4
+T  0 -1  0 -1 -1 -1 -1 -2 -2 -1 -1 -1 -1 -2 -1  1  5 -2 -2  0 -1 -1  0 -4
+W -3 -3 -4 -4 -2 -2 -3 -2 -2 -3 -2 -3 -1  1 -4 -3 -2 11  2 -3 -4 -3 -2 -4
+Y -2 -2 -2 -3 -2 -1 -2 -3  2 -1 -1 -2 -1  3 -3 -2 -2  2  7 -1 -3 -2 -1 -4
+V  0 -3 -3 -3 -1 -2 -2 -3 -3  3  1 -2  1 -1 -2 -2  0 -3 -1  4 -3 -2 -1 -4
+B -2 -1  3  4 -3  0  1 -1  0 -3 -4  0 -3 -3 -2  0 -1 -4 -3 -3  4  1 -1 -4
+Z -1  0  0  1 -3  3  4 -2  0 -3 -3  1 -1 -3 -1  0 -1 -3 -2 -2  1  4 -1 -4
+X  0 -1 -1 -1 -2 -1 -1 -1 -1 -1 -1 -1 -1 -1 -2  0  0 -2 -1 -1 -1 -1 -1 -4
+* -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4  1
+"""
+
+# Letters and scores of the matrix, parsed on first use
+blosum62_letters = ""
+blosum62 = {}
+
+# Score of the padding after the end of shorter chains, low enough to end every alignment
+alignment_padding = -1000
+
+
+def blosum62_score(a, b):
+    """
+    Return the BLOSUM62 score of the letters a and b, unknown letters count as X
+    """
+    global blosum62_letters
+    if not blosum62:
+        lines = blosum62_matrix.strip().split("\n")
+        blosum62_letters = "".join(lines[0].split())
+        for line in lines[1:]:
+            values = line.split()
+            for letter, value in zip(blosum62_letters, values[1:]):
+                blosum62[(values[0], letter)] = int(value)
+    if a not in blosum62_letters:
+        a = "X"
+    if b not in blosum62_letters:
+        b = "X"
+    return blosum62[(a, b)]
+
+
+def local_alignment_scores(query, sequences, gap_open=11, gap_extend=1):
+    """
+    Return the best local alignment score of query in each of the sequences
+    and the position in the sequence where this alignment ends (-1 if none).
+    A gap of length L costs gap_open + L * gap_extend.
+    """
+    if numpy is not None and len(sequences) > 0:
+        return local_alignment_scores_numpy(query, sequences, gap_open, gap_extend)
+
+    first = gap_open + gap_extend
+    results = []
+    for sequence in sequences:
+        H = [0] * (len(query) + 1)
+        E = [0] * (len(query) + 1)
+        best = 0
+        best_end = -1
+        for j, letter in enumerate(sequence):
+            diagonal = H[0]
+            F = 0
+            for i in range(1, len(query) + 1):
+                E[i] = max(H[i] - first, E[i] - gap_extend) if j else H[i] - first
+                F = max(H[i - 1] - first, F - gap_extend) if i > 1 else -first
+                current = max(0, diagonal + blosum62_score(query[i - 1], letter), E[i], F)
+                diagonal = H[i]
+                H[i] = current
+                if current > best:
+                    best = current
+                    best_end = j
+        results.append((best, best_end))
+    return results
+
+
+def local_alignment_scores_numpy(query, sequences, gap_open=11, gap_extend=1):
+    """
+    Like local_alignment_scores, with every column of the alignment matrices
+    of all sequences computed at once. The vertical gaps within a column are
+    resolved with a running maximum instead of a loop over the query.
+    """
+    blosum62_score("A", "A")
+    m = len(query)
+    first = gap_open + gap_extend
+    length = max([len(sequence) for sequence in sequences])
+    negative = -10 ** 6
+
+    # scores of each query position against each letter, plus the padding
+    profile = numpy.array([[blosum62_score(letter, q) for q in query] for letter in blosum62_letters] +
+                          [[alignment_padding] * m], dtype=numpy.int32)
+    padding = len(blosum62_letters)
+    codes = numpy.full((len(sequences), length), padding, dtype=numpy.int32)
+    lookup = dict([(letter, n) for n, letter in enumerate(blosum62_letters)])
+    for n, sequence in enumerate(sequences):
+        codes[n, :len(sequence)] = [lookup.get(letter, lookup["X"]) for letter in sequence]
+
+    H = numpy.zeros((len(sequences), m + 1), dtype=numpy.int32)
+    E = numpy.full((len(sequences), m), negative, dtype=numpy.int32)
+    best = numpy.zeros(len(sequences), dtype=numpy.int32)
+    best_end = numpy.full(len(sequences), -1, dtype=numpy.int32)
+    steps = gap_extend * numpy.arange(m, dtype=numpy.int32)
+    offsets = first + gap_extend * numpy.arange(m - 1, dtype=numpy.int32)
+
+    for j in range(length):
+        S = profile[codes[:, j]]
+        E = numpy.maximum(H[:, 1:] - first, E - gap_extend)
+        Ht = numpy.maximum(numpy.maximum(H[:, :-1] + S, E), 0)
+
+        # F[i] = max over k < i of Ht[k] - first - gap_extend * (i - k - 1)
+        G = numpy.maximum.accumulate(Ht + steps, axis=1)
+        H[:, 1] = Ht[:, 0]
+        H[:, 2:] = numpy.maximum(Ht[:, 1:], G[:, :-1] - offsets)
+
+        column = H[:, 1:].max(axis=1)
+        improved = column > best
+        best[improved] = column[improved]
+        best_end[improved] = j
+
+    return list(zip(best.tolist(), best_end.tolist()))
+
+
+class AlignmentQuery(object):
+    """
+    Matcher for the local alignments of a query peptide with a BLOSUM62
+    score of at least min_score, one per chain, the best first
+    """
+    # Label of the third value of the spans, e.g. in the hit browser
+    score_label = "score"
+
+    def __init__(self, query, min_score=20, gap_open=11, gap_extend=1):
+        self.query = query.upper()
+        self.min_score = int(min_score)
+        self.gap_open = gap_open
+        self.gap_extend = gap_extend
+
+    def find(self, index, firstOnly=0):
+        """
+        Return the (start, stop, score) of the best alignment in each chain
+        with at least min_score, ordered by score
+        """
+        chains = [(first, last) for first, last, starts in index.unique_chains]
+        scores = local_alignment_scores(self.query, [index.AAs[first:last] for first, last in chains],
+                                        self.gap_open, self.gap_extend)
+
+        hits = []
+        for (first, last), (score, end) in zip(chains, scores):
+            if score < self.min_score or end < 0:
+                continue
+            # the start is where the alignment of the reversed query
+            # and the reversed sequence before the end reaches the same score
+            prefix = index.AAs[first:first + end + 1][::-1]
+            (reverse_score, reverse_end) = local_alignment_scores(self.query[::-1], [prefix],
+                                                                  self.gap_open, self.gap_extend)[0]
+            hits.append((first + end - reverse_end, first + end + 1, score))
+
+        hits = index.fan_out(hits)
+        hits.sort(key=lambda hit: (-hit[2], hit[0]))
         if int(firstOnly):
-            break
-    cmd.delete("__h")
+            return hits[:1]
+        return hits
+
+
+def findseq_align(query, haystack, selName=None, min_score=20, het=0):
+    """
+    Search the best local alignment of the peptide query in every chain of
+    haystack with BLOSUM62 scores. Alignments with at least min_score are
+    saved as selections selName_1, selName_2, ... ranked by their score.
+    Returns a list of the (selection, score) of the alignments.
+    """
+    if selName is None:
+        selName = "foundAln" + str(random.randint(0, 32000))
+
+    if not checkParams(query, haystack, selName, het, 0):
+        return None
+
+    index = get_sequence_index(haystack, het)
+    hits = AlignmentQuery(query, min_score).find(index)
+
+    found = []
+    for rank, hit in enumerate(hits):
+        cmd.select("%s_%i" % (selName, rank + 1), index.selection([hit]))
+        found.append(("%s_%i" % (selName, rank + 1), hit[2]))
+    return found
+
+extend_command("findseq_align", findseq_align)
+
+
+"""
+Functions from findseq by Jason Vertrees, 2009
+"""
+
+def findseq(needle, haystack, selName=None, het=0, firstOnly=0, mismatches=0, indels=0, max_hits=0):
+    # set the name of the selection to return.
+    if selName == None:
+        rSelName = "foundSeq" + str(random.randint(0, 32000))
+        selName = rSelName
+    elif selName == "sele":
+        rSelName = "sele"
+    else:
+        rSelName = selName
+
+    # input checking
+    if not checkParams(needle, haystack, selName, het, firstOnly):
+        #print("There was an error with a parameter.  Please see")
+        #print("the above error message for how to fix it.")
+        return None
+
+    # plain sequences can be searched allowing for mismatches
+    # or with indels=1 for edits, the best hits come first
+    try:
+        needle = findseq_matcher(needle, mismatches, indels)
+    except ValueError as e:
+        print("Error: %s" % e)
+        return None
+
+    # get the AAs in the haystack, reusing the cached index if the haystack did not change
+    index = get_sequence_index(haystack, het)
+
+    # collect all hits (or the first max_hits) first and build the returned selection with a single call
+    try:
+        spans = limited_spans(index, needle, firstOnly, max_hits)
+    except (SearchTimeout, ValueError) as e:
+        print("Error: %s" % e)
+        return None
+    cmd.select(rSelName, index.selection(spans))
     return rSelName
 
-#cmd.extend("findseq", findseq)
+extend_command("findseq", findseq)
+
+
+def findseq_matcher(needle, mismatches=0, indels=0):
+    """
+    Return what find_spans searches for the findseq arguments,
+    raises ValueError for invalid combinations
+    """
+    if int(mismatches) > 0:
+        if not needle.isalnum():
+            raise ValueError("mismatches are only possible for plain sequences.")
+        return FuzzyQuery(needle, mismatches, indels)
+    return needle
 
 
 def checkParams(needle, haystack, selName, het, firstOnly):
@@ -1816,12 +5551,936 @@ End of functions from findseq
 
 
 
+#==========================================================
+# Scripting API returning the hits as lightweight records
+#==========================================================
+
+# Record of a single hit, start and end are the residue numbers of its first
+# and last residue, atoms the indices of its atoms in the object (if requested)
+# and score the distance of fuzzy hits or the score of alignments
+SeqHit = collections.namedtuple("SeqHit",
+                                ["object", "chain", "start", "end", "sequence", "atoms", "score"])
+
+
+def hit_records(index, spans, atoms=1):
+    """
+    Return a SeqHit for each span of the SequenceIndex index,
+    the atom indices of all hits are read with a single iterate
+    """
+    residues = {}
+    if int(atoms) and spans:
+        atomDict = {'atomList': []}
+        cmd.iterate(index.selection(spans), "atomList.append((model,chain,resv,index))", space=atomDict)
+        for model, chain, resv, atom in atomDict['atomList']:
+            residues.setdefault((model, chain, resv), []).append(atom)
+
+    hits = []
+    for span in spans:
+        (start, stop) = span[:2]
+        model = index.models[start]
+        chain = index.chains[start]
+        hit_atoms = []
+        if int(atoms):
+            for resv in sorted(set(index.IDs[start:stop])):
+                hit_atoms.extend(residues.get((model, chain, resv), []))
+        hits.append(SeqHit(model, chain, index.IDs[start], index.IDs[stop - 1],
+                           index.AAs[start:stop], hit_atoms,
+                           span[2] if len(span) > 2 else None))
+    return hits
+
+
+def find_hits(needle, haystack, het=0, firstOnly=0, mismatches=0, indels=0, atoms=1, quiet=1,
+              max_hits=0):
+    """
+    Search needle in haystack like findseq, but instead of creating a
+    selection return a list of SeqHit records with the object, chain,
+    first and last residue number, matched sequence and atom indices
+    of every hit. Uses the same cached sequence indices as the dialog.
+    With quiet=0 the hits are also printed, e.g. when used as PyMol command.
+    See iter_hits for getting the hits one by one.
+    """
+    if not checkParams(needle, haystack, "hits", het, firstOnly):
+        return None
+
+    try:
+        needle = findseq_matcher(needle, mismatches, indels)
+    except ValueError as e:
+        print("Error: %s" % e)
+        return None
+
+    index = get_sequence_index(haystack, het)
+    try:
+        hits = hit_records(index, limited_spans(index, needle, firstOnly, max_hits), atoms)
+    except (SearchTimeout, ValueError) as e:
+        print("Error: %s" % e)
+        return None
+
+    if not int(quiet):
+        for hit in hits:
+            print("%s\t%s\t%i\t%i\t%s" % (hit.object, hit.chain, hit.start, hit.end, hit.sequence))
+        print("%i hits" % len(hits))
+    return hits
+
+
+# The find_hits command prints the hits, the Python function only returns them
+def find_hits_command(needle, haystack, het=0, firstOnly=0, mismatches=0, indels=0, atoms=1,
+                      quiet=0, max_hits=0):
+    return find_hits(needle, haystack, het, firstOnly, mismatches, indels, atoms, quiet, max_hits)
+
+extend_command("find_hits", find_hits_command)
+
+
+def limited_spans(index, needle, firstOnly=0, max_hits=0):
+    """
+    Return the spans of the hits of needle in index like find_spans,
+    with max_hits > 0 only the first max_hits, telling if there are more
+    """
+    max_hits = int(max_hits)
+    if max_hits <= 0 or int(firstOnly):
+        return find_spans(index, needle, firstOnly)
+    (spans, more) = first_spans(index, needle, max_hits)
+    if more:
+        print("Showing first %i hits" % max_hits)
+    return spans
+
+
+def iter_hits(needle, haystacks, het=0, mismatches=0, indels=0, atoms=1):
+    """
+    Yield a SeqHit record (see find_hits) for every hit of needle in the
+    object/selection haystacks, or in each of a list of them, object by
+    object and chain by chain. Only as much is searched as hits are taken,
+    e.g. itertools.islice(iter_hits("C", molecule_objects()), 100) stops
+    after the 100th hit. Raises ValueError for invalid arguments.
+    """
+    if is_string(haystacks):
+        haystacks = [haystacks]
+    needle = findseq_matcher(needle, mismatches, indels)
+
+    # identical chains in different objects are matched only once
+    memo = {}
+    for haystack in haystacks:
+        index = get_sequence_index(haystack, het)
+        for span in iter_spans(index, needle, memo):
+            yield hit_records(index, [span], atoms)[0]
+
+
+
+#=====================================================================
+# Batch scanner for directories of structure files, without PyMol
+# e.g. python CTRL_F.py "N[^P][ST][^P]" /data/pdb --output hits.tsv
+#=====================================================================
+
+# File extensions of the structure files read by the batch scanner
+structure_extensions = (".pdb", ".ent", ".cif", ".mmcif")
+
+# Number of files that are handed to the process pool at once,
+# so that the list of files is never held in memory as a whole
+batch_size = 1000
+
+# Columns of the rows written by the batch scanner
+batch_columns = ["file", "query", "chain", "start", "end", "sequence", "score"]
+
+# Matcher of the batch scanner, set in each process by batch_init
+batch_matcher = None
+
+# Token of an mmCIF data line, a quoted string or a plain value
+cif_token = re.compile(r"'[^']*'(?=\s|$)|\"[^\"]*\"(?=\s|$)|\S+")
+
+
+def open_structure(path):
+    """
+    Open a structure file for reading text lines, also if it is compressed with gzip
+    """
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path), errors="replace")
+    return io.open(path, errors="replace")
+
+
+def is_structure_file(path):
+    """
+    Check if path has the extension of a (gzipped) PDB/mmCIF file
+    """
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return name.endswith(structure_extensions)
+
+
+def structure_files(paths):
+    """
+    Generate the structure files in paths, directories are walked recursively
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if is_structure_file(name):
+                    yield os.path.join(root, name)
+
+
+def pdb_residues(lines, het=0):
+    """
+    Generate (resi, resn, chain) of the CA atoms of the first model in
+    the lines of a PDB file, like the iterate of get_sequence_index
+    """
+    records = ("ATOM  ", "HETATM") if int(het) else ("ATOM  ",)
+    last = None
+    for line in lines:
+        if line.startswith(records):
+            # only CA atoms, of alternative locations only the first
+            if line[12:16].strip() != "CA" or line[16] not in " A":
+                continue
+            residue = (line[21], line[22:27])
+            if residue == last:
+                continue
+            last = residue
+            yield (line[22:26], line[17:20].strip(), line[21].strip())
+        elif line.startswith("ENDMDL"):
+            break
+
+
+def cif_residues(lines, het=0):
+    """
+    Generate (resi, resn, chain) of the CA atoms of the first model in
+    the _atom_site loop of the lines of an mmCIF file
+    """
+    columns = []
+    in_loop = False
+    model = None
+    last = None
+    for line in lines:
+        if line.startswith("loop_"):
+            if columns:
+                break
+            in_loop = True
+            continue
+        if in_loop and line.startswith("_atom_site."):
+            columns.append(line.split()[0][11:])
+            continue
+        in_loop = False
+        if not columns:
+            continue
+        if line.startswith(("_", "#", "data_")):
+            break
+        # only the rows of CA atoms are split into their values
+        if "CA" not in line:
+            continue
+        row = dict(zip(columns, cif_token.findall(line)))
+        if row.get("group_PDB") == "HETATM" and not int(het):
+            continue
+        if row.get("auth_atom_id", row.get("label_atom_id")) != "CA":
+            continue
+        if row.get("label_alt_id", ".") not in ".?A":
+            continue
+        if model is None:
+            model = row.get("pdbx_PDB_model_num")
+        elif row.get("pdbx_PDB_model_num") != model:
+            break
+        chain = row.get("auth_asym_id", row.get("label_asym_id", ""))
+        resi = row.get("auth_seq_id", row.get("label_seq_id", "."))
+        residue = (chain, resi, row.get("pdbx_PDB_ins_code"))
+        if residue == last or resi in ".?":
+            continue
+        last = residue
+        yield (resi, row.get("auth_comp_id", row.get("label_comp_id", "")), chain)
+
+
+def read_structure_index(path, het=0):
+    """
+    Return a SequenceIndex of the structure file path,
+    streaming over its lines without keeping the atoms in memory
+    """
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    model = os.path.basename(path)
+    with open_structure(path) as lines:
+        if name.endswith((".cif", ".mmcif")):
+            residues = cif_residues(lines, het)
+        else:
+            residues = pdb_residues(lines, het)
+        aaList = [(resi, resn, chain, model) for resi, resn, chain in residues]
+    return SequenceIndex(path, het, None, aaList)
+
+
+def batch_init(needle, prosite=0, mismatches=0, indels=0):
+    """
+    Set the matcher of the batch scanner, in each process of the pool
+    """
+    global batch_matcher
+    if int(prosite):
+        batch_matcher = PrositeQuery(needle)
+    elif os.path.isfile(needle):
+        batch_matcher = MotifAutomaton(parse_motifs(needle))
+    else:
+        batch_matcher = findseq_matcher(needle.upper(), mismatches, indels)
+
+
+def scan_structure_file(job):
+    """
+    Return the path, the rows of the hits and the error message (or None)
+    of one structure file, this is run in the processes of the pool
+    """
+    (path, het, firstOnly) = job
+    try:
+        index = read_structure_index(path, het)
+        found = find_spans(index, batch_matcher, firstOnly)
+    except Exception as e:
+        return (path, [], str(e))
+
+    # matchers for many motifs return the spans of each motif
+    if isinstance(found, dict):
+        found = sorted(found.items())
+    else:
+        query = getattr(batch_matcher, "pattern", getattr(batch_matcher, "query", batch_matcher))
+        found = [(query, found)]
+
+    rows = []
+    for query, spans in found:
+        for hit in hit_records(index, spans, atoms=0):
+            rows.append((path, query, hit.chain, hit.start, hit.end, hit.sequence, hit.score))
+    return (path, rows, None)
+
+
+def write_batch_rows(output, rows, fmt):
+    """
+    Write the rows of hits as tab separated values or as JSON lines
+    """
+    for row in rows:
+        if fmt == "json":
+            output.write(json.dumps(dict(zip(batch_columns, row))) + "\n")
+        else:
+            output.write("\t".join("" if value is None else str(value) for value in row) + "\n")
+
+
+def batch_scan(needle, paths, output, het=0, firstOnly=0, prosite=0,
+               mismatches=0, indels=0, fmt="tsv", processes=None):
+    """
+    Search needle in all structure files in paths and write the hits to the
+    file object output as soon as each batch of files is done.
+    Returns the number of files and hits and the files that failed.
+    """
+    batch_init(needle, prosite, mismatches, indels)
+    if fmt != "json":
+        output.write("\t".join(batch_columns) + "\n")
+
+    pool = None
+    if processes != 1:
+        pool = multiprocessing.Pool(processes or multiprocessing.cpu_count(), batch_init,
+                                    (needle, prosite, mismatches, indels))
+    files = structure_files(paths)
+    (nFiles, nHits, failed) = (0, 0, [])
+    try:
+        while True:
+            jobs = [(path, het, firstOnly) for path in itertools.islice(files, batch_size)]
+            if not jobs:
+                break
+            if pool is None:
+                results = map(scan_structure_file, jobs)
+            else:
+                chunksize = max(1, len(jobs) // (4 * (processes or multiprocessing.cpu_count())))
+                results = pool.imap_unordered(scan_structure_file, jobs, chunksize)
+            for path, rows, error in results:
+                if error is not None:
+                    failed.append(path)
+                    sys.stderr.write("Error: %s: %s\n" % (path, error))
+                write_batch_rows(output, rows, fmt)
+                nHits += len(rows)
+            nFiles += len(jobs)
+            output.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return (nFiles, nHits, failed)
+
+
+def batch_main(argv=None):
+    """
+    Command line interface of the batch scanner
+    """
+    parser = argparse.ArgumentParser(
+        description="Search sequences, regular expressions or motifs in PDB/mmCIF files (also .gz)")
+    parser.add_argument("needle", help="sequence, regular expression, PROSITE pattern (with --prosite) "
+                        "or a file with one motif per line")
+    parser.add_argument("paths", nargs="*", help="structure files or directories searched recursively")
+    parser.add_argument("--build-index", metavar="INDEX",
+                        help="build the library index INDEX of the files in needle and paths")
+    parser.add_argument("--index", metavar="INDEX",
+                        help="search the library index INDEX instead of structure files")
+    parser.add_argument("-o", "--output", help="file for the hits, default is the standard output")
+    parser.add_argument("-f", "--format", choices=["tsv", "json"], default="tsv",
+                        help="tab separated values or one JSON object per line")
+    parser.add_argument("--prosite", action="store_true", help="needle is a PROSITE pattern")
+    parser.add_argument("--mismatches", type=int, default=0, help="allowed mismatches of plain sequences")
+    parser.add_argument("--indels", action="store_true", help="count insertions/deletions as mismatches")
+    parser.add_argument("--het", action="store_true", help="include HETATM records")
+    parser.add_argument("--first-only", action="store_true", help="only the first hit of each file")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="number of processes, default is one per core")
+    # options may also come between the needle and the paths (Python 3.7 and later)
+    parse = getattr(parser, "parse_intermixed_args", parser.parse_args)
+    args = parse(argv)
+
+    # without a needle, all arguments are the structures of the new library index
+    if args.build_index:
+        (nFiles, nSequences) = build_library_index([args.needle] + args.paths, args.build_index,
+                                                   int(args.het), args.processes)
+        sys.stderr.write("Indexed %i files with %i unique sequences\n" % (nFiles, nSequences))
+        return 0
+    if not args.paths and not args.index:
+        parser.error("no structure files or library index to search")
+
+    try:
+        batch_init(args.needle, args.prosite, args.mismatches, args.indels)
+        if is_string(batch_matcher):
+            re.compile(batch_matcher)
+    except (ValueError, re.error) as e:
+        sys.stderr.write("Error: %s\n" % e)
+        return 2
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    if args.index:
+        try:
+            index = LibraryIndex(args.index)
+            needle = PrositeQuery(args.needle) if args.prosite else args.needle
+            if args.format != "json":
+                output.write("\t".join(batch_columns) + "\n")
+            rows = [(hit.object, args.needle, hit.chain, hit.start, hit.end, hit.sequence, None)
+                    for hit in index.hits(needle, int(args.first_only))]
+            write_batch_rows(output, rows, args.format)
+        finally:
+            if args.output:
+                output.close()
+        sys.stderr.write("%i hits in %i files\n" % (len(rows), len(set(row[0] for row in rows))))
+        return 0
+
+    try:
+        (nFiles, nHits, failed) = batch_scan(args.needle, args.paths, output, int(args.het),
+                                             int(args.first_only), int(args.prosite),
+                                             args.mismatches, int(args.indels),
+                                             args.format, args.processes)
+    finally:
+        if args.output:
+            output.close()
+    sys.stderr.write("%i hits in %i files, %i files failed\n" % (nHits, nFiles, len(failed)))
+    return 1 if failed else 0
+
+
+
+#=====================================================================
+# Persistent index of the chain sequences of a local structure library
+# (e.g. a PDB mirror), built once and memory-mapped for searching
+#=====================================================================
+
+# Length of the k-mers of the inverted index of a library index
+library_kmer_length = 3
+
+# Maximum number of matching structures the dialog loads into PyMol
+library_max_structures = 20
+
+# Number of sequences that are matched together with a regular expression
+library_block_size = 10000
+
+# The opened LibraryIndex of the dialog and the findseq_library command
+library_index = None
+
+
+def library_index_files(path):
+    """
+    Return the names of the metadata, sequence, residue number and
+    k-mer files of the library index path, e.g. pdb for pdb.json
+    """
+    if path.endswith(".json"):
+        path = path[:-5]
+    return [path + extension for extension in (".json", ".seq", ".resi", ".kmer")]
+
+
+def kmer_code(letters):
+    """
+    Number of a k-mer of upper case letters, None if it contains other characters
+    """
+    code = 0
+    for letter in letters:
+        value = ord(letter) - 65
+        if not 0 <= value < 26:
+            return None
+        code = code * 26 + value
+    return code
+
+
+def structure_chains(job):
+    """
+    Return the path, the (chain, sequence, residue numbers) of each chain
+    and the error message (or None) of one structure file,
+    this is run in the processes of the pool
+    """
+    (path, het) = job
+    try:
+        index = read_structure_index(path, het)
+    except Exception as e:
+        return (path, [], str(e))
+    chains = []
+    segments = index.segments + [len(index.AAs)]
+    for first, last in zip(segments[:-1], segments[1:]):
+        chains.append((index.chains[first], index.AAs[first:last], index.IDs[first:last]))
+    return (path, chains, None)
+
+
+def build_library_index(paths, index_path, het=0, processes=None):
+    """
+    Build the library index index_path of all structure files in paths.
+    Identical chains are stored once with the files and residue numbers
+    of all their copies. Returns the number of files and unique sequences.
+    The sequences are memory-mapped while the k-mers are counted, but the
+    metadata and the k-mer postings (4 bytes per residue) are kept in memory
+    until they are written.
+    """
+    (json_path, seq_path, resi_path, kmer_path) = library_index_files(index_path)
+    files = []
+    sequences = []
+    unique = {}
+    offset = 0
+    resi_offset = 0
+
+    pool = None
+    if processes != 1:
+        pool = multiprocessing.Pool(processes or multiprocessing.cpu_count())
+    paths = structure_files(paths)
+    try:
+        with open(seq_path, "wb") as seq_file, open(resi_path, "wb") as resi_file:
+            while True:
+                jobs = [(path, int(het)) for path in itertools.islice(paths, batch_size)]
+                if not jobs:
+                    break
+                if pool is None:
+                    results = map(structure_chains, jobs)
+                else:
+                    results = pool.imap(structure_chains, jobs, max(1, len(jobs) // 64))
+                for path, chains, error in results:
+                    if error is not None:
+                        sys.stderr.write("Error: %s: %s\n" % (path, error))
+                        continue
+                    files.append(path)
+                    for chain, AAs, IDs in chains:
+                        if AAs not in unique:
+                            # sequences are separated by newlines, so that they
+                            # are the ends of the lines of regular expressions
+                            unique[AAs] = len(sequences)
+                            sequences.append([offset, len(AAs), []])
+                            seq_file.write(AAs.encode("ascii") + b"\n")
+                            offset += len(AAs) + 1
+                        array.array("i", IDs).tofile(resi_file)
+                        sequences[unique[AAs]][2].append([len(files) - 1, chain, resi_offset])
+                        resi_offset += len(IDs)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    unique = None
+
+    # inverted index with the sorted start positions of each k-mer
+    k = library_kmer_length
+    postings = [array.array("i") for code in range(26 ** k)]
+    text = map_file(seq_path)
+    for start, length, owners in sequences:
+        AAs = text[start:start + length].decode("ascii")
+        for p in range(length - k + 1):
+            code = kmer_code(AAs[p:p + k])
+            if code is not None:
+                postings[code].append(start + p)
+    if isinstance(text, mmap.mmap):
+        text.close()
+    with open(kmer_path, "wb") as kmer_file:
+        offsets = array.array("i", [0])
+        for positions in postings:
+            offsets.append(offsets[-1] + len(positions))
+        offsets.tofile(kmer_file)
+        for positions in postings:
+            positions.tofile(kmer_file)
+
+    with open(json_path, "w") as json_file:
+        json.dump({"format": 1, "k": k, "het": int(het), "files": files,
+                   "sequences": sequences}, json_file)
+    return (len(files), len(sequences))
+
+
+def map_file(path):
+    """
+    Memory-map a file for reading, empty files are returned as empty bytes
+    """
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class LibraryIndex(object):
+    """
+    Library index built by build_library_index, the sequences, residue
+    numbers and k-mers are memory-mapped and only read where needed.
+    The metadata, the names of the files and the offsets and chains of
+    the unique sequences, is loaded into memory.
+    """
+    def __init__(self, path):
+        (json_path, seq_path, resi_path, kmer_path) = library_index_files(path)
+        with open(json_path) as json_file:
+            meta = json.load(json_file)
+        self.path = json_path
+        self.k = meta["k"]
+        self.het = meta["het"]
+        self.files = meta["files"]
+        self.sequences = meta["sequences"]
+        self.starts = [sequence[0] for sequence in self.sequences]
+        self.text = map_file(seq_path)
+        self.resi = map_file(resi_path)
+        self.kmers = map_file(kmer_path)
+        self.itemsize = array.array("i").itemsize
+
+    def int_at(self, data, n):
+        return struct.unpack_from("i", data, n * self.itemsize)[0]
+
+    def postings(self, code):
+        """
+        Return the sorted start positions of the k-mer with the number code
+        """
+        first = self.int_at(self.kmers, code)
+        last = self.int_at(self.kmers, code + 1)
+        base = (26 ** self.k + 1 + first) * self.itemsize
+        return struct.unpack_from("%ii" % (last - first), self.kmers, base)
+
+    def occurrences(self, query):
+        """
+        Return the sorted start positions of a plain sequence,
+        verifying the positions of its rarest k-mer
+        """
+        k = self.k
+        codes = [(kmer_code(query[j:j + k]), j) for j in range(len(query) - k + 1)]
+        if not codes or None in [code for code, j in codes]:
+            return [i.start() for i in re.finditer(re.escape(query.encode("ascii")), self.text)]
+
+        (code, j) = min(codes, key=lambda c: self.int_at(self.kmers, c[0] + 1) - self.int_at(self.kmers, c[0]))
+        needle = query.encode("ascii")
+        return [p - j for p in self.postings(code)
+                if p >= j and self.text[p - j:p - j + len(needle)] == needle]
+
+    def find(self, needle, firstOnly=0, cancelled=None):
+        """
+        Return the (start, stop) spans of the hits of a sequence, regular
+        expression or PrositeQuery in the text of the unique sequences.
+        Regular expressions are compiled with compile_pattern and raise
+        SearchTimeout like find_spans, no hits are returned if the event
+        cancelled is set.
+        """
+        if isinstance(needle, PrositeQuery):
+            reNeedle = compile_pattern(prosite_to_regex(needle.pattern))
+        elif needle.isalnum():
+            return literal_spans(self.occurrences(needle.upper()), len(needle), None, firstOnly)
+        else:
+            reNeedle = compile_pattern(needle.upper())
+
+        # each sequence is matched on its own, so that no match runs into the next one,
+        # the time limit of guarded patterns holds for all blocks of sequences together
+        deadline = time.time() + regex_timeout
+        spans = []
+        for block in range(0, len(self.sequences), library_block_size):
+            if cancelled is not None and cancelled.is_set():
+                return []
+            records = self.sequences[block:block + library_block_size]
+            texts = [self.text[offset:offset + length].decode("ascii")
+                     for offset, length, owners in records]
+            found = chain_spans(reNeedle, texts, firstOnly, cancelled, deadline)
+            for (offset, length, owners), local in zip(records, found):
+                spans.extend([(offset + start, offset + stop) for start, stop in local])
+                if int(firstOnly) and spans:
+                    return spans
+        return spans
+
+    def hits(self, needle, firstOnly=0, cancelled=None):
+        """
+        Return a SeqHit for each hit of needle in each chain of the library,
+        the object of the hits is the structure file
+        """
+        hits = []
+        for start, stop in self.find(needle, firstOnly, cancelled):
+            (offset, length, owners) = self.sequences[bisect.bisect_right(self.starts, start) - 1]
+            sequence = self.text[start:stop].decode("ascii")
+            for file_no, chain, resi_offset in owners:
+                first = self.int_at(self.resi, resi_offset + start - offset)
+                last = self.int_at(self.resi, resi_offset + stop - 1 - offset)
+                hits.append(SeqHit(self.files[file_no], chain, first, last, sequence, None, None))
+                if int(firstOnly):
+                    return hits
+        return hits
+
+
+def set_library_index(path):
+    """
+    Open the library index path for the search library mode of the
+    dialog and for findseq_library, also available as PyMol command
+    """
+    global library_index
+    try:
+        library_index = LibraryIndex(path)
+    except (IOError, OSError, ValueError, KeyError) as e:
+        print("Error: could not open the library index %s: %s" % (path, e))
+        return None
+    print("Library index %s with %i files and %i unique sequences" %
+          (path, len(library_index.files), len(library_index.sequences)))
+    return library_index
+
+extend_command("set_library_index", set_library_index)
+
+
+def library_object_name(path):
+    """
+    Name of the PyMol object of a structure file of the library
+    """
+    name = os.path.basename(path)
+    if name.lower().endswith(".gz"):
+        name = name[:-3]
+    return re.sub(r"\W", "_", os.path.splitext(name)[0])
+
+
+def findseq_library(needle, selName=None, max_structures=None, firstOnly=0):
+    """
+    Search needle in the opened library index, load the structures with
+    hits (at most max_structures) into PyMol and select the hits in them.
+    Returns the SeqHit records of all hits, also of structures not loaded.
+    """
+    if library_index is None:
+        print("Error: please open a library index with set_library_index first.")
+        return None
+    if max_structures is None:
+        max_structures = library_max_structures
+    if selName is None:
+        selName = "lib_" + (needle if needle.isalnum() else datetime.datetime.now().strftime("%H%M%S"))
+
+    try:
+        hits = library_index.hits(needle, firstOnly)
+    except (ValueError, re.error, SearchTimeout) as e:
+        print("Error: %s" % e)
+        return None
+
+    select_library_hits(hits, selName, max_structures)
+    return hits
+
+extend_command("findseq_library", findseq_library)
+
+
+def select_library_hits(hits, selName, max_structures=None):
+    """
+    Load the structures of the library hits (at most max_structures)
+    into PyMol, select the hits in them as selName and print all hits.
+    Returns the number of loaded structures.
+    """
+    if max_structures is None:
+        max_structures = library_max_structures
+
+    # load the structures with hits, only once and in the order of the hits
+    objects = {}
+    for hit in hits:
+        if hit.object not in objects and len(objects) < int(max_structures):
+            objects[hit.object] = library_object_name(hit.object)
+            if objects[hit.object] not in cmd.get_names("objects"):
+                cmd.load(hit.object, objects[hit.object])
+
+    terms = ["(model %s and c. %s and i. %s-%s)" % (objects[hit.object], hit.chain or "''",
+                                                    resi_string(hit.start), resi_string(hit.end))
+             for hit in hits if hit.object in objects]
+    cmd.select(selName, " or ".join(terms) or "none")
+
+    for hit in hits:
+        print("%s\t%s\t%i\t%i\t%s" % (hit.object, hit.chain, hit.start, hit.end, hit.sequence))
+    print("%i hits in %i structures, %i loaded into %s" %
+          (len(hits), len(set(hit.object for hit in hits)), len(objects), selName))
+    return len(objects)
+
+
+def library_search_worker(needle, haystacks, het, firstOnly, results, cancelled, max_hits=0):
+    """
+    Search needle in the opened library index like search_worker, in a
+    background thread. The SeqHit records of all hits are put into results
+    as ("hits", index path, library index, hits), errors as ("failed", message).
+    """
+    try:
+        hits = library_index.hits(needle, firstOnly, cancelled)
+        if cancelled.is_set():
+            return
+        if max_hits and len(hits) > max_hits:
+            hits = hits[:max_hits]
+            results.put(("limited", max_hits))
+        results.put(("hits", library_index.path, library_index, hits))
+        results.put(("done",))
+    except SearchTimeout as e:
+        results.put(("timeout", str(e)))
+    except (ValueError, re.error):
+        results.put(("failed", "Invalid search term"))
+    except Exception as e:
+        # e.g. a damaged index file, the search has to end with a message
+        results.put(("failed", "Error: %s" % e))
+
+
+
 #=================================
 # Configure the PyMol plugin
 #=================================
 
-# Initialize an empty search history
+# Initialize an empty search history, of the queries searched with Find or Enter,
+# and the number of queries shown in the history menu
 searchhistory = []
+history_length = 20
+
+# Largest number of searches, and their estimated size in bytes, whose hits are
+# kept in the result cache, and largest number of compiled patterns that are kept
+result_cache_max_entries = 200
+result_cache_max_bytes = 64 * 1024 * 1024
+pattern_cache_max_entries = 100
+result_cache = LRUCache(result_cache_max_entries, result_cache_max_bytes)
+pattern_cache = LRUCache(pattern_cache_max_entries)
+
+# Idle time in milliseconds after the last key press before an interactive search starts
+interactive_delay = 150
+
+# Only count the hits of interactive searches while typing (1), and save them as
+# selection after this many more milliseconds without key presses, or on Enter
+interactive_preview = 1
+preview_commit_delay = 1000
+
+# Interval in milliseconds for checking on the results of a running search
+search_poll_interval = 25
+
+# Minimum number of hits that are saved as selections in chunks, the number of hits
+# of the first chunk and the time in seconds that saving a chunk should take
+progressive_min_hits = 2000
+progressive_chunk_size = 500
+selection_chunk_time = 0.03
+
+# Number of hits on a page of the hit browser, and the selection of the hit shown
+hit_page_size = 50
+hit_browser_selection = "current_hit"
+
+# Virtual event that tells the Tk main loop to open the window
+toggle_event = "<<CTRLFOpen>>"
+
+# Number of processes for searching many objects in parallel, None for one per core
+# and 1 for always searching in the background thread only
+search_processes = None
+
+# Minimum number of objects/selections for searching them in parallel processes
+pool_min_objects = 200
+
+# Time limit in seconds for matching regular expressions that cannot be matched
+# by an automaton and may backtrack for very long, e.g. with backreferences
+regex_timeout = 10.0
+
+# Largest number of NFA states of an automaton, of DFA states built before
+# they are forgotten, and repeat ranges from which a repeat counts as wide
+automaton_max_nfa_states = 5000
+automaton_max_dfa_states = 10000
+automaton_wide_repeat = 20
+
+
+# Minimum number of objects/selections for looking up plain sequences
+# in a suffix array over all of them, None for never building it
+session_index_min_objects = 50
+
+
+# Function to configure the session index, also available as PyMol command
+def set_session_index(min_objects=50):
+    global session_index
+    global session_index_min_objects
+    if min_objects in (None, "", "None", "off"):
+        session_index_min_objects = None
+        session_index = None
+        return
+    try:
+        session_index_min_objects = int(min_objects)
+    except ValueError:
+        print("Error: min_objects has to be a number or off.")
+
+extend_command("ctrlf_session_index", set_session_index)
+
+
+# Function to configure the parallel search, also available as PyMol command
+def set_parallel_search(processes=None, min_objects=200):
+    global search_processes
+    global pool_min_objects
+    try:
+        processes = int(processes) if processes not in (None, "", "None") else None
+        min_objects = int(min_objects)
+    except ValueError:
+        print("Error: processes and min_objects have to be numbers.")
+        return
+
+    # Stop the pool, it is started again with the new size when needed
+    if processes != search_processes:
+        stop_search_pool()
+
+    search_processes = processes
+    pool_min_objects = min_objects
+
+extend_command("ctrlf_parallel", set_parallel_search)
+
+
+# Function to change the time limit of regular expressions, also available as PyMol command
+def set_regex_timeout(seconds=10):
+    global regex_timeout
+    try:
+        regex_timeout = max(0.1, float(seconds))
+    except ValueError:
+        print("Error: The time limit has to be given in seconds.")
+
+extend_command("ctrlf_regex_timeout", set_regex_timeout)
+
+
+# Function to configure the cache of search results, also available as PyMol command
+def set_result_cache(max_entries=200, max_mb=64):
+    global result_cache_max_entries
+    global result_cache_max_bytes
+    try:
+        result_cache_max_entries = max(0, int(max_entries))
+        result_cache_max_bytes = int(max(0, float(max_mb)) * 1024 * 1024)
+    except ValueError:
+        print("Error: max_entries and max_mb have to be numbers.")
+        return
+    result_cache.resize(result_cache_max_entries, result_cache_max_bytes)
+
+extend_command("ctrlf_result_cache", set_result_cache)
+
+
+# Function to print the use of the caches, also available as PyMol command
+def print_cache_stats():
+    for name, cache in (("results", result_cache), ("patterns", pattern_cache)):
+        print("%s: %i entries, %.1f MB, %i hits, %i misses" %
+              (name, len(cache.entries), cache.bytes / 1048576.0, cache.hits, cache.misses))
+
+extend_command("ctrlf_cache_stats", print_cache_stats)
+
+
+# Function to change the idle time of interactive searches, also available as PyMol command
+def set_interactive_delay(delay=150):
+    global interactive_delay
+    try:
+        interactive_delay = max(0, int(delay))
+    except ValueError:
+        print("Error: The delay has to be given in milliseconds.")
+
+extend_command("ctrlf_interactive_delay", set_interactive_delay)
+
+
+# Function to configure the preview of interactive searches, also available as PyMol command
+def set_interactive_preview(preview=1, delay=1000):
+    global interactive_preview
+    global preview_commit_delay
+    try:
+        interactive_preview = int(preview)
+        preview_commit_delay = max(0, int(delay))
+    except ValueError:
+        print("Error: preview has to be 0 or 1 and the delay given in milliseconds.")
+
+extend_command("ctrlf_interactive_preview", set_interactive_preview)
 
 
 #======================
@@ -1829,12 +6488,8 @@ searchhistory = []
 #======================
 def __init__(self):
 
-    # Set a global variable for tracing if the user pressed the STRG-F key combo for starting the plugin
-    # and initialize it with 0
     # The open_var is necessary to track if already a top window is open
-    global trace_var
     global open_var
-    trace_var = 0
     open_var = 0
 
     # Register the plugin under the plugin menu and make an entry "CTRL-F"
@@ -1843,47 +6498,35 @@ def __init__(self):
     # Make a key binding that can be used from within the PyMol PMG app window
     root = plugins.get_tk_root()
     root.bind("<Control-f>", lambda s=self : toggler(s))
+    # The window is opened by the Tk main loop when toggler generates this virtual event
+    root.bind(toggle_event, checker)
 
     # Make a key bining that can be used from withtin the PyMol viewer
-    # this makes a callback to toggler, which toggles the trace_var
+    # this makes a callback to toggler
     cmd.set_key("CTRL-F", lambda s=self : toggler(s))
     # Do the same thing for the PyMol command
     cmd.extend("CTRL-F", lambda s=self : toggler(s))
 
-    # Start the checker function
-    checker()
-
 
-# Toggler function that toggles the trace variable between 0 and 1
+# Toggler function that asks the Tk main loop to open the window, it may be called
+# from any thread, as the key binding of the viewer and the command run outside of
+# the main loop, so it only queues a virtual event, which is safe from any thread
 def toggler(self, *args):
-    # Tell the function about the global variable trace_var
-    global trace_var
-    global open_var
-
-    # Only toggle the variable if no window is open yet
+    # Only open the window if no window is open yet
     if open_var == 0:
-        if trace_var == 0:
-            trace_var = 1
+        plugins.get_tk_root().event_generate(toggle_event, when="tail")
 
 
-# Function to check the value of the variable trace_var
-def checker():
-    # Get the PyMol pmg app root window
-    root = plugins.get_tk_root()
-    # Tell the function about the global trace_var variable
-    global trace_var
+# Function for opening the window, runs in the Tk main loop
+def checker(event=None):
+    # Tell the function about the global open_var variable
     global open_var
 
-    # Check if trace_var is 1
-    # if yes, start the plugin and set it back to 0
-    if trace_var == 1:
+    # start the plugin if no window has been opened since the event was queued
+    if open_var == 0:
         showWindow()
-        trace_var = 0
         open_var = 1
 
-    # Continue checking every 10 ms
-    root.after(10, checker)
-
 
 # Function to reset the open_var
 # This function is triggered when in the toplevel window the X close button is pressed
@@ -1927,3 +6570,8 @@ def showWindow(event = None):
     
     # And start the refresh routine
     frame.refresh()
+
+
+# Run the batch scanner when started from the command line (and not with PyMol's run)
+if __name__ == "__main__" and os.path.basename(sys.argv[0]).startswith("CTRL_F"):
+    sys.exit(batch_main())
@@ -0,0 +1,64 @@
+"""
+Benchmark for searching in assemblies with many identical chains
+
+Compares matching a pattern against every chain of a synthetic 60-mer
+capsid (as before) with matching it once per distinct chain sequence and
+fanning the hits out to the identical copies (SequenceIndex.find).
+
+Run with:
+pymol -cq benchmarks/bench_identical_chains.py
+or without PyMol:
+python benchmarks/bench_identical_chains.py
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import CTRL_F
+
+COPIES = 60
+CHAIN_LENGTH = 1000
+PATTERN = "[ST].{0,4}[DE].{0,4}[KR].{0,4}W"
+REPEATS = 20
+
+
+def capsid_index():
+    # one protomer sequence, repeated in chains A1, A2, ... of one object
+    letters = "ACDEFGHIKLMNPQRSTVWY"
+    three = dict([(one, three) for three, one in CTRL_F.one_letter.items()
+                  if len(three.strip()) == 3 and one in letters])
+    protomer = [random.choice(letters) for i in range(CHAIN_LENGTH)]
+    aaList = [(resi + 1, three[one], "A%i" % copy, "capsid")
+              for copy in range(COPIES) for resi, one in enumerate(protomer)]
+    return CTRL_F.SequenceIndex("capsid", 0, None, aaList)
+
+
+def main():
+    random.seed(0)
+    index = capsid_index()
+    reNeedle = re.compile(PATTERN)
+
+    start = time.time()
+    for i in range(REPEATS):
+        every_chain = CTRL_F.match_spans(reNeedle, index.AAs, index.segments)
+    every_chain_time = (time.time() - start) / REPEATS
+
+    start = time.time()
+    for i in range(REPEATS):
+        unique_chains = index.find(reNeedle)
+    unique_chains_time = (time.time() - start) / REPEATS
+
+    assert every_chain == unique_chains
+
+    print("Search in %i identical chains (%i residues each) for %s, %i hits" %
+          (COPIES, CHAIN_LENGTH, PATTERN, len(unique_chains)))
+    print("  every chain:   %8.5f s" % every_chain_time)
+    print("  unique chains: %8.5f s" % unique_chains_time)
+    print("  speedup:       %8.2f x" % (every_chain_time / unique_chains_time))
+
+main()
@@ -0,0 +1,51 @@
+"""
+Benchmark for regular expressions that make backtracking take very long
+
+Compares matching patterns with nested or several unbounded repeats
+against a chain without hits with the re module (as before) and with
+the automaton that compile_pattern returns for them. The time of the
+re module grows exponentially or polynomially with the chain length,
+the chains are kept short enough for it to finish.
+
+Run with:
+pymol -cq benchmarks/bench_pathological_patterns.py
+or without PyMol:
+python benchmarks/bench_pathological_patterns.py
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import CTRL_F
+
+CASES = [("(A+)+C", "A" * 22),
+         ("(A|AA)+C", "A" * 26),
+         (".*.*.*W", "A" * 400)]
+
+
+def main():
+    for pattern, AAs in CASES:
+        reNeedle = re.compile(pattern)
+        automaton = CTRL_F.compile_pattern(pattern)
+
+        start = time.time()
+        backtracking = CTRL_F.match_spans(reNeedle, AAs, [0])
+        backtracking_time = time.time() - start
+
+        start = time.time()
+        linear = CTRL_F.match_spans(automaton, AAs, [0])
+        linear_time = time.time() - start
+
+        assert backtracking == linear
+
+        print("Search in %i residues for %s (%s)" %
+              (len(AAs), pattern, type(automaton).__name__))
+        print("  re module: %8.5f s" % backtracking_time)
+        print("  automaton: %8.5f s" % linear_time)
+        print("  speedup:   %8.2f x" % (backtracking_time / max(linear_time, 1e-6)))
+
+main()
@@ -0,0 +1,48 @@
+"""
+Microbenchmark for the residue vocabulary of CTRL-F
+
+Compares rebuilding the one letter code table on every findseq call
+(as findseq did before the table was moved to module level)
+with the shared table, for a search in all of 200 objects.
+
+Run with:
+pymol -cq benchmarks/bench_residue_table.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import CTRL_F
+
+N_OBJECTS = 200
+REPEAT = 5
+
+# The source of the old dict literal, compiled once so that only building the dict is timed
+table_literal = compile(repr(CTRL_F.one_letter), "<one_letter>", "eval")
+
+
+def search_all_rebuild():
+    # the old findseq built the table once for every searched object
+    for i in range(N_OBJECTS):
+        one_letter = eval(table_literal)
+        one_letter["ALA"]
+
+
+def search_all_shared():
+    for i in range(N_OBJECTS):
+        CTRL_F.three_to_one("ALA")
+
+
+def main():
+    rebuild = min(timeit.repeat(search_all_rebuild, number=1, repeat=REPEAT))
+    shared = min(timeit.repeat(search_all_shared, number=1, repeat=REPEAT))
+
+    print("Residue table, search in all of %i objects" % N_OBJECTS)
+    print("  rebuilt per call: %8.3f ms" % (rebuild * 1000))
+    print("  shared table:     %8.3f ms" % (shared * 1000))
+    print("  saving per call:  %8.3f us" % ((rebuild - shared) / N_OBJECTS * 1e6))
+
+main()
@@ -0,0 +1,85 @@
+"""
+Benchmark for searching in all objects with the process pool of CTRL-F
+
+Compares searching many models one by one (search_worker) with matching
+their distinct chains in parallel in the search pool (pool_search_worker),
+which is what the search all mode does for at least pool_min_objects objects.
+Synthetic sequence indices are used, so no structures have to be loaded.
+
+Run with:
+pymol -cq benchmarks/bench_search_pool.py
+or without PyMol:
+python benchmarks/bench_search_pool.py
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import CTRL_F
+
+N_OBJECTS = 5000
+CHAINS = 4
+CHAIN_LENGTH = 300
+PATTERN = "C..C.{2,4}[HK]"
+
+
+def random_index(name):
+    letters = "ACDEFGHIKLMNPQRSTVWY"
+    three = dict([(one, three) for three, one in CTRL_F.one_letter.items()
+                  if len(three.strip()) == 3 and one in letters])
+    aaList = [(resi + 1, three[random.choice(letters)], chain, name)
+              for chain in "ABCD"[:CHAINS] for resi in range(CHAIN_LENGTH)]
+    return CTRL_F.SequenceIndex(name, 0, None, aaList)
+
+
+def run(worker, haystacks):
+    # collect the hits that the worker puts into the queue
+    results = CTRL_F.Queue.Queue()
+    worker(PATTERN, haystacks, 0, 0, results, threading.Event())
+    hits = []
+    while not results.empty():
+        message = results.get()
+        if message[0] == "error":
+            raise RuntimeError(message[2])
+        if message[0] == "hits":
+            hits.append((message[1], message[3]))
+    return hits
+
+
+def main():
+    random.seed(0)
+    indices = dict([(name, random_index(name)) for name in
+                    ["model%i" % i for i in range(N_OBJECTS)]])
+    haystacks = sorted(indices)
+
+    # the synthetic indices replace the ones built from PyMol objects
+    CTRL_F.get_sequence_index = lambda haystack, het: indices[haystack]
+
+    # search_worker would hand this many objects over to the pool
+    CTRL_F.pool_min_objects = N_OBJECTS + 1
+    start = time.time()
+    serial = run(CTRL_F.search_worker, haystacks)
+    serial_time = time.time() - start
+
+    # start the pool before timing, like in a session where it is already running
+    CTRL_F.get_search_pool().map(abs, [0])
+
+    start = time.time()
+    parallel = run(CTRL_F.pool_search_worker, haystacks)
+    parallel_time = time.time() - start
+
+    assert serial == parallel
+
+    print("Search in all of %i objects (%i residues each) for %s, %i hits" %
+          (N_OBJECTS, CHAINS * CHAIN_LENGTH, PATTERN, sum([len(spans) for name, spans in serial])))
+    print("  serial:  %8.3f s" % serial_time)
+    print("  pool:    %8.3f s (%i processes)" %
+          (parallel_time, CTRL_F.search_processes or CTRL_F.multiprocessing.cpu_count()))
+    print("  speedup: %8.2f x" % (serial_time / parallel_time))
+
+main()